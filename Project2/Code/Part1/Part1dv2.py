@@ -20,8 +20,10 @@ import numpy as np
 class SpikeDataCollector:
     
 
-    def __init__(self, pop_size=100,b = 10):
+    def __init__(self, pop_size=100,b = 10, seed = None):
         self.pop_size = pop_size
+        # one random stream for the whole run (seed or random.Random, see randomStream()), so a seed reproduces it
+        self.rng = randomStream(seed)
         self.b = b
         self.total_dead = 0
         self.average_mutations_dead = [] # this will be a list of histories of dead
@@ -35,13 +37,13 @@ class SpikeDataCollector:
         self.allSARS = []
 
         # fill up a population with covid-19 spikes
-        self.population = [Spike() for x in range(pop_size)]
+        self.population = [Spike(rng=self.rng) for x in range(pop_size)]
     
     def collectData(self):
 
         # set indices for b that dont die when they leave the neutral network
         for x in range(self.b):
-            self.b_indices.append(random.randint(0,self.pop_size-1))
+            self.b_indices.append(self.rng.randint(0,self.pop_size-1))
 
         # keep mutating until a SARS varient has been found
         while self.total_completed <10:
@@ -55,7 +57,7 @@ class SpikeDataCollector:
                         # only collect history of the first 50 as it killed my computer before 
                         if len(self.average_mutations_dead) < 1000:
                             self.average_mutations_dead.append(len(self.population[i].history)-1)
-                        self.population[i] = Spike()
+                        self.population[i] = Spike(rng=self.rng)
                         dead_before = self.total_dead
                         self.total_dead += 1
                         if self.total_dead< dead_before:
@@ -79,7 +81,7 @@ class SpikeDataCollector:
                     self.total_completed += 1
                     print("found 1")
                     print("history: " + str(self.population[i].history))
-                    self.population[i] = Spike()
+                    self.population[i] = Spike(rng=self.rng)
 
             self.total_mutations += 1
 
@@ -9,12 +9,25 @@ from genetic_code import *
 import random
 import copy
 
+"""
+Returns the random stream for rng: the global random module if it is None, a random.Random seeded with rng
+if it is a seed, or rng itself if it already is a random.Random.
+"""
+def randomStream(rng=None):
+    if rng is None:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    return random.Random(rng)
+
 """
 This class encapsulates a spike protein. it contains a 15 nucleotide RNA strand of bases.
 It will also keep track of the genome mappings as will with a 5 letter string as amino acids
+rng is a seed or random.Random for the codons and mutations, without it the global random state is used.
 """
 class Spike:
-    def __init__(self, amino_Acids = "LFQQN"):
+    def __init__(self, amino_Acids = "LFQQN", rng = None):
+        self.__rng = randomStream(rng)
 
         if(len(amino_Acids) != 5):
             raise AssertionError
@@ -44,7 +57,7 @@ class Spike:
     def __randomCodonFromAcid(self, acid):
         codons = amino_acid_codons[acid.upper()]
         # pick a random codon from the list that codes the amino acid
-        codon = codons[random.randint(0,len(codons)-1)]
+        codon = codons[self.__rng.randint(0,len(codons)-1)]
         return codon
 
     """
@@ -53,12 +66,12 @@ class Spike:
     """
     def mutate(self):
         # first mutate a random position
-        mutation_index = random.randint(0,len(self.__RNA_Strand)-1)
+        mutation_index = self.__rng.randint(0,len(self.__RNA_Strand)-1)
 
         current_base_at_index  = self.__RNA_Strand[mutation_index]
         new_base = copy.deepcopy(current_base_at_index)
         while(new_base == current_base_at_index):
-            new_base = bases[random.randint(0,len(bases)-1)]
+            new_base = bases[self.__rng.randint(0,len(bases)-1)]
         self.__RNA_Strand = self.__RNA_Strand[:mutation_index] +new_base+self.__RNA_Strand[mutation_index+1:] 
         # now recode the acid for that location
         amino_acids_index = int(mutation_index/3)
@@ -0,0 +1,80 @@
+"""
+ Sampling layer that decides whether random events with probability P happen (Bernoulli trials),
+ for the stochastic rules of the CA (see CA2dSIRDynamics).
+ Uniform random numbers are drawn in large blocks from the simulation's own numpy Generator:
+   - sample() decides a single event, for the per cell loop of iterateCABoard(). It only takes the
+     next number of the current block, so there is no numpy call per cell.
+   - sampleMany() decides a whole array of events at once, for the vectorized engines.
+ An event happens when its uniform number in [0,1) is below P, so P is used exactly (no fractions).
+ The numbers come one after the other from the stream, for numbers that depend on the cells instead (so a
+ board stepped in tiles gets the same numbers) see CARandom.CounterSampler.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CARandom import generatorFrom
+
+class BernoulliSampler:
+    # how many uniform numbers sample() draws at a time.
+    _blockSize = 1 << 16
+
+    def __init__(self, generator=None, blockSize=_blockSize):
+        # a numpy Generator or a seed, by default the generator is seeded from numpy's global random
+        # state, so np.random.seed() still reproduces a whole run (see CARandom.generatorFrom()).
+        self.generator = generatorFrom(generator)
+        self.blockSize = blockSize
+        # private member vars: current block of uniform numbers (python floats) and position in it.
+        self.__block = []
+        self.__position = 0
+
+    """
+     The numbers of a stream don't depend on the cells they are drawn for, so the position of the next
+     draws (see CARandom.CounterSampler.setPosition()) is ignored.
+    """
+    def setPosition(self, generation, rows=0, cols=0, members=0):
+        pass
+
+    """
+     Returns True/False with probability percent of True.
+    """
+    def sample(self, percent):
+        # certain events don't need a random number.
+        if (percent <= 0):
+            return False
+        if (percent >= 1):
+            return True
+
+        if (self.__position == len(self.__block)):
+            self.__block = self.generator.random(self.blockSize).tolist()
+            self.__position = 0
+        randNum = self.__block[self.__position]
+        self.__position += 1
+
+        return randNum < percent
+
+    """
+     Returns an array of uniform random numbers in [0,1) of the given shape.
+    """
+    def uniforms(self, shape):
+        return self.generator.random(shape)
+
+    """
+     Returns a boolean array, each entry is True with the probability at the same place in percents.
+    """
+    def sampleMany(self, percents):
+        return self.uniforms(np.shape(percents)) < percents
+
+    """
+     Returns the state of the sampler: the state of its generator and the numbers left in the current
+     block, so a run can be saved and resumed exactly (see CASnapshot).
+    """
+    def getState(self):
+        return self.generator.bit_generator.state, np.array(self.__block[self.__position:], dtype=np.float64)
+
+    """
+     Sets the state of the sampler to a state returned by getState().
+    """
+    def setState(self, generatorState, block):
+        self.generator.bit_generator.state = generatorState
+        self.__block = np.asarray(block, dtype=np.float64).tolist()
+        self.__position = 0
@@ -0,0 +1,162 @@
+"""
+ Bitboard engine for the deterministic rules of the CA (see CA2dSIRDynamics, ruleTypeIsDeterministic=True).
+ With the deterministic rules:
+   - S becomes I when any of its 9 cells is I: that is a dilation of the I cells by one cell.
+   - I becomes R when all of its 9 cells are I: that is an erosion of the I cells by one cell.
+ So instead of looking up every cell, the I and R cells are kept as bit planes (one bit per cell, each row
+ packed into uint64 words) and a generation is a handful of word-level shifts, ORs and ANDs over the planes,
+ 64 cells per operation. I' and R' cells never change with these rules (they are only kept as a plane of
+ cells that can't become infected). Fixed edges (the cells past the edges are never I) and periodic edges
+ (the planes wrap around) are both supported.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+
+"""
+ Private helper, number of set bits of each word of a plane.
+"""
+def _popcount(plane):
+    if (hasattr(np, "bitwise_count")):
+        return np.bitwise_count(plane)
+    return np.unpackbits(plane.view(np.uint8)).reshape(plane.shape + (64,)).sum(axis=-1)
+
+class CA2dBitboardEngine:
+    def __init__(self, ca=None):
+        if (ca is not None and not ca.isDeterministic):
+            errMessage = "The bitboard engine only supports deterministic rules."
+            raise Exception(errMessage)
+        self.ca = ca
+        self.periodic = ca is not None and ca.boundary == "periodic"
+        self.generation = 0
+        # private member vars: the board size, the I, R, I' and R' planes, the plane of the cells that never
+        # change (I' and R') and the row of the cells that are on the board (the bits past the last column
+        # of a row are always 0).
+        self.__rows = 0
+        self.__cols = 0
+        self.__infected = None
+        self.__recovered = None
+        self.__iPrime = None
+        self.__rPrime = None
+        self.__frozen = None
+        self.__onBoard = None
+
+    """
+     Private helpers to go between a boolean array of the board size and a plane.
+    """
+    def __pack(self, mask):
+        words = (self.__cols + 63) // 64
+        padded = np.zeros((self.__rows, words*64), dtype=bool)
+        padded[:, :self.__cols] = mask
+        return np.packbits(padded, axis=1, bitorder="little").view("<u8").astype(np.uint64)
+
+    def __unpack(self, plane):
+        bits = np.unpackbits(plane.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        return bits[:, :self.__cols].astype(bool)
+
+    """
+     Sets the board to the given numpy array of state codes.
+    """
+    def setStates(self, states):
+        self.__rows, self.__cols = states.shape
+        self.__infected = self.__pack(states == 1)
+        self.__recovered = self.__pack(states == 2)
+        self.__iPrime = self.__pack(states == 3)
+        self.__rPrime = self.__pack(states == 4)
+        self.__frozen = self.__iPrime | self.__rPrime
+        self.__onBoard = self.__pack(np.ones(states.shape, dtype=bool))[:1]
+
+    """
+     Gets the board as a numpy uint8 array of state codes.
+    """
+    def getStates(self):
+        states = np.zeros((self.__rows, self.__cols), dtype=np.uint8)
+        states[self.__unpack(self.__infected)] = 1
+        states[self.__unpack(self.__recovered)] = 2
+        states[self.__unpack(self.__iPrime)] = 3
+        states[self.__unpack(self.__rPrime)] = 4
+        return states
+
+    """
+     Private helpers, the plane of the west (column c-1) and east (column c+1) neighbors of every cell.
+     Bits move across the words of a row, with periodic edges the first and last columns are neighbors.
+    """
+    def __west(self, plane):
+        shifted = plane << np.uint64(1)
+        shifted[:, 1:] |= plane[:, :-1] >> np.uint64(63)
+        if (self.periodic):
+            lastCol = self.__cols-1
+            shifted[:, 0] |= (plane[:, lastCol // 64] >> np.uint64(lastCol % 64)) & np.uint64(1)
+        return shifted & self.__onBoard
+
+    def __east(self, plane):
+        shifted = plane >> np.uint64(1)
+        shifted[:, :-1] |= plane[:, 1:] << np.uint64(63)
+        if (self.periodic):
+            lastCol = self.__cols-1
+            shifted[:, lastCol // 64] |= (plane[:, 0] & np.uint64(1)) << np.uint64(lastCol % 64)
+        return shifted & self.__onBoard
+
+    """
+     Private helpers, the plane of the north (row r-1) and south (row r+1) neighbors of every cell.
+     The rows wrap around only if wrap is set, otherwise the rows past the first and last are never I.
+    """
+    def __north(self, plane, wrap):
+        if (wrap):
+            return np.roll(plane, 1, axis=0)
+        shifted = np.zeros_like(plane)
+        shifted[1:] = plane[:-1]
+        return shifted
+
+    def __south(self, plane, wrap):
+        if (wrap):
+            return np.roll(plane, -1, axis=0)
+        shifted = np.zeros_like(plane)
+        shifted[:-1] = plane[1:]
+        return shifted
+
+    """
+     Advances the board the given number of generations. Only the rows from one above the first row with
+     an I to one below the last one can change, so only those are computed.
+    """
+    def advance(self, generations=1):
+        for g in range(0,generations):
+            rowsWithInfected = np.nonzero(self.__infected.any(axis=1))[0]
+            if (len(rowsWithInfected) == 0):
+                # nothing can change anymore.
+                break
+            start = rowsWithInfected[0]-1
+            stop = rowsWithInfected[-1]+2
+            # with periodic edges, the rows only wrap if the window reaches an edge (then it is the whole board).
+            wrap = self.periodic and (start < 0 or stop > self.__rows)
+            if (wrap):
+                start, stop = 0, self.__rows
+            start, stop = max(start, 0), min(stop, self.__rows)
+
+            infected = self.__infected[start:stop]
+            recovered = self.__recovered[start:stop]
+            # any I in the 3x3 neighborhood (dilation) and all 9 cells I (erosion), rows first then columns.
+            west = self.__west(infected)
+            east = self.__east(infected)
+            rowAny = infected | west | east
+            rowAll = infected & west & east
+            anyInfected = rowAny | self.__north(rowAny, wrap) | self.__south(rowAny, wrap)
+            allInfected = rowAll & self.__north(rowAll, wrap) & self.__south(rowAll, wrap)
+
+            susceptible = self.__onBoard & ~(infected | recovered | self.__frozen[start:stop])
+            self.__recovered[start:stop] = recovered | allInfected
+            self.__infected[start:stop] = (infected & ~allInfected) | (anyInfected & susceptible)
+        self.generation += generations
+
+    """
+     Number of cells in each state as a dict keyed by the state chars (like CABoard.counts()), from the
+     number of set bits of the planes.
+    """
+    def counts(self):
+        infected = int(_popcount(self.__infected).sum())
+        recovered = int(_popcount(self.__recovered).sum())
+        iPrime = int(_popcount(self.__iPrime).sum())
+        rPrime = int(_popcount(self.__rPrime).sum())
+        susceptible = self.__rows*self.__cols - infected - recovered - iPrime - rPrime
+        return {"S": susceptible, "I": infected, "R": recovered, "i": iPrime, "r": rPrime}
@@ -4,7 +4,6 @@
 """
 
 import wx 
-import secondVariantRuleGA 
 from CABoard import *
 from CA2dSIRDynamics import CA2dSIRDynamics
 
@@ -107,7 +106,7 @@ class CABoardPanel(wx.Panel):
                     dc.DrawRectangle(x*blockSizeW+self.widthRemainder/2,y*blockSizeH+self.heightRemainder/2,blockSizeW,blockSizeH)
         
         # done with this iteration, do it again, update the iteration statusBar.
-        board = self.ca.iterateCABoard().getBoard()
+        board = self.ca.iterateCABoard(snapshot=False).getBoard()
         i += 1
         self.statusBar.SetStatusText("Iteration = " + str(i))
 
@@ -125,7 +124,7 @@ def main():
 
     if (simulation == str(1)):
         boardObj = CABoard()
-        ca = CA2dSIRDynamics(boardObj)
+        ca = CA2dSIRDynamics(boardObj, engine="timeline")
 
     elif (simulation == str(2)):
         boardObj = CABoard()
@@ -138,7 +137,9 @@ def main():
     elif (simulation == str(4)):
         boardObj = CABoard(isBoardRandom=True)
         ca = CA2dSIRDynamics(boardObj,diseaseVariants=2,ruleTypeIsDeterministic=False)
-        ca.nonDeterministicRule2ndVar = secondVariantRuleGA.ruleFor2ndVariant
+        # only load the GA's solution when it is used.
+        import GASolution
+        ca.nonDeterministicRule2ndVar, solutionMeta = GASolution.loadSolution()
 
     else:
         errMessage = "Invalid user input: {}. Please select values from 1 to 4 again.".format(simulation)
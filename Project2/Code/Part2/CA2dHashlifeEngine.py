@@ -0,0 +1,296 @@
+"""
+ Hashlife engine for the deterministic rules of the CA (see CA2dSIRDynamics, ruleTypeIsDeterministic=True).
+ The deterministic rule is fixed and only looks at the 3x3 neighborhood, so two equal regions of the board
+ evolve the same way. The board is held as a quadtree where equal blocks are the same node (hash-consing):
+   - a node of level k is a 2^k x 2^k block made of 4 nodes of level k-1 (nw, ne, sw, se), a node of level 0
+     is a single cell (its state code, see CABoard._states).
+   - the future of a node (its center block 2^(j) generations later) is computed once and cached, so the big
+     all S / all R areas and the repeating shapes of the epidemic front are computed only once.
+   - advance() jumps 2^j generations with one lookup of the root's future, so any number of generations
+     takes a few jumps (one per bit of the number).
+ The board is embedded in a universe of out of bounds cells (CARuleTables.outOfBoundsState), which never
+ change, so the cells on the edges of the board see the same out of bounds neighbors as with the other
+ engines (fixed edges only).
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+from CARuleTables import outOfBoundsState, variantView, sharedTable
+
+class _Node:
+    __slots__ = ("level", "nw", "ne", "sw", "se", "counts", "uniform", "cells")
+
+    def __init__(self, level, nw, ne, sw, se, counts, uniform):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        # number of cells of each state code (0..5) in the block, the state code if all the cells are in the
+        # same state (None otherwise) and the cells as a numpy array (built when needed, small nodes only).
+        self.counts = counts
+        self.uniform = uniform
+        self.cells = None
+
+class CA2dHashlifeEngine:
+    # nodes up to this level keep their cells as an array once they were looked at (see getStates()).
+    _cellsLevel = 3
+
+    def __init__(self, ca=None):
+        if (ca is not None and (not ca.isDeterministic or ca.boundary != "fixed")):
+            errMessage = "The hashlife engine only supports deterministic rules with fixed edges."
+            raise Exception(errMessage)
+        self.ca = ca
+        self.rule = sharedTable("deterministic")
+        self.generation = 0
+        # private member vars: the hash-consing table (children -> node), the cached futures ((node, j) -> node),
+        # the uniform nodes ((state, level) -> node), the root node and where the board is in it.
+        self.__nodes = {}
+        self.__results = {}
+        self.__uniformNodes = {}
+        self.__root = None
+        self.__origin = (0, 0)
+        self.__shape = (0, 0)
+
+    """
+     Private helper that returns the node of the given children (levels 0 children are state codes).
+    """
+    def __join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self.__nodes.get(key)
+        if (node is not None):
+            return node
+
+        if (isinstance(nw, _Node)):
+            level = nw.level + 1
+            counts = tuple(a+b+c+d for a, b, c, d in zip(nw.counts, ne.counts, sw.counts, se.counts))
+            uniform = nw.uniform if (nw.uniform is not None and nw.uniform == ne.uniform == sw.uniform == se.uniform) else None
+        else:
+            level = 1
+            counts = [0]*6
+            for cell in key:
+                counts[cell] += 1
+            counts = tuple(counts)
+            uniform = nw if nw == ne == sw == se else None
+        node = _Node(level, nw, ne, sw, se, counts, uniform)
+        self.__nodes[key] = node
+        return node
+
+    """
+     Private helper, the node of the given level with every cell in the given state.
+    """
+    def __uniformNode(self, state, level):
+        key = (state, level)
+        if (key not in self.__uniformNodes):
+            if (level == 0):
+                return state
+            child = self.__uniformNode(state, level-1)
+            self.__uniformNodes[key] = self.__join(child, child, child, child)
+        return self.__uniformNodes[key]
+
+    """
+     Private helpers for the level k-1 nodes straddling two (or four) level k-1 nodes.
+    """
+    def __horizontal(self, west, east):
+        return self.__join(west.ne, east.nw, west.se, east.sw)
+
+    def __vertical(self, north, south):
+        return self.__join(north.sw, north.se, south.nw, south.ne)
+
+    def __center(self, node):
+        return self.__join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    """
+     Private helper, the next state of the center cell of a 3x3 neighborhood (list of 9 state codes, row by row).
+    """
+    def __nextCell(self, cells):
+        center = cells[4]
+        # only S, I and R follow the rules, other states (and out of bounds cells) stay as they are.
+        if (center > 2):
+            return center
+        view = variantView[1]
+        code = 0
+        for cell in cells:
+            code = code*4 + int(view[cell])
+        return int(self.rule[code])
+
+    """
+     Private helper for the base case: the center 2x2 cells of a level 2 node (4x4 cells), one generation later.
+    """
+    def __baseResult(self, node):
+        grid = [[0]*4 for r in range(0,4)]
+        for quadrant, (rowOffset, colOffset) in ((node.nw, (0, 0)), (node.ne, (0, 2)), (node.sw, (2, 0)), (node.se, (2, 2))):
+            grid[rowOffset][colOffset] = quadrant.nw
+            grid[rowOffset][colOffset+1] = quadrant.ne
+            grid[rowOffset+1][colOffset] = quadrant.sw
+            grid[rowOffset+1][colOffset+1] = quadrant.se
+        next = []
+        for r in (1, 2):
+            for c in (1, 2):
+                next.append(self.__nextCell([grid[r+rowOffset][c+colOffset] for rowOffset in (-1, 0, 1) for colOffset in (-1, 0, 1)]))
+        return self.__join(*next)
+
+    """
+     Private helper that returns the center block of a node of level k (a node of level k-1) advanced 2^j
+     generations, j has to be at most k-2. The futures are cached.
+    """
+    def __result(self, node, j):
+        key = (node, j)
+        cached = self.__results.get(key)
+        if (cached is not None):
+            return cached
+
+        if (node.uniform is not None and node.uniform != 1):
+            # S without any I next to it, R, I', R' and out of bounds cells never change.
+            result = self.__uniformNode(node.uniform, node.level-1)
+        elif (node.level == 2):
+            result = self.__baseResult(node)
+        else:
+            # the 9 overlapping nodes of level k-1 covering the node.
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            parts = [[nw, self.__horizontal(nw, ne), ne],
+                     [self.__vertical(nw, sw), self.__center(node), self.__vertical(ne, se)],
+                     [sw, self.__horizontal(sw, se), se]]
+            if (j == node.level-2):
+                # two halves of 2^(k-3) generations each.
+                parts = [[self.__result(part, j-1) for part in row] for row in parts]
+                half = j-1
+            else:
+                # j is smaller, the 9 centers are not advanced, all the generations are done below.
+                parts = [[self.__center(part) for part in row] for row in parts]
+                half = j
+            quadrants = []
+            for r in (0, 1):
+                for c in (0, 1):
+                    quadrant = self.__join(parts[r][c], parts[r][c+1], parts[r+1][c], parts[r+1][c+1])
+                    quadrants.append(self.__result(quadrant, half))
+            result = self.__join(*quadrants)
+
+        self.__results[key] = result
+        return result
+
+    """
+     Private helper that puts the root in the center of a root twice as big (the rest is out of bounds).
+    """
+    def __expand(self):
+        root = self.__root
+        border = self.__uniformNode(outOfBoundsState, root.level-1)
+        self.__root = self.__join(self.__join(border, border, border, root.nw),
+                                  self.__join(border, border, root.ne, border),
+                                  self.__join(border, root.sw, border, border),
+                                  self.__join(root.se, border, border, border))
+        shift = 1 << (root.level-1)
+        self.__origin = (self.__origin[0]+shift, self.__origin[1]+shift)
+
+    """
+     Sets the board to the given numpy array of state codes. The quadtree is built level by level:
+     the equal blocks of a level are found with numpy, so only one node is built per distinct block.
+    """
+    def setStates(self, states):
+        rows, cols = states.shape
+        level = 2
+        while ((1 << level) < max(rows, cols)):
+            level += 1
+        size = 1 << level
+        ids = np.full((size, size), outOfBoundsState, dtype=np.int64)
+        ids[:rows, :cols] = states
+        # the nodes of the current level, by id (level 0 nodes are the state codes).
+        nodes = list(range(0, outOfBoundsState+1))
+        while (len(ids) > 1):
+            quadrants = [ids[0::2, 0::2], ids[0::2, 1::2], ids[1::2, 0::2], ids[1::2, 1::2]]
+            count = len(nodes)
+            if (count**4 < 2**62):
+                # the 4 ids of a block packed into one integer, much faster to sort than rows of 4.
+                keys = ((quadrants[0]*count + quadrants[1])*count + quadrants[2])*count + quadrants[3]
+                distinct, inverse = np.unique(keys.ravel(), return_inverse=True)
+                distinct, d = np.divmod(distinct, count)
+                distinct, c = np.divmod(distinct, count)
+                a, b = np.divmod(distinct, count)
+                distinct = np.stack([a, b, c, d], axis=-1)
+            else:
+                distinct, inverse = np.unique(np.stack(quadrants, axis=-1).reshape(-1, 4), axis=0, return_inverse=True)
+            nodes = [self.__join(nodes[a], nodes[b], nodes[c], nodes[d]) for a, b, c, d in distinct.tolist()]
+            ids = inverse.reshape(quadrants[0].shape)
+        self.__root = nodes[ids[0, 0]]
+        self.__origin = (0, 0)
+        self.__shape = (rows, cols)
+
+    """
+     Advances the board the given number of generations, one jump of 2^j generations per bit of generations.
+    """
+    def advance(self, generations=1):
+        self.generation += generations
+        j = 0
+        while (generations > 0):
+            if (generations & 1):
+                # the result of a node of level k is its center advanced up to 2^(k-2) generations: grow
+                # the root until it can jump 2^j generations, and once more so its result is the whole root.
+                while (self.__root.level < j+1):
+                    self.__expand()
+                self.__expand()
+                self.__root = self.__result(self.__root, j)
+                shift = 1 << (self.__root.level-1)
+                self.__origin = (self.__origin[0]-shift, self.__origin[1]-shift)
+            generations >>= 1
+            j += 1
+
+    """
+     Private helper that returns the cells of a small node as a numpy array (cached on the node).
+    """
+    def __cells(self, node):
+        if (not isinstance(node, _Node)):
+            return np.full((1, 1), node, dtype=np.uint8)
+        if (node.cells is None):
+            node.cells = np.block([[self.__cells(node.nw), self.__cells(node.ne)], [self.__cells(node.sw), self.__cells(node.se)]])
+        return node.cells
+
+    """
+     Private helper that writes the part of the node (whose upper left cell is at (top, left)) that is on the
+     board into states.
+    """
+    def __fill(self, states, node, top, left):
+        rows, cols = states.shape
+        size = 1 << node.level if isinstance(node, _Node) else 1
+        if (top >= rows or left >= cols or top+size <= 0 or left+size <= 0):
+            return
+        rowStart, colStart = max(top, 0), max(left, 0)
+        rowStop, colStop = min(top+size, rows), min(left+size, cols)
+        if (isinstance(node, _Node) and node.uniform is None and node.level > CA2dHashlifeEngine._cellsLevel):
+            half = size >> 1
+            self.__fill(states, node.nw, top, left)
+            self.__fill(states, node.ne, top, left+half)
+            self.__fill(states, node.sw, top+half, left)
+            self.__fill(states, node.se, top+half, left+half)
+        elif (isinstance(node, _Node) and node.uniform is not None):
+            states[rowStart:rowStop, colStart:colStop] = node.uniform
+        else:
+            cells = self.__cells(node)
+            states[rowStart:rowStop, colStart:colStop] = cells[rowStart-top:rowStop-top, colStart-left:colStop-left]
+
+    """
+     Gets the board as a numpy uint8 array of state codes.
+    """
+    def getStates(self):
+        states = np.empty(self.__shape, dtype=np.uint8)
+        self.__fill(states, self.__root, -self.__origin[0], -self.__origin[1])
+        return states
+
+    """
+     Number of cells in each state as a dict keyed by the state chars (like CABoard.counts()), without
+     looking at the cells (every node knows its counts).
+    """
+    def counts(self):
+        return dict(zip(CABoard._states, self.__root.counts[:5]))
+
+    """
+     Number of nodes and cached futures, and a way to free them when they take too much memory (the current
+     board is kept, only the caches are emptied).
+    """
+    def cacheSize(self):
+        return len(self.__nodes), len(self.__results)
+
+    def clearCache(self):
+        self.__nodes = {}
+        self.__results = {}
+        self.__uniformNodes = {}
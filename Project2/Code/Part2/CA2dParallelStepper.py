@@ -0,0 +1,277 @@
+"""
+ Multi-process stepping of one large CA board (see CA2dSIRDynamics). The board is split into bands
+ of rows, every band lives in its own multiprocessing.shared_memory segment and is stepped by its
+ own worker process with CA2dVectorizedEngine.stepPadded().
+ Each band segment holds two padded copies of the band (ping-pong buffers, one is read while the
+ next generation is written to the other). The padding rows are the halo: after each generation,
+ a worker writes its first and last rows into the halo rows of the bands above and below it, and
+ all workers wait on a barrier before starting the next generation.
+ The random numbers of a band come from its own stream, seeded by (seed, band, generation), so the
+ result only depends on the seed and the number of bands: stepping the same bands in this process
+ (processes=False) gives exactly the same boards as stepping them with worker processes.
+ If the stepped CA has a counter based sampler (see CARandom.CounterSampler), the bands use it instead:
+ every cell gets the numbers of its position, so the result does not even depend on the number of bands
+ and is bit-identical to stepping the CA itself with the numpy engine.
+ All three rule modes are supported (deterministic, 1-variant and 2-variant non-deterministic), with
+ fixed or periodic edges (see CABoard.padStates()).
+ The segments and worker processes are released by close(), at the end of a with block (even if stepping
+ failed) or, if the stepper is dropped without being closed, when it is garbage collected, so no segment
+ is left behind in /dev/shm. A worker that fails or dies makes run() raise instead of hanging: the barrier
+ is broken so the other workers stop waiting for it (they give up on their own after barrierTimeout seconds).
+ Implemented by: Anas Gauba
+"""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import weakref
+import numpy as np
+from CABoard import padStates
+from CARuleTables import outOfBoundsState
+from BernoulliSampler import BernoulliSampler
+from CARandom import CounterSampler
+from CA2dSIRDynamics import CA2dSIRDynamics
+from CA2dVectorizedEngine import CA2dVectorizedEngine
+
+"""
+ Private helper that builds the engine stepping the bands: a board-less CA with the same rules as the
+ stepped CA (its sampler is replaced by each band's stream, so the stepped CA's own sampler is untouched,
+ or with counterSeed by a counter based sampler with the same seed as the stepped CA's).
+ The CA gets a fixed seed (its 2nd variant table is replaced by the stepped CA's), so building it never
+ draws from the global np.random stream.
+"""
+def _bandEngine(variants, isDeterministic, secondVariantRule, boundary, counterSeed=None):
+    ca = CA2dSIRDynamics(None, diseaseVariants=variants, ruleTypeIsDeterministic=isDeterministic, boundary=boundary, rng=0)
+    if (secondVariantRule is not None):
+        ca.nonDeterministicRule2ndVar = secondVariantRule
+    if (counterSeed is not None):
+        ca.sampler = CounterSampler(counterSeed)
+    return CA2dVectorizedEngine(ca)
+
+"""
+ Private helper that returns the two padded buffers (numpy views) of a band segment.
+"""
+def _bandBuffers(segment, bandRows, cols):
+    return np.ndarray((2, bandRows+2, cols+2), dtype=np.uint8, buffer=segment.buf)
+
+"""
+ Private helper that steps one generation of one band: reads buffer generation%2 and writes buffer
+ (generation+1)%2, then copies its edge rows into the halo rows of its neighbor bands.
+ buffers are the buffers of all the bands (only the neighbors' are written), bandStart is the first row
+ of the band on the board.
+"""
+def _stepBand(engine, seed, band, bandStart, generation, buffers):
+    current = buffers[band][generation % 2]
+    next = buffers[band][(generation+1) % 2]
+    interior = current[1:-1, 1:-1]
+
+    # a band without infected cells in it or its halo does not change.
+    if (((current == 1) | (current == 3)).any()):
+        engine.ca.generation = generation+1
+        if (not isinstance(engine.ca.sampler, CounterSampler)):
+            engine.ca.sampler = BernoulliSampler(np.random.default_rng([seed, band, generation]))
+        next[1:-1, 1:-1] = engine.stepPadded(current, bandStart)
+    else:
+        next[1:-1, 1:-1] = interior
+
+    # with periodic edges, the ghost columns are the band's own wrapped columns and the
+    # first and last bands are neighbors.
+    periodic = engine.ca.boundary == "periodic"
+    if (periodic):
+        next[1:-1, 0] = next[1:-1, -2]
+        next[1:-1, -1] = next[1:-1, 1]
+
+    # halo exchange (whole rows, with their ghost columns).
+    if (band > 0 or periodic):
+        buffers[band-1][(generation+1) % 2][-1] = next[1]
+    if (band < len(buffers)-1 or periodic):
+        buffers[(band+1) % len(buffers)][(generation+1) % 2][0] = next[-2]
+
+"""
+ Private main loop of a worker process: attaches to the band segments, then steps its band
+ as many generations as it is asked to, until it is told to stop. If stepping fails (or the other workers
+ don't get to the barrier within barrierTimeout seconds), it breaks the barrier, sends the error to the
+ parent and quits.
+"""
+def _worker(band, segmentNames, bandRows, cols, ruleSpecs, secondVariantRule, seed, barrier, barrierTimeout, conn):
+    segments = [shared_memory.SharedMemory(name=name) for name in segmentNames]
+    buffers = [_bandBuffers(segments[i], bandRows[i], cols) for i in range(0,len(segments))]
+    engine = _bandEngine(ruleSpecs[0], ruleSpecs[1], secondVariantRule, ruleSpecs[2], ruleSpecs[3])
+    bandStart = sum(bandRows[:band])
+
+    while (True):
+        command, generation, count = conn.recv()
+        if (command == "stop"):
+            break
+        try:
+            for g in range(generation, generation+count):
+                _stepBand(engine, seed, band, bandStart, g, buffers)
+                barrier.wait(barrierTimeout)
+        except Exception as error:
+            # the other workers stop waiting for this one too.
+            barrier.abort()
+            conn.send("band {} failed: {!r}".format(band, error))
+            break
+        conn.send("done")
+
+    del buffers
+    for segment in segments:
+        segment.close()
+
+"""
+ Private helper that stops the workers (the ones that don't stop, e.g. stuck at a broken barrier, are
+ terminated) and frees the shared memory segments. It only gets the lists of workers and segments, not the
+ stepper, so it can be the stepper's finalizer.
+"""
+def _release(workers, segments):
+    for worker, conn in workers:
+        try:
+            conn.send(("stop", 0, 0))
+        except (OSError, ValueError):
+            # the worker is already gone.
+            pass
+    for worker, conn in workers:
+        worker.join(timeout=5)
+        if (worker.is_alive()):
+            worker.terminate()
+            worker.join()
+    del workers[:]
+    for segment in segments:
+        try:
+            segment.close()
+        except BufferError:
+            # numpy views of the segment are still alive, unlinking it is enough to free it once they are gone.
+            pass
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+    del segments[:]
+
+class CA2dParallelStepper:
+    def __init__(self, ca, bands=4, seed=0, processes=True, barrierTimeout=600):
+        self.ca = ca
+        self.seed = seed
+        self.processes = processes
+        # seconds a worker waits for the others at the end of a generation before giving up (see _worker()).
+        self.barrierTimeout = barrierTimeout
+        # the generations go on from the CA's (and are given back to it, see run()).
+        self.generation = ca.generation
+        # bands with the CA's own numbers if they depend on the cells (see CARandom.CounterSampler).
+        counterSeed = ca.sampler.seed if isinstance(ca.sampler, CounterSampler) else None
+
+        states = ca.currentBoard.getStates()
+        rows, self.cols = states.shape
+        bands = min(bands, rows)
+        # split the rows as evenly as possible between the bands.
+        bounds = np.linspace(0, rows, bands+1).astype(int)
+        self.bandStarts = bounds[:-1]
+        self.bandRows = [int(n) for n in np.diff(bounds)]
+
+        # the segments and workers are released by close(), or by the finalizer if the stepper is dropped.
+        self.segments = []
+        self.workers = []
+        self.buffers = []
+        self.__finalizer = weakref.finalize(self, _release, self.workers, self.segments)
+        try:
+            # one shared memory segment per band, with both of its padded buffers.
+            for n in self.bandRows:
+                self.segments.append(shared_memory.SharedMemory(create=True, size=2*(n+2)*(self.cols+2)))
+            self.buffers = [_bandBuffers(self.segments[i], self.bandRows[i], self.cols) for i in range(0,bands)]
+            self.setStates(states)
+
+            if (self.processes):
+                self.barrier = mp.Barrier(bands)
+                segmentNames = [segment.name for segment in self.segments]
+                ruleSpecs = (ca.variants, ca.isDeterministic, ca.boundary, counterSeed)
+                for band in range(0,bands):
+                    parentConn, childConn = mp.Pipe()
+                    worker = mp.Process(target=_worker, args=(band, segmentNames, self.bandRows, self.cols, ruleSpecs, ca.nonDeterministicRule2ndVar,
+                                                              seed, self.barrier, barrierTimeout, childConn), daemon=True)
+                    worker.start()
+                    # only the worker keeps its end open, so recv() gets an EOFError if the worker dies.
+                    childConn.close()
+                    self.workers.append((worker, parentConn))
+            else:
+                self.engine = _bandEngine(ca.variants, ca.isDeterministic, ca.nonDeterministicRule2ndVar, ca.boundary, counterSeed)
+        except BaseException:
+            # don't leave the segments (and the workers already started) behind.
+            self.close()
+            raise
+
+    """
+     Writes the given board (numpy array of state codes) into the bands, with their halo rows.
+    """
+    def setStates(self, states):
+        current = self.generation % 2
+        # the rows of a band in the padded board are the band and its halo rows.
+        padded = padStates(states, self.ca.boundary)
+        for band, buffer in enumerate(self.buffers):
+            start = self.bandStarts[band]
+            buffer[current] = padded[start:start+self.bandRows[band]+2]
+            # the other buffer only needs its out of bounds padding (all of its cells get written with periodic edges).
+            buffer[1-current].fill(outOfBoundsState)
+
+    """
+     Gathers the bands into one numpy array of state codes.
+    """
+    def getStates(self):
+        current = self.generation % 2
+        return np.concatenate([buffer[current][1:-1, 1:-1] for buffer in self.buffers])
+
+    """
+     Steps the board count generations and sets the resulting board as the CA's current board.
+     Raises an exception if a worker failed or died (the stepper can only be closed after that).
+    """
+    def run(self, count=1):
+        if (self.processes):
+            errors = []
+            stepping = []
+            for band, (worker, conn) in enumerate(self.workers):
+                try:
+                    conn.send(("step", self.generation, count))
+                    stepping.append((band, worker, conn))
+                except OSError:
+                    errors.append("band {} worker is gone (exit code {})".format(band, worker.exitcode))
+            if (len(errors) > 0):
+                self.barrier.abort()
+            # wait for the replies, or for workers dying without one (the others then stop waiting for
+            # them at the barrier right away).
+            while (len(stepping) > 0):
+                ready = wait([conn for band, worker, conn in stepping] + [worker.sentinel for band, worker, conn in stepping])
+                for band, worker, conn in [entry for entry in stepping if entry[2] in ready or entry[1].sentinel in ready]:
+                    stepping.remove((band, worker, conn))
+                    try:
+                        reply = conn.recv()
+                    except EOFError:
+                        self.barrier.abort()
+                        worker.join(timeout=5)
+                        reply = "band {} worker died (exit code {})".format(band, worker.exitcode)
+                    if (reply != "done"):
+                        errors.append(reply)
+            if (len(errors) > 0):
+                errMessage = "Stepping the bands failed: {}".format("; ".join(errors))
+                raise Exception(errMessage)
+        else:
+            for g in range(self.generation, self.generation+count):
+                for band in range(0,len(self.buffers)):
+                    _stepBand(self.engine, self.seed, band, self.bandStarts[band], g, self.buffers)
+        self.generation += count
+        self.ca.generation = self.generation
+
+        self.ca.currentBoard.setStates(self.getStates())
+        return self.ca.currentBoard
+
+    """
+     Stops the workers and frees the shared memory (calling it again does nothing).
+    """
+    def close(self):
+        # the buffers are views of the segments, they have to go before the segments are closed.
+        self.buffers = []
+        self.__finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
@@ -0,0 +1,108 @@
+"""
+ Population-batched engine for the 2-variant CA's of the GA (see GA2dCA). Instead of simulating the
+ CA's one after another, the whole population is held as one (pop, rows, cols) array of state codes
+ (see CABoard._states) plus one (pop, tableSize) array with the 2nd variant rule table of each member
+ (the 1st variant table is the same for all of them), and every still running member is advanced in
+ one vectorized step.
+ A member is done once it has no infected cells (I or I') left. Done members drop out of the batch,
+ so the stragglers don't pay for work that is already done.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import padStates
+from CARuleTables import variantView, sharedTable
+from BernoulliSampler import BernoulliSampler
+from CARandom import generatorFrom
+from CA2dVectorizedEngine import bothVariantsTransition
+
+class CA2dPopulationEngine:
+    def __init__(self, boards, secondVariantRules, sampler=None, boundary="fixed", rng=None):
+        # boards: list (or array) of numpy arrays of state codes, one per member, all of the same size.
+        # secondVariantRules: the 2nd variant rule table of each member, one row per member.
+        self.states = np.array(boards, dtype=np.uint8)
+        self.secondVariantRules = np.asarray(secondVariantRules)
+        self.firstVariantRule = sharedTable("firstVariant")
+        # by default the sampler draws from rng (a numpy Generator or a seed, see CARandom).
+        if (sampler is None):
+            sampler = BernoulliSampler(generatorFrom(rng))
+        self.sampler = sampler
+        # what is past the edges of the boards (see CABoard.padStates()).
+        self.boundary = boundary
+
+        # number of steps each member took so far, the S, I, R, I', R' counts of each member and the
+        # members that still have infected cells.
+        self.steps = np.zeros(len(self.states), dtype=np.int64)
+        self.__counts = self.__countStates(self.states)
+        self.running = np.nonzero(self.__hasInfected(self.__counts))[0]
+
+    """
+     Private helper, which of the members with the given counts still have infected cells.
+    """
+    def __hasInfected(self, counts):
+        return counts[:, 1] + counts[:, 3] > 0
+
+    """
+     Private helper, the S, I, R, I', R' counts of each of the given boards.
+    """
+    def __countStates(self, states):
+        flat = states.reshape(len(states), -1)
+        return np.stack([np.count_nonzero(flat == state, axis=1) for state in range(0,5)], axis=1)
+
+    """
+     Private helper that packs the neighborhood of every cell of every board into its code (see CARuleTables).
+    """
+    def __neighborhoodCodes(self, padded, view):
+        rows = padded.shape[1]-2
+        cols = padded.shape[2]-2
+        codes = np.zeros((len(padded), rows, cols), dtype=np.int32)
+        for rowOffset in range(0,3):
+            for colOffset in range(0,3):
+                codes *= 4
+                codes += view[padded[:, rowOffset:rowOffset+rows, colOffset:colOffset+cols]]
+        return codes
+
+    """
+     Advances every running member by one step. Returns the number of members still running.
+    """
+    def step(self):
+        if (len(self.running) == 0):
+            return 0
+
+        center = self.states[self.running]
+        padded = padStates(center, self.boundary)
+        firstProb = self.firstVariantRule[self.__neighborhoodCodes(padded, variantView[1])]
+        # each member looks its cells up in its own 2nd variant table.
+        secondCodes = self.__neighborhoodCodes(padded, variantView[2])
+        secondProb = self.secondVariantRules[self.running[:, None, None], secondCodes]
+
+        # a counter based sampler gives each cell the numbers of its member, generation and position (see CARandom).
+        rows, cols = center.shape[1:]
+        self.sampler.setPosition(self.steps[self.running, None, None] + 1, np.arange(rows)[:, None], np.arange(cols)[None, :],
+                                 self.running[:, None, None])
+        next = bothVariantsTransition(center, firstProb, secondProb, self.sampler)
+        # the whole batch is stepped anyway, so the running members are simply recounted.
+        self.__counts[self.running] = self.__countStates(next)
+        self.states[self.running] = next
+        self.steps[self.running] += 1
+
+        # drop the members that are done.
+        self.running = self.running[self.__hasInfected(self.__counts[self.running])]
+        return len(self.running)
+
+    """
+     Steps until every member is done (or maxSteps steps). Returns the number of steps of each member.
+    """
+    def run(self, maxSteps=None):
+        stepsTaken = 0
+        while (self.step() > 0):
+            stepsTaken += 1
+            if (maxSteps is not None and stepsTaken >= maxSteps):
+                break
+        return self.steps
+
+    """
+     Returns the S, I, R, I', R' counts of each member, one row per member.
+    """
+    def counts(self):
+        return self.__counts.copy()
@@ -13,24 +13,78 @@
 """
 
 import numpy as np
-import random as rand
-import itertools
 from CABoard import *
-from fractions import Fraction
+from CARuleTables import *
+from CACompactBoard import CACompactBoard
+from CA2dVectorizedEngine import CA2dVectorizedEngine
+from CA2dHashlifeEngine import CA2dHashlifeEngine
+from CA2dBitboardEngine import CA2dBitboardEngine
+from CA2dTimelineEngine import CA2dTimelineEngine
+from BernoulliSampler import BernoulliSampler
+from CARandom import generatorFrom, spawnGenerators
+import CASnapshot
 
 class CA2dSIRDynamics:
+    # engines that can iterate the board: "python" walks every cell, "numpy" computes the whole
+    # generation with array operations (see CA2dVectorizedEngine), "hashlife" reuses the futures of
+    # equal blocks and can jump many generations at once (see CA2dHashlifeEngine, deterministic rules only),
+    # "bitboard" steps bit planes of the I and R cells (see CA2dBitboardEngine, deterministic rules only),
+    # "timeline" computes when every cell changes once and gives the board of any generation without
+    # iterating (see CA2dTimelineEngine, deterministic rules only).
+    _engines = ["python", "numpy", "hashlife", "bitboard", "timeline"]
+    # the engines that keep the board in their own form and only give it back after their generations.
+    _stateEngines = {"hashlife": CA2dHashlifeEngine, "bitboard": CA2dBitboardEngine, "timeline": CA2dTimelineEngine}
+
     # 1st variant can either be deterministic or non-deterministic. 2nd disease variant will be non-deterministic.
-    def __init__(self,board,diseaseVariants=1, rule_bits=9, ruleTypeIsDeterministic=True):
+    def __init__(self,board,diseaseVariants=1, rule_bits=9, ruleTypeIsDeterministic=True, engine="python", sampler=None, boundary="fixed", recorder=None, rng=None):
         # define any instance variables.
         self.rule_bits = rule_bits
         self.currentBoard = board
         self.isDeterministic = ruleTypeIsDeterministic
         self.variants = diseaseVariants
+
+        if (engine not in CA2dSIRDynamics._engines):
+            errMessage = "Invalid engine: {}. Please select one of {}.".format(engine, CA2dSIRDynamics._engines)
+            raise Exception(errMessage)
+        self.engine = engine
+        # what the cells on the edges of the board see past the edge (see CABoard.padStates()).
+        if (boundary not in CABoard._boundaries):
+            errMessage = "Invalid boundary: {}. Please select one of {}.".format(boundary, CABoard._boundaries)
+            raise Exception(errMessage)
+        self.boundary = boundary
+        # built lazily on the first iteration with the numpy engine.
+        self.__vectorizedEngine = None
+        # the "hashlife", "bitboard" or "timeline" engine (they check that they support the rules), with the board it last returned.
+        self.__stateEngine = None
+        self.__stateEngineStates = None
+        if (engine in CA2dSIRDynamics._stateEngines):
+            self.__stateEngine = CA2dSIRDynamics._stateEngines[engine](self)
+        # cells the python engine evaluates in the next iteration. The python engine steps between two
+        # boards it owns (ping-pong buffers, __front is the current generation and __back gets the next one),
+        # plus the current generation padded with its ghost cells. __changedCells are the cells that changed
+        # in the last iteration, the only cells where __back differs from __front.
+        self.__activeCells = set()
+        self.__front = None
+        self.__back = None
+        self.__padded = None
+        self.__changedCells = []
+        # number of iterations done so far (kept in checkpoints, see checkpoint()).
+        self.generation = 0
+        # opt-in time series of the counts of every generation (see CATimeSeries.CATimeSeriesRecorder).
+        self.recorder = recorder
+        # the CA's own random stream (a numpy Generator or a seed, see CARandom) for the 2nd variant
+        # probabilities and the GA's crossover and mutation.
+        self.rng = generatorFrom(rng)
+        # decides the random transitions of the non-deterministic rules (see BernoulliSampler), by default
+        # with a child stream of the CA's stream.
+        if (sampler is None):
+            sampler = BernoulliSampler(spawnGenerators(self.rng, 1)[0])
+        self.sampler = sampler
         
         if (self.variants == 2):
             # probability of S->I' and I'->R' (I' and R' represented in code as i and r)
-            self.__sToIPrimeProb = rand.uniform(0,1)
-            self.__iPrimeToRPrimeProb = rand.uniform(0,1)
+            self.__sToIPrimeProb = self.rng.uniform(0,1)
+            self.__iPrimeToRPrimeProb = self.rng.uniform(0,1)
             #print("s to i prime probability is: " + str(self.__sToIPrimeProb))
             #print("i prime to r prime probability is: " + str(self.__iPrimeToRPrimeProb))
         
@@ -50,6 +104,19 @@ class CA2dSIRDynamics:
         
         return True
 
+    """
+     Private helper that returns a copy of the board curr (list of lists of chars) with a ghost cell layer
+     all around it, like CABoard.padStates() does for the numpy board. With fixed edges the ghost cells
+     are out of bounds (X), with periodic edges they are the cells on the opposite edge. The cell (r,c)
+     of the board is at (r+1,c+1) in the padded board.
+    """
+    def __paddedBoard(self, curr):
+        if (self.boundary == "periodic"):
+            rows = [curr[-1]] + curr + [curr[0]]
+            return [[row[-1]] + row + [row[0]] for row in rows]
+        ghostRow = ["X"]*(len(curr[0])+2)
+        return [ghostRow] + [["X"] + row + ["X"] for row in curr] + [ghostRow]
+
     def transitionCellState(self, centerCell, variant):
         if (variant == 2):
             if (centerCell == "S"):
@@ -63,272 +130,59 @@ class CA2dSIRDynamics:
                 return "R"
 
     """
-     Private method that uses non-deterministic rules for 
-     transitioning between S, I, R states using this probability
-     function. This is for 1st variant of the disease where the 
-     probability P(S->I) is based on the numbers of infected neighbors
-     and P(I->R) is fixed to be 10%.
-    """
-    def __probabilityFunc(self, mapKey):
-        centerOfKeyStr = mapKey[int(self.rule_bits/2)]
-
-        if (centerOfKeyStr == "S"):
-            # calculate the probability based on the numbers of neighbors
-            # infected, the more infected, the higher the probability is for
-            # this cell to become infected.
-            numerator = mapKey.count("I")
-            denominator = self.rule_bits - 1
-            self.nonDeterministicRule1stVar[mapKey] = numerator/denominator
-
-        elif (centerOfKeyStr == "I"):
-            # fixed probability, 10% => 1/10. 
-            self.nonDeterministicRule1stVar[mapKey] = 1/10
-        else:
-            # its R, so 0% probability that it will change, hence, it will remain R when __prob() is called in iterateCABoard().
-            self.nonDeterministicRule1stVar[mapKey] = 0
-    
-    """
-     Private method to build initial probability to uniformly random chosen
-     values between [0,1]. This is needed for GA so that the second
-     variant can evolve with first variant. This will be called only initially when
-     CA initializes.
-    """
-    def __initialProbForSecondVariant(self, mapKey):
-        centerOfKeyStr = mapKey[int(self.rule_bits/2)]
-        
-        # handle the case of mapKey being all XSSSS.., etc. The probability should be 0 if there are no i neighbors.
-        if (mapKey.count("i") == 0):
-            self.nonDeterministicRule2ndVar[mapKey] = 0
-        # if there are infected neighbors, then the initial random prob is used.
-        elif (centerOfKeyStr == "S"):
-            self.nonDeterministicRule2ndVar[mapKey] = self.__sToIPrimeProb
-        elif (centerOfKeyStr == "i"):
-            self.nonDeterministicRule2ndVar[mapKey] = self.__iPrimeToRPrimeProb
-        # its r, 0% probability it will change.
-        else:
-            self.nonDeterministicRule2ndVar[mapKey] = 0
-
-
-    """
-     Private helper method to return True/False based on the uniform distribution
-     of how likely an event is likely to occur based on the fraction
-     P = numerator/denominator.
-    """
-    def __prob(self, percent):
-        probFrac = Fraction(percent).limit_denominator()
-        randNum = np.random.randint(1,probFrac.denominator+1)
-
-        if (randNum <= probFrac.numerator):
-            return True
-        return False
-
-    """
-     Private method that uses deterministic rule mapping. 
-     Based on the center character from 9 letter long KeyStr, do the mapping:
-        if it is R, always map the value to R.
-        if it is I, only goes to R if all neighbors are I. Otherwise, map to stay I.
-        if it is S, only go to I if atleast one neighbor is I. Otherwise, maps to S. 
-    """
-    def __populateRuleMap(self, mapKey):
-        centerOfKeyStr = mapKey[int(self.rule_bits/2)]
-        
-        if (centerOfKeyStr == "S"):
-            if ("I" in mapKey):
-                self.deterministicRule1stVar[mapKey] = "I"
-            else:
-                self.deterministicRule1stVar[mapKey] = "S"
-        elif (centerOfKeyStr == "I"):
-            # all neighbors are inflected plus the center cell (the cell in question).
-            # if thats the case, the cell in question recovers. 
-            if (mapKey.count("I") == self.rule_bits):
-                self.deterministicRule1stVar[mapKey] = "R"
-            else:
-                self.deterministicRule1stVar[mapKey] = "I"
-        else:
-            self.deterministicRule1stVar[mapKey] = "R"
-
-    """
-     Private methods that handles in bound permutations scenario of all 9 letters with SIR dynamics where cell follows S->I->R dynamics.
-     Finds all in permutation with repitition of chars.
-     generates all possible 3 letter (SIR) strings for length 9 neighbors (rule_bits).
-     The outcomes can be 3 possibilities for all the 9 neighbors, so,
-     the rule map has 3^9 entries = 19683.
-    """
-    def __normalRuleEntries(self, dynamics):
-        regularmMapEntriesToBe = itertools.product(dynamics, repeat=self.rule_bits)
-
-        for mapKey in list(regularmMapEntriesToBe):
-            if (not self.isDeterministic):
-                if (self.variants == 2):
-                    if (dynamics == "SIR"):
-                        self.__probabilityFunc("".join(mapKey))
-                    else:
-                        self.__initialProbForSecondVariant("".join(mapKey))
-                else:
-                    self.__probabilityFunc("".join(mapKey))
-            else:
-                # for deterministic rules, we will just use 1st variant of disease only for now.
-                self.__populateRuleMap("".join(mapKey))
-
-
-    """
-      Private method that handles the four corner of the board cases and generates
-      permutations of SIR with few neighbors.
-      NOTE: The corner cells of the board have three neighbors in bound plus yourself,
-      so four cells in bounds and each one of those cells has SIR (len=3) possiblities. 
-      There are 4 corners in 2d grid. So, in total, the permutation to account for four corners is 4*(3^4). 
-    """
-    def __cornerRuleEntries(self, dynamics):
-        # generate all permutations for four in bound cells (3^4).
-        cornerPerm = itertools.product(dynamics, repeat=4)
-
-        # there are four corners with five neighbors are out of bounds (X)
-        # Just need to pad X's in the right place to make a key for rule dictionary/map.
-        
-        for perm in list(cornerPerm):
-            # (0,0) case: 
-            topLeftCellKey = "XXXX" + perm[0] + perm[1] + "X" + perm[2] + perm[3]
-            # (n,0) case:
-            bottomLeftCellKey = "XXX" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X"
-            # (0,n) case:
-            topRightCellKey = "X" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "XXX"
-            # (n,n) case:
-            bottomRightCellKey = perm[0] + perm[1] + "X" + perm[2] + perm[3] + "XXXX"
-
-            # add mapping for these in the map.
-            if (not self.isDeterministic):
-                if (self.variants == 2):
-                    if (dynamics == "Sir"):
-                        self.__initialProbForSecondVariant(topLeftCellKey)
-                        self.__initialProbForSecondVariant(bottomLeftCellKey)
-                        self.__initialProbForSecondVariant(topRightCellKey)
-                        self.__initialProbForSecondVariant(bottomRightCellKey)
-                    else:
-                        self.__probabilityFunc(topLeftCellKey)
-                        self.__probabilityFunc(bottomLeftCellKey)
-                        self.__probabilityFunc(topRightCellKey)
-                        self.__probabilityFunc(bottomRightCellKey)
-                else:
-                    self.__probabilityFunc(topLeftCellKey)
-                    self.__probabilityFunc(bottomLeftCellKey)
-                    self.__probabilityFunc(topRightCellKey)
-                    self.__probabilityFunc(bottomRightCellKey)
-            else:
-                # for deterministic rules, we will just use 1st variant of disease only for now.
-                self.__populateRuleMap(topLeftCellKey)
-                self.__populateRuleMap(bottomLeftCellKey)
-                self.__populateRuleMap(topRightCellKey)
-                self.__populateRuleMap(bottomRightCellKey)
-
-
-    """
-      Private method that handles the edges of the board cases and generates
-      permutations of SIR with few neighbors.
-      NOTE: The cells on the edge of the board have five neighbors in bound plus yourself,
-      so six cells in bounds and each one of those cells has SIR (len=3) possiblities. 
-      The cells on the edges are at four places in 2d grid (leftEdges, topEdges, 
-      rightEdges, bottomEdges). So, in total, the permutation to account for four edges is 4*(3^6).
-    """
-    def __edgesRuleEntries(self, dynamics):
-        # generate all permutations for six in bound cells (3^6).
-        edgesPerm = itertools.product(dynamics, repeat=6)
-
-        # Pad three out of bound cells with X's.
-        for perm in list(edgesPerm):
-            leftEdge = "XXX" + "".join(perm)
-            topEdge = "X" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X" + perm[4] + perm[5]
-            rightEdge = "".join(perm) + "XXX"
-            bottomEdge = perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X" + perm[4] + perm[5] + "X"
-
-            # add mapping for these in the dictionary. 
-            if (not self.isDeterministic):
-                if (self.variants == 2):
-                    if (dynamics == "Sir"):
-                        self.__initialProbForSecondVariant(leftEdge)
-                        self.__initialProbForSecondVariant(topEdge)
-                        self.__initialProbForSecondVariant(rightEdge)
-                        self.__initialProbForSecondVariant(bottomEdge)
-                    else:
-                        self.__probabilityFunc(leftEdge)
-                        self.__probabilityFunc(topEdge)
-                        self.__probabilityFunc(rightEdge)
-                        self.__probabilityFunc(bottomEdge)
-                else:
-                    self.__probabilityFunc(leftEdge)
-                    self.__probabilityFunc(topEdge)
-                    self.__probabilityFunc(rightEdge)
-                    self.__probabilityFunc(bottomEdge)
-            else:
-                self.__populateRuleMap(leftEdge)
-                self.__populateRuleMap(topEdge)
-                self.__populateRuleMap(rightEdge)
-                self.__populateRuleMap(bottomEdge)
-
-
-    """
-      Permutes 9 (#rule_bits) letter string with SIR dynamics. The center cell of the 
-      9 letter long string is cell in question on the board when we do the iteration for CA.
-      To build rules and create mapping for cells, the model is of a population that doesn't move
-      meaning the cells on the boundary (edges,corner) have fewer neighbors. So, the requried rules
-      account for normal scenario (3^9 permutations), plus also accounts for cells on the four corners (4*3^4 permutations)
-      and cells on the four edges (4*3^6 permutations).
-      For more details, see the docs for all helper methods.    
+      Builds the rule tables with SIR dynamics. The rule maps are flat arrays indexed by the integer code
+      of a cell's 9 letter neighborhood (the center letter is the cell in question on the board), where
+      out of bounds (X) is its own digit, see CARuleTables for the encoding. The model is of a population
+      that doesn't move meaning the cells on the boundary (edges,corner) have fewer neighbors, so the 
+      tables account for normal scenario (3^9 neighborhoods), cells on the four corners (4*3^4) and cells
+      on the four edges (4*3^6). Use CARuleTables.ruleTableToDict() to see a table as the old string keyed map.
     """
     def permuteToBuildInitialRules(self):
-        # deterministic rule map for 1st disease variant.
-        self.deterministicRule1stVar = {}
-        # non-deterministic rule of mapKeys of str for a cell with probability number (for 1st variant), this map will not be 
+        # deterministic rule map for 1st disease variant (code -> next state code).
+        self.deterministicRule1stVar = None
+        # non-deterministic rule of codes for a cell with probability number (for 1st variant), this map will not be 
         # modified.
-        self.nonDeterministicRule1stVar = {}
-        # the initial rule of mapKeys with uniform random probability values between [0,1] for both s->i' and i-> r'.
+        self.nonDeterministicRule1stVar = None
+        # the initial rule of codes with uniform random probability values between [0,1] for both s->i' and i-> r'.
         # after each run (the whole CA board is fully recovered), the GA will evolve both s->i' and i->r' probabilities in this
         # map for a given CA. 
-        self.nonDeterministicRule2ndVar = {}
-        firstVariantDynamics = "SIR"
-        # i and r are I' and R' here for a second variant of disease.
-        secondVariantDynamics = "Sir"
-
-        # call helper methods to build rules (permutation for each scenario).
-        # for 2nd variant, we need S,I',R' dynamics (encoded as "Sir").
-        if (self.variants >= 2):
-            # add both dynamics.
-            self.__normalRuleEntries(firstVariantDynamics)
-            self.__cornerRuleEntries(firstVariantDynamics)
-            self.__edgesRuleEntries(firstVariantDynamics)
-
-            self.__normalRuleEntries(secondVariantDynamics)
-            self.__cornerRuleEntries(secondVariantDynamics)
-            self.__edgesRuleEntries(secondVariantDynamics)
+        self.nonDeterministicRule2ndVar = None
+
+        # the tables that never change are shared read-only by all the CA's (see CARuleTables.sharedRuleTables()).
+        sharedTables = sharedRuleTables(self.rule_bits, self.variants, self.isDeterministic)
+        if (self.isDeterministic):
+            # for deterministic rules, we will just use 1st variant of disease only for now.
+            self.deterministicRule1stVar = sharedTables["deterministic"]
         else:
-            self.__normalRuleEntries(firstVariantDynamics)
-            self.__cornerRuleEntries(firstVariantDynamics)
-            self.__edgesRuleEntries(firstVariantDynamics)
+            self.nonDeterministicRule1stVar = sharedTables["firstVariant"]
+            # for 2nd variant, we need S,I',R' dynamics (encoded as "Sir").
+            if (self.variants >= 2):
+                self.nonDeterministicRule2ndVar = buildSecondVariantRule(self.__sToIPrimeProb, self.__iPrimeToRPrimeProb)
 
     """
      Creates instance of the board based on the currentBoard. 
     """
-    def createNextBoard(self, board):
-        return CABoard(board)
+    def createNextBoard(self, board, counts=None):
+        return CABoard(board, counts=counts)
     
     """
      Cross overs two CA's and create a children-CA with modified 
-     probabilityMap for 2nd variant (ruleFor2ndVariant). After crossing over,
-     slightly mutate newly created child CA's ruleFor2ndVariant map.
+     probabilityMap for 2nd variant (nonDeterministicRule2ndVar). After crossing over,
+     slightly mutate newly created child CA's 2nd variant map.
      The child is going to use the same board as in previous generation. 
     """
     def crossOver(self, secondParent):
-        length = len(self.nonDeterministicRule2ndVar)-1
-        cutover = rand.randint(0,length-1)
+        # the rules are crossed over in the order of validCodes(), same order the string keyed maps used to have.
+        codes = validCodes()
+        cutover = int(self.rng.integers(0,len(codes)))
         
-        # add N key:value pairs for parent 1 (N = cutover).
-        # Note: I dont want parents map to be modified, therefore, I am creating copies 
-        # of dictionary for them.
+        # Note: I dont want parents map to be modified, therefore, I am creating a copy 
+        # of the table for the child.
         # newChildMap contains first half rules from parent 1 and second half rules from second parent.
-        newChildMap = dict(list(self.nonDeterministicRule2ndVar.items())[0:cutover])
-        secondHalf = dict(list(secondParent.ruleFor2ndVariant.items())[cutover:length])
+        newChildMap = self.nonDeterministicRule2ndVar.copy()
+        secondHalf = codes[cutover:]
+        newChildMap[secondHalf] = secondParent.nonDeterministicRule2ndVar[secondHalf]
 
-        # update the child map to append second half rules from second parent.
-        newChildMap.update(secondHalf)
         # now mutate this child map slightly.
         newChildMap = self.mutate(newChildMap)
 
@@ -339,206 +193,367 @@ class CA2dSIRDynamics:
      Mutates the child map's non-zero random value slightly to +2%.
     """
     def mutate(self,newChildCAMap):
-        randomKey, randomVal = rand.choice(list(newChildCAMap.items()))
-        
-        # loop till we find non-zero value for a key in the map.
-        while (randomVal == 0):
-            randomKey, randomVal = rand.choice(list(newChildCAMap.items()))
+        # pick among the rules with non-zero value.
+        codes = validCodes()
+        nonZeroCodes = codes[newChildCAMap[codes] != 0]
+        randomCode = nonZeroCodes[self.rng.integers(0,len(nonZeroCodes))]
         
-        newChildCAMap[randomKey] = randomVal + 0.02
+        newChildCAMap[randomCode] += 0.02
         return newChildCAMap
 
     """
-     After a run, adds the fitness score to 2nd variant map of the CA
+     After a run, stores the fitness score of the 2nd variant map of the CA
      to see how the second variant probability performs. Helpful in evolving
      the probabilities of second variant's map using GA.
     """
     def addFitnessToSecondVariantMap(self, fitnessScore):
-        self.nonDeterministicRule2ndVar["fitness"] = fitnessScore
+        self.secondVariantFitness = fitnessScore
 
     """
     Private helper method for adding logic in iterate method to handle cases for using 2 variants of
-    the disease.
+    the disease. firstCode and secondCode are the neighborhood codes of the cell as seen by the 1st and
+    2nd variant (see CARuleTables), hasFirst and hasSecond tell whether I and I' are in the neighborhood.
     """
-    def __UseBothRuleVariants(self, ruleKeyStr, centerOfKeyStr):
-        # handle the case for both I and I' in the neighborhood of current cell, if they're then we randomly pick one probFunc.
-        if ("I" in ruleKeyStr and "i" in ruleKeyStr):
-            r = np.random.randint(0,2)
-            # go to first variant map.
-            if (r == 0):
-                # since the ruleKeyStr is mixture of both I and i, the nonDeterministicRule1stVar map will never have this key
-                # so, we need to first make sure that the centerCell is not i (otherwise, its obvious to use 2nd variant for this).
-                if (not(centerOfKeyStr == "i")):
-                    # immediately return if the center cell has recovered from any of both diseases, the probability is 
-                    # always zeros if centerCell has recovered, no need to call __prob() function to get T/F.
-                    if (centerOfKeyStr == "r" or centerOfKeyStr == "R"):
-                        return centerOfKeyStr
-                    
-                    # Since we are looking up 1st variant map, we can ignore the ruleKeyStr containing i and r
-                    # and replace them with S and R respectively because these have no effect on how 1st variant behaves.  
-                    tempStr = ruleKeyStr.replace("i","S")
-                    if ("r" in tempStr):
-                        tempStr = tempStr.replace("r","R")
-
-                    percent = self.nonDeterministicRule1stVar[tempStr]
-                    # if probability satisfies and we can transition using 1st variant. Otherwise, we need to try transitioning from
-                    # second variant by following the same procedure as done for 1st variant. If we also cannot transition
-                    # from second variant, then we know we can return the same centerCell back.
-                    if (self.__prob(percent)):
-                        return self.transitionCellState(centerOfKeyStr, variant=1)
-                    else:
-                        # we already tried transitioning from I to R above (if centerOfKeyStr was I), but we couldn't, so, remain I.
-                        if (centerOfKeyStr == "I"):
-                            return centerOfKeyStr
-                        
-                        # same as above, looking at 2nd variant map, so, the str containing I and R has no effect on 2nd variant behavior.
-                        tempStr = ruleKeyStr.replace("I","S")
-                        if ("R" in tempStr):
-                            tempStr = tempStr.replace("R","r")
-                
-                        percent = self.nonDeterministicRule2ndVar[tempStr]
-                        if (self.__prob(percent)):
-                            return self.transitionCellState(centerOfKeyStr, variant=2)
-                        else:
-                            return centerOfKeyStr
-                else:
-                    # the centerCell is i, so, we have to use 2nd variant map. If we cannot transition, we return the same centerCell.
-                    tempStr = ruleKeyStr.replace("I","S")
-                    if ("R" in tempStr):
-                        tempStr = tempStr.replace("R","r")
-                    
-                    percent = self.nonDeterministicRule2ndVar[tempStr]
-                    if (self.__prob(percent)):
-                        return self.transitionCellState(centerOfKeyStr,variant=2)
-                    else:
-                        return centerOfKeyStr
-            # go to second variant map.
-            elif (r == 1):
-                # same steps as r = 0 but in reverse order.
-                if (not(centerOfKeyStr == "I")):
-                    if (centerOfKeyStr == "r" or centerOfKeyStr == "R"):
-                        return centerOfKeyStr
-
-                    tempStr = ruleKeyStr.replace("I","S")
-                    if ("R" in tempStr):
-                        tempStr = tempStr.replace("R","r")
-
-                    percent = self.nonDeterministicRule2ndVar[tempStr]
-                    if (self.__prob(percent)):
-                        return self.transitionCellState(centerOfKeyStr, variant=2)
-                    else:
-                        if (centerOfKeyStr == "i"):
-                            return centerOfKeyStr
-                        
-                        tempStr = ruleKeyStr.replace("i","S")
-                        if ("r" in tempStr):
-                            tempStr = tempStr.replace("r","R")
-                        percent = self.nonDeterministicRule1stVar[tempStr]
-                        
-                        if (self.__prob(percent)):
-                            return self.transitionCellState(centerOfKeyStr, variant=1)
-                        else:
-                            return centerOfKeyStr
-                else:
-                    tempStr = ruleKeyStr.replace("i","S")
-                    if ("r" in tempStr):
-                        tempStr = tempStr.replace("r","R")
-                    percent = self.nonDeterministicRule1stVar[tempStr]
-                    if (self.__prob(percent)):
-                        return self.transitionCellState(centerOfKeyStr,variant=1)
-                    else:
-                        return centerOfKeyStr
-
-        # handle the case where only I is in neighborhood and not I' (goto first variant map)
-        elif("I" in ruleKeyStr and not("i" in ruleKeyStr)):
-            if (centerOfKeyStr == "r" or centerOfKeyStr == "R"):
-                return centerOfKeyStr
-            if ("r" in ruleKeyStr):
-                ruleKeyStr = ruleKeyStr.replace("r", "R")
-
-            percent = self.nonDeterministicRule1stVar[ruleKeyStr]
-            # check the probability to transition. If % is 0 then we dont change the state, we keep the same centerCell.
-            if (self.__prob(percent)):
-                return self.transitionCellState(centerOfKeyStr, variant=1)
+    def __UseBothRuleVariants(self, firstCode, secondCode, hasFirst, hasSecond, centerCell):
+        # immediately return if the center cell has recovered from any of both diseases, the probability is 
+        # always zeros if centerCell has recovered, no need to call the sampler to get T/F.
+        if (centerCell == "r" or centerCell == "R"):
+            return centerCell
+
+        # handle the case for both I and I' in the neighborhood of current cell, if they're then we randomly pick
+        # which variant's map the cell tries first.
+        if (hasFirst and hasSecond):
+            # a cell infected by one variant can only transition using that variant's map.
+            if (centerCell == "I"):
+                variantOrder = [1]
+            elif (centerCell == "i"):
+                variantOrder = [2]
+            elif (self.sampler.sample(0.5)):
+                variantOrder = [1, 2]
             else:
-                return centerOfKeyStr
-
+                variantOrder = [2, 1]
+        # handle the case where only I is in neighborhood and not I' (goto first variant map)
+        elif (hasFirst):
+            variantOrder = [1]
         # handle the case where only I' is in neighborhood and not I (goto second variant map)
-        elif("i" in ruleKeyStr and not("I" in ruleKeyStr)):
-            if (centerOfKeyStr == "r" or centerOfKeyStr == "R"):
-                return centerOfKeyStr
-            if ("R" in ruleKeyStr):
-                ruleKeyStr = ruleKeyStr.replace("R", "r")
-
-            percent = self.nonDeterministicRule2ndVar[ruleKeyStr]
-            # check the probability to transition. If % is 0 then we dont change the state, we keep the same centerCell.
-            if (self.__prob(percent)):
-                return self.transitionCellState(centerOfKeyStr, variant=2)
-            else:
-                return centerOfKeyStr                                
-
+        elif (hasSecond):
+            variantOrder = [2]
         # else there are no I and I' in the neighborhood, the centerCell is either surrounded by all SSS..,
         # or the cells have recovered (R or r for both variants).
         else:
-            return centerOfKeyStr
+            return centerCell
+
+        # if probability satisfies we transition using that variant. Otherwise, we try the next variant. If we
+        # cannot transition from any of them, then we return the same centerCell back.
+        for variant in variantOrder:
+            if (variant == 1):
+                percent = self.nonDeterministicRule1stVar[firstCode]
+            else:
+                percent = self.nonDeterministicRule2ndVar[secondCode]
+            if (self.sampler.sample(percent)):
+                return self.transitionCellState(centerCell, variant)
+        return centerCell
 
     """
-     Iterating each cell of the board. Building keyStr for each cell
-     representing all eight neighbors plus cell itself (center of the keyStr).
-     The keyStr representing neighbors are in this order: left, center, right. For example: the cell at (0,0) has neighbors:
+     Private helper that computes the next state of the cell at (r,c) of the board, given the board padded
+     with its ghost cells (see __paddedBoard()). Building the neighborhood code for the cell representing all
+     eight neighbors plus cell itself (center of the code), see CARuleTables. The neighbors are visited in
+     this order: left, center, right. For example: with fixed edges the cell at (0,0) has neighbors:
         left:(-1,-1),(-1,0),(-1,1) -> All out of bounds (X)
         center:(0,-1),(0,0),(0,1) -> only (0,-1) is out of bounds.
         right:(1,-1),(1,0),(1,1) -> only (1,-1) is out of bounds.
-     The inital rules (corner,edges,normal) are built keeping this pattern in mind.
-     NOTE: The y's (rowOffSet's) are flipped to account for out of bounds.
-           For example: (-1,-1) is upper left of the board. 
+     The ghost cells already hold X (or the wrapped cells), so no neighbor needs a bounds check.
+    """
+    def __nextCellState(self, padded, r, c):
+        firstDigitOf = variantDigitOf[1]
+        secondDigitOf = variantDigitOf[2]
+        useBothVariants = not self.isDeterministic and self.variants == 2
+        # neighborhood code as seen by each variant, and whether I or I' are in the neighborhood.
+        firstCode = 0
+        secondCode = 0
+        hasFirst = False
+        hasSecond = False
+        # visits all left neighbors -> center -> right neighbors, (r,c) is at (r+1,c+1) in the padded board.
+        for paddedRow in padded[r:r+3]:
+            for cell in paddedRow[c:c+3]:
+                firstCode = firstCode*4 + firstDigitOf[cell]
+                if (useBothVariants):
+                    secondCode = secondCode*4 + secondDigitOf[cell]
+                    hasFirst = hasFirst or cell == "I"
+                    hasSecond = hasSecond or cell == "i"
+        centerCell = padded[r+1][c+1]
+        # check to see which rule we are using, deteministic(uses only 1st variant) or non-deterministic (can use either both or 1st variant).
+        if (not self.isDeterministic):
+            if (useBothVariants):
+                return self.__UseBothRuleVariants(firstCode, secondCode, hasFirst, hasSecond, centerCell)
+            # only use 1st variant non-determinsitc rule. 
+            percent = self.nonDeterministicRule1stVar[firstCode]
+            # check the probability to transition. If % is 0 then we dont change the state, we keep the same centerCell.
+            if (centerCell in "SI" and self.sampler.sample(percent)):
+                return self.transitionCellState(centerCell, variant=1)
+            return centerCell
+        # Use deterministic rules for 1st variant, they only know S, I and R.
+        if (centerCell in "SIR"):
+            return CABoard._states[self.deterministicRule1stVar[firstCode]]
+        return centerCell
+
     """
-    def iterateCABoard(self):
+     Private helper that returns the active cells of the board: every infected cell (I or I') plus its
+     in bound neighbors (wrapped around the edges with periodic edges). With any of the rules, a cell can
+     only change state if it or one of its 8 neighbors is infected, so these are the only cells an
+     iteration has to look at.
+     infectedCells are the (r,c) of the infected cells.
+    """
+    def __activeCellsAround(self, infectedCells):
         rows = CABoard._board_row
         cols = CABoard._board_col
-        # next board to be (after an iteration).
-        next = [["" for col in range(0,cols)] for row in range(0,rows)]
-        for r in range(0,rows):
-            for c in range(0,cols):
-                ruleKeyStr = ""
-                # visits all left neighbors -> center -> right neighbors.
-                # NOTE: y vals are flipped in the case of detecting out of bounds.
-                for rowOffset in range(-1,2):
-                    for colOffset in range(-1,2):
-                        if (self.isInBounds(r+rowOffset, c+colOffset)):
-                            curr = self.currentBoard.getBoard()
-                            ruleKeyStr += curr[r+rowOffset][c+colOffset]
-                        else:
-                            # the current cell in the board is on the edge.
-                            ruleKeyStr += "X"
-                # check to see which rule we are using, deteministic(uses only 1st variant) or non-deterministic (can use either both or 1st variant).
-                if (not self.isDeterministic):
-                    centerOfKeyStr = ruleKeyStr[int(self.rule_bits/2)]
-                    if (self.variants == 2):
-                        next[r][c] = self.__UseBothRuleVariants(ruleKeyStr, centerOfKeyStr)
-                    else:
-                        # only use 1st variant non-determinsitc rule. 
-                        if (ruleKeyStr in self.nonDeterministicRule1stVar):
-                            percent = self.nonDeterministicRule1stVar[ruleKeyStr]
-                            # check the probability to transition. If % is 0 then we dont change the state, we keep the same centerCell.
-                            if (self.__prob(percent)):
-                                next[r][c] = self.transitionCellState(centerOfKeyStr, variant=1)
-                            else:
-                                next[r][c] = centerOfKeyStr
-                        else:
-                            print("This 1st variant non-deterministic ruleKey doesn't exist yet: " + ruleKeyStr + ". Are you using a randomBoard which uses both 1st and 2nd variant of disease but CA uses only 1st variant?")
-                else:
-                    # Use deterministic rules for 1st variant.
-                    # Check now whether a key is already in dictionary (it should always
-                    # be because we accounted all possibilities for each cell).
-                    if (ruleKeyStr in self.deterministicRule1stVar):
-                        next[r][c] = self.deterministicRule1stVar[ruleKeyStr]
-                    else:
-                        print("This determinstic ruleKey doesn't exist yet: " + ruleKeyStr)
-        
+        activeCells = set()
+        for r, c in infectedCells:
+            for rowOffset in range(-1,2):
+                for colOffset in range(-1,2):
+                    if (self.boundary == "periodic"):
+                        activeCells.add(((r+rowOffset) % rows, (c+colOffset) % cols))
+                    elif (self.isInBounds(r+rowOffset, c+colOffset)):
+                        activeCells.add((r+rowOffset, c+colOffset))
+        return activeCells
+
+    """
+     Private helper that writes the state of the cell (r,c) into the padded board, and into its ghost
+     copies on the opposite side of the board with periodic edges.
+    """
+    def __writePadded(self, r, c, cell):
+        rows = CABoard._board_row
+        cols = CABoard._board_col
+        paddedRows = [r+1]
+        paddedCols = [c+1]
+        if (self.boundary == "periodic"):
+            if (r == 0):
+                paddedRows.append(rows+1)
+            if (r == rows-1):
+                paddedRows.append(0)
+            if (c == 0):
+                paddedCols.append(cols+1)
+            if (c == cols-1):
+                paddedCols.append(0)
+        for paddedRow in paddedRows:
+            for paddedCol in paddedCols:
+                self.__padded[paddedRow][paddedCol] = cell
+
+    """
+     Iterating the board, only the active cells (infected cells and their neighbors) are evaluated,
+     every other cell keeps its state (see __activeCellsAround()). The active cells are kept between
+     iterations, only a board that was not produced by the previous iteration (e.g. the GA sets a new
+     random board) is scanned fully to find them. So the cost of an iteration follows the size of the
+     epidemic front instead of the size of the board.
+     The generations are stepped between two boards owned by the CA that swap roles every iteration,
+     so iterating does not allocate a new board. The currentBoard is updated to the new generation and:
+       - with snapshot=True (default), a new CABoard with a copy of the new generation is returned,
+         which stays as it is while the CA keeps iterating.
+       - with snapshot=False, the currentBoard itself is returned. Its board is the CA's buffer, so treat it
+         as read-only and only use it until the next iteration (e.g. to check it or to draw it).
+    """
+    def iterateCABoard(self, snapshot=True):
+        # the first row of the recorder is the board the run starts from.
+        if (self.recorder is not None and len(self.recorder) == 0):
+            self.recorder.record(self.generation, self.currentBoard.counts())
+
+        if (self.engine == "numpy"):
+            self.__iterateVectorized(snapshot)
+        elif (self.engine in CA2dSIRDynamics._stateEngines):
+            self.__iterateStateEngine(snapshot, 1)
+        else:
+            self.__iteratePython(snapshot)
+
+        if (self.recorder is not None):
+            self.recorder.record(self.generation, self.currentBoard.counts())
+        return self.nextBoard
+
+    """
+     Private helper, iterateCABoard() with the python engine.
+    """
+    def __iteratePython(self, snapshot):
+        rows = CABoard._board_row
+        cols = CABoard._board_col
+        curr = self.currentBoard.getBoard()
+        if (curr is not self.__front):
+            # a new board, copy it into the buffers.
+            self.__front = [row[:] for row in curr]
+            self.__back = [row[:] for row in curr]
+            self.__padded = self.__paddedBoard(curr)
+            self.__changedCells = []
+            self.__activeCells = self.__activeCellsAround([(r, c) for r in range(0,rows) for c in range(0,cols) if curr[r][c] in ("I", "i")])
+        curr = self.__front
+        next = self.__back
+
+        # next board to be (after an iteration), the back buffer is one generation behind on the cells
+        # changed by the last iteration.
+        for r, c in self.__changedCells:
+            next[r][c] = curr[r][c]
+        # the state counts of the next board are the current ones plus the transitions of this iteration.
+        counts = self.currentBoard.counts()
+        changedCells = []
+        infectedCells = []
+        # in row order, so the cells get their random numbers in the same order after a resume.
+        for r, c in sorted(self.__activeCells):
+            # a counter based sampler gives the cell the numbers of its position (see CARandom).
+            self.sampler.setPosition(self.generation+1, r, c)
+            next[r][c] = self.__nextCellState(self.__padded, r, c)
+            if (next[r][c] != curr[r][c]):
+                counts[curr[r][c]] -= 1
+                counts[next[r][c]] += 1
+                changedCells.append((r, c))
+            if (next[r][c] == "I" or next[r][c] == "i"):
+                infectedCells.append((r, c))
+        # only active cells could have become (or stayed) infected, so the next active cells are around them.
+        self.__activeCells = self.__activeCellsAround(infectedCells)
+        for r, c in changedCells:
+            self.__writePadded(r, c, next[r][c])
+        self.__changedCells = changedCells
+
         # after one iteration, we now have next board.
-        self.nextBoard = self.createNextBoard(next)
-        self.currentBoard.setBoard(self.nextBoard.getBoard())
-        
+        self.generation += 1
+        self.__front, self.__back = next, curr
+        self.currentBoard.setBoard(next, dict(counts))
+        if (snapshot):
+            self.nextBoard = self.createNextBoard([row[:] for row in next], counts)
+        else:
+            self.nextBoard = self.currentBoard
+
+        return self.nextBoard
+
+    """
+     Same as iterateCABoard() but the whole generation is computed by CA2dVectorizedEngine on the
+     numpy state array of the board, the board is only converted back to chars if someone asks for it.
+     Without snapshot, the states of the currentBoard are a read-only view of the engine's buffer.
+     A CACompactBoard is stepped in place and returned as the next board.
+    """
+    def __iterateVectorized(self, snapshot):
+        if (self.__vectorizedEngine is None):
+            self.__vectorizedEngine = CA2dVectorizedEngine(self)
+
+        self.generation += 1
+        # compact boards are too big to unpack, they are stepped in place band by band.
+        if (isinstance(self.currentBoard, CACompactBoard)):
+            counts = self.currentBoard.counts()
+            for code, change in enumerate(self.__vectorizedEngine.stepCompact(self.currentBoard)):
+                counts[CABoard._states[code]] += change
+            self.currentBoard.setCounts(counts)
+            self.nextBoard = self.currentBoard
+            return self.nextBoard
+
+        counts = self.currentBoard.counts()
+        next = self.__vectorizedEngine.step(self.currentBoard.getStates())
+        for code, change in enumerate(self.__vectorizedEngine.lastCountChanges):
+            counts[CABoard._states[code]] += change
+        self.currentBoard.setStates(next, dict(counts))
+        if (snapshot):
+            self.nextBoard = self.createNextBoard(next.copy(), counts)
+        else:
+            self.nextBoard = self.currentBoard
+
         return self.nextBoard
-   
\ No newline at end of file
+
+    """
+     Private helper, iterateCABoard() with the hashlife, bitboard or timeline engine, for the given number of generations.
+    """
+    def __iterateStateEngine(self, snapshot, generations):
+        # the engine's form of the board is only rebuilt for a board the engine did not return.
+        states = self.currentBoard.getStates()
+        if (states is not self.__stateEngineStates):
+            self.__stateEngine.setStates(states)
+        self.__stateEngine.advance(generations)
+        self.generation += generations
+
+        next = self.__stateEngine.getStates()
+        counts = self.__stateEngine.counts()
+        self.__stateEngineStates = next
+        self.currentBoard.setStates(next, dict(counts))
+        if (snapshot):
+            self.nextBoard = self.createNextBoard(next.copy(), counts)
+        else:
+            self.nextBoard = self.currentBoard
+
+    """
+     Iterates the board count generations and returns the current board. The hashlife, bitboard and timeline
+     engines do all of them before giving the board back (a recorder only gets the row of the last
+     generation then), the other engines iterate them one by one.
+    """
+    def jumpGenerations(self, count):
+        if (self.engine not in CA2dSIRDynamics._stateEngines):
+            for g in range(0,count):
+                self.iterateCABoard(snapshot=False)
+            return self.currentBoard
+
+        if (self.recorder is not None and len(self.recorder) == 0):
+            self.recorder.record(self.generation, self.currentBoard.counts())
+        self.__iterateStateEngine(False, count)
+        if (self.recorder is not None):
+            self.recorder.record(self.generation, self.currentBoard.counts())
+        return self.currentBoard
+
+    """
+     Sets the current board to the board of the given generation (counted from the board the timeline engine
+     got) and returns it. Only the timeline engine can go back to earlier generations, the other engines
+     iterate up to the generation (see jumpGenerations()).
+    """
+    def seekGeneration(self, generation):
+        if (generation < self.generation and self.engine != "timeline"):
+            errMessage = "Can't seek back to generation {} from generation {} with the {} engine.".format(generation, self.generation, self.engine)
+            raise Exception(errMessage)
+        return self.jumpGenerations(generation - self.generation)
+
+    """
+     Saves the run to path (see CASnapshot): the current board, the generation, the rule types, the state
+     of the sampler and the 2nd variant rules, everything resume() needs to carry on exactly where the run is.
+     packed=True packs the cells of a CABoard into 3 bits each.
+    """
+    def checkpoint(self, path, packed=False):
+        generatorState, block = self.sampler.getState()
+        meta = {"generation": self.generation, "variants": self.variants, "isDeterministic": self.isDeterministic,
+                "boundary": self.boundary, "sampler": generatorState, "rng": self.rng.bit_generator.state}
+        arrays = {"samplerBlock": block}
+        # the recorder's rows are flushed, the resumed run carries its file on from this generation.
+        if (self.recorder is not None):
+            meta["recorder"] = self.recorder.getState()
+        if (self.variants == 2):
+            meta["secondVariantProbs"] = [self.__sToIPrimeProb, self.__iPrimeToRPrimeProb]
+            arrays["secondVariantRule"] = self.nonDeterministicRule2ndVar
+        CASnapshot.saveSnapshot(path, self.currentBoard, packed, meta, arrays)
+
+    """
+     Carries on the run saved by checkpoint() at path: the CA gets its board, generation, sampler state and
+     2nd variant rules back. The CA has to use the same rule types as the saved run.
+    """
+    def resume(self, path):
+        board, meta, arrays = CASnapshot.loadSnapshot(path)
+        if (meta["variants"] != self.variants or meta["isDeterministic"] != self.isDeterministic or meta["boundary"] != self.boundary):
+            errMessage = "Checkpoint {} was saved by a CA with other rules (variants={}, deterministic={}, boundary={}).".format(
+                path, meta["variants"], meta["isDeterministic"], meta["boundary"])
+            raise Exception(errMessage)
+
+        self.currentBoard = board
+        self.generation = meta["generation"]
+        self.sampler.setState(meta["sampler"], arrays["samplerBlock"])
+        if ("rng" in meta):
+            self.rng.bit_generator.state = meta["rng"]
+        if (self.recorder is not None and "recorder" in meta):
+            self.recorder.setState(meta["recorder"])
+        if (self.variants == 2):
+            self.__sToIPrimeProb, self.__iPrimeToRPrimeProb = meta["secondVariantProbs"]
+            self.nonDeterministicRule2ndVar = np.array(arrays["secondVariantRule"])
+
+    """
+     Iterates the board until generation count, or until no cell is infected, whichever is first. With a
+     checkpointPath, the run is checkpointed there every checkpointEvery generations and at the end, so
+     it can be resumed with resume() and continued by calling this again. Returns the current board.
+    """
+    def runGenerations(self, count, checkpointPath=None, checkpointEvery=100):
+        while (self.generation < count and self.currentBoard.hasInfected()):
+            self.iterateCABoard(snapshot=False)
+            if (checkpointPath is not None and self.generation % checkpointEvery == 0):
+                self.checkpoint(checkpointPath)
+        if (checkpointPath is not None):
+            self.checkpoint(checkpointPath)
+        if (self.recorder is not None):
+            self.recorder.flush()
+        return self.currentBoard
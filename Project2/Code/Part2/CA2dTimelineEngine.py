@@ -0,0 +1,164 @@
+"""
+ Closed form of a run of the CA with the deterministic rules (see CA2dSIRDynamics, ruleTypeIsDeterministic=True):
+ the time every cell gets infected and recovers is computed once from the initial board, after that the
+ board at any generation t is a single comparison of those times with t, no generation is iterated.
+   - infection: an S cell becomes I one generation after any of its neighbors, so its infection time is its
+     distance to the nearest initial I cell in steps to any of the 8 neighbors (the Chebyshev distance on
+     an open board), going only through cells that can be infected (S). It is found with one breadth first
+     search from all the initial I cells at once (a distance transform).
+   - recovery: an I cell recovers one generation after all 9 cells of its neighborhood are I at the same time.
+     That happens at the largest infection time in its neighborhood, unless a neighbor recovered by then (R is
+     not I anymore, so the cell stays I for good). The neighbors that could have recovered before have a
+     smaller largest infection time, so the cells are decided in the order of that time.
+ Cells that are never infected or never recover have the time never. I', R' cells and initial R cells never
+ change with the deterministic rules. Fixed and periodic edges are supported.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+
+class CA2dTimelineEngine:
+    # time of the events that never happen.
+    never = np.iinfo(np.int64).max
+
+    def __init__(self, ca=None):
+        if (ca is not None and not ca.isDeterministic):
+            errMessage = "The timeline engine only supports deterministic rules."
+            raise Exception(errMessage)
+        self.ca = ca
+        self.periodic = ca is not None and ca.boundary == "periodic"
+        self.generation = 0
+        # infection and recovery time of every cell (see module docstring), the initial board and the
+        # sorted times (for countsAt()).
+        self.infectionTimes = None
+        self.recoveryTimes = None
+        self.__initialStates = None
+        self.__sortedInfections = None
+        self.__sortedRecoveries = None
+
+    """
+     Private helper that returns the flat indices of the 8 neighbors and the cell itself of each of the
+     given flat indices (one column per neighbor). With fixed edges the indices are into the board with a
+     ghost layer of cells that are never infected, so the neighbors are just fixed offsets.
+    """
+    def __neighborhoods(self, cells):
+        rows, cols = self.__initialStates.shape
+        if (not self.periodic):
+            width = cols+2
+            offsets = np.array([rowOffset*width + colOffset for rowOffset in range(-1,2) for colOffset in range(-1,2)])
+            return cells[:, None] + offsets
+        r, c = np.divmod(cells, cols)
+        neighbors = np.empty((len(cells), 9), dtype=np.int64)
+        k = 0
+        for rowOffset in range(-1,2):
+            for colOffset in range(-1,2):
+                neighbors[:, k] = ((r + rowOffset) % rows)*cols + (c + colOffset) % cols
+                k += 1
+        return neighbors
+
+    """
+     Sets the initial board (numpy array of state codes) and computes the infection and recovery times.
+    """
+    def setStates(self, states):
+        self.__initialStates = np.array(states, dtype=np.uint8)
+        self.generation = 0
+        never = CA2dTimelineEngine.never
+        if (self.periodic):
+            flat = self.__initialStates.ravel()
+        else:
+            # the ghost cells are R' (never change, never infected).
+            flat = np.pad(self.__initialStates, 1, constant_values=4).ravel()
+
+        # breadth first search from the initial I cells through the S cells.
+        infection = np.full(len(flat), never, dtype=np.int64)
+        frontier = np.nonzero(flat == 1)[0]
+        infection[frontier] = 0
+        canBeInfected = flat == 0
+        t = 0
+        while (len(frontier) > 0):
+            t += 1
+            neighbors = self.__neighborhoods(frontier).ravel()
+            # a cell can be next to several cells of the frontier, it is only kept once.
+            neighbors = np.unique(neighbors[canBeInfected[neighbors]])
+            canBeInfected[neighbors] = False
+            infection[neighbors] = t
+            frontier = neighbors
+
+        # largest infection time in the neighborhood of every infected cell (never if any of its cells is
+        # never infected or a ghost cell).
+        recovery = np.full(len(flat), never, dtype=np.int64)
+        infected = np.nonzero((infection != never) & (flat <= 1))[0]
+        neighborhoods = self.__neighborhoods(infected)
+        latest = infection[neighborhoods].max(axis=1)
+        candidates = latest != never
+        infected, neighborhoods, latest = infected[candidates], neighborhoods[candidates], latest[candidates]
+
+        # decide the cells in the order of their largest infection time, all the cells of one time at once.
+        order = np.argsort(latest, kind="stable")
+        infected, neighborhoods, latest = infected[order], neighborhoods[order], latest[order]
+        bounds = np.nonzero(np.diff(latest))[0] + 1
+        recovered = np.zeros(len(flat), dtype=bool)
+        # no cell can recover (e.g. nothing is infected, or the board is too small for a whole neighborhood).
+        if (len(latest) > 0):
+            for start, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(latest)]])):
+                cells = infected[start:stop]
+                # a neighbor that recovered before this time is R, so the cell never sees 9 I cells.
+                recovers = ~recovered[neighborhoods[start:stop]].any(axis=1)
+                recovery[cells[recovers]] = latest[start] + 1
+                recovered[cells[recovers]] = True
+
+        if (not self.periodic):
+            rows, cols = self.__initialStates.shape
+            infection = infection.reshape(rows+2, cols+2)[1:-1, 1:-1]
+            recovery = recovery.reshape(rows+2, cols+2)[1:-1, 1:-1]
+            flat = self.__initialStates.ravel()
+        rows, cols = self.__initialStates.shape
+        self.infectionTimes = np.ascontiguousarray(infection).reshape(rows, cols)
+        self.recoveryTimes = np.ascontiguousarray(recovery).reshape(rows, cols)
+        # only the cells that were S or I at the start follow the times.
+        changing = flat <= 1
+        self.__sortedInfections = np.sort(self.infectionTimes.ravel()[changing])
+        self.__sortedRecoveries = np.sort(self.recoveryTimes.ravel()[changing])
+
+    """
+     The board at generation t as a numpy uint8 array of state codes.
+    """
+    def statesAt(self, t):
+        states = self.__initialStates.copy()
+        changing = states <= 1
+        states[changing & (self.infectionTimes <= t)] = 1
+        states[changing & (self.recoveryTimes <= t)] = 2
+        return states
+
+    """
+     Number of cells in each state at generation t as a dict keyed by the state chars (like CABoard.counts()),
+     with a binary search in the sorted times.
+    """
+    def countsAt(self, t):
+        infectedSoFar = int(np.searchsorted(self.__sortedInfections, t, side="right"))
+        recovered = int(np.searchsorted(self.__sortedRecoveries, t, side="right"))
+        initial = np.bincount(self.__initialStates.ravel(), minlength=5)
+        return {"S": len(self.__sortedInfections) - infectedSoFar, "I": infectedSoFar - recovered,
+                "R": int(initial[2]) + recovered, "i": int(initial[3]), "r": int(initial[4])}
+
+    """
+     The last generation where any cell changes state (the board stays the same after it).
+    """
+    def lastChange(self):
+        times = np.concatenate([self.__sortedInfections, self.__sortedRecoveries])
+        times = times[times != CA2dTimelineEngine.never]
+        return int(times.max()) if len(times) > 0 else 0
+
+    """
+     Same interface as the other engines that keep their own board (see CA2dSIRDynamics._stateEngines):
+     advancing only moves the generation that getStates() and counts() look at.
+    """
+    def advance(self, generations=1):
+        self.generation += generations
+
+    def getStates(self):
+        return self.statesAt(self.generation)
+
+    def counts(self):
+        return self.countsAt(self.generation)
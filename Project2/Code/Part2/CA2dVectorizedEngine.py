@@ -0,0 +1,292 @@
+"""
+ NumPy engine for stepping the 2d CA with SIR dynamics (see CA2dSIRDynamics).
+ Instead of walking every cell in python and building a 9 letter keyStr for it,
+ the board is held as a small integer array of state codes (see CABoard._states) and
+ a whole generation is computed with array operations:
+   - the 9 cells of each neighborhood are packed into one base-4 integer code per variant
+     (see CARuleTables), the rule maps of the CA are flat arrays indexed by that code.
+   - transitions are drawn for all the cells at once.
+   - only the active cells are evaluated: with any of the rules, a cell can only change state if it
+     or one of its 8 neighbors is infected (I or I'). The active cells are updated from each step's
+     infected cells, so the cost of a step follows the epidemic front instead of the board area.
+   - the board is kept with a ghost cell layer around it (see CABoard.padStates()), out of bounds cells
+     for fixed edges or the wrapped cells for periodic edges, so no neighbor lookup checks positions.
+ It supports deterministic, 1-variant non-deterministic and 2-variant rules.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+from CARuleTables import outOfBoundsState, variantView
+
+"""
+ Next state codes of cells with both variants, given their state codes (center) and the probabilities
+ from the 1st and 2nd variant maps (arrays of any shape). This follows the rules of __UseBothRuleVariants()
+ in CA2dSIRDynamics:
+   - I recovers using the 1st variant map and i recovers using the 2nd variant map.
+   - S picks randomly which variant it tries first, if that fails it tries the other one.
+     The probability of a variant is always zero when there is no cell of that variant in the
+     neighborhood, so this also covers the neighborhoods with only one of the variants in them.
+"""
+def bothVariantsTransition(center, firstProb, secondProb, sampler):
+    firstDraw = sampler.uniforms(center.shape)
+    secondDraw = sampler.uniforms(center.shape)
+    firstVariantFirst = sampler.sampleMany(np.full(center.shape, 0.5))
+
+    firstTry = np.where(firstVariantFirst, firstProb, secondProb)
+    secondTry = np.where(firstVariantFirst, secondProb, firstProb)
+    firstHit = firstDraw < firstTry
+    secondHit = ~firstHit & (secondDraw < secondTry)
+
+    susceptible = center == 0
+    nextCenter = center.copy()
+    nextCenter[susceptible & ((firstVariantFirst & firstHit) | (~firstVariantFirst & secondHit))] = 1
+    nextCenter[susceptible & ((~firstVariantFirst & firstHit) | (firstVariantFirst & secondHit))] = 3
+    nextCenter[(center == 1) & (firstDraw < firstProb)] = 2
+    nextCenter[(center == 3) & (firstDraw < secondProb)] = 4
+    return nextCenter
+
+class CA2dVectorizedEngine:
+    # (row, col) offsets of the 9 cells of a neighborhood, in the order of the code digits.
+    _rowOffsets = np.repeat(np.arange(-1, 2), 3)
+    _colOffsets = np.tile(np.arange(-1, 2), 3)
+
+    def __init__(self, ca):
+        self.ca = ca
+        # private member vars: the board returned by the last step (read-only view of __front), the two
+        # buffers step() swaps between (__front is the current generation), the current board padded with
+        # its ghost cells and the (row, col) of the active cells on it.
+        self.__lastStates = None
+        self.__front = None
+        self.__back = None
+        self.__padded = None
+        self.__activeRows = None
+        self.__activeCols = None
+        # cells written by the last step, where __back is still one generation behind.
+        self.__changedRows = None
+        self.__changedCols = None
+        # how many cells went into (positive) or out of (negative) each state code during the last step().
+        self.lastCountChanges = [0]*5
+
+    """
+     Packs the 3x3 neighborhood of every cell into a base-4 integer. The first digit (most significant)
+     is the upper left neighbor and the last digit is the lower right neighbor, exactly like the code
+     built in iterateCABoard(). view maps the board state codes to the digits of a variant.
+    """
+    def neighborhoodCodes(self, states, view):
+        return self.paddedNeighborhoodCodes(padStates(states, self.ca.boundary), view)
+
+    """
+     Same as neighborhoodCodes() but only for the active cells.
+    """
+    def activeNeighborhoodCodes(self, view):
+        codes = np.zeros(len(self.__activeRows), dtype=np.int32)
+        # the padded board is shifted by one, so offsets 0..2 are the neighbors -1..1.
+        for rowOffset in range(0,3):
+            for colOffset in range(0,3):
+                codes *= 4
+                codes += view[self.__padded[self.__activeRows+rowOffset, self.__activeCols+colOffset]]
+        return codes
+
+    """
+     Private helper to make the active cells the in bound neighborhoods of the given infected cells.
+    """
+    def __activateAround(self, infectedRows, infectedCols):
+        boardRows, boardCols = self.__lastStates.shape
+        rows = (infectedRows[:, None] + CA2dVectorizedEngine._rowOffsets).ravel()
+        cols = (infectedCols[:, None] + CA2dVectorizedEngine._colOffsets).ravel()
+        if (self.ca.boundary == "periodic"):
+            rows %= boardRows
+            cols %= boardCols
+        else:
+            inBounds = (rows >= 0) & (rows < boardRows) & (cols >= 0) & (cols < boardCols)
+            rows = rows[inBounds]
+            cols = cols[inBounds]
+        # each cell is active once, even if it is next to many infected cells.
+        activeCells = np.unique(rows*boardCols + cols)
+        self.__activeRows, self.__activeCols = np.divmod(activeCells, boardCols)
+
+    """
+     Private helper that writes the next state codes of the active cells into the padded board. With
+     periodic edges, the cells on the edges also have ghost copies on the opposite side that are written too.
+    """
+    def __writePadded(self, nextCenter):
+        self.__padded[self.__activeRows+1, self.__activeCols+1] = nextCenter
+        if (self.ca.boundary != "periodic"):
+            return
+        boardRows, boardCols = self.__lastStates.shape
+        for rowShift in (0, boardRows, -boardRows):
+            for colShift in (0, boardCols, -boardCols):
+                rows = self.__activeRows + 1 + rowShift
+                cols = self.__activeCols + 1 + colShift
+                inPadded = (rows >= 0) & (rows <= boardRows+1) & (cols >= 0) & (cols <= boardCols+1)
+                self.__padded[rows[inPadded], cols[inPadded]] = nextCenter[inPadded]
+
+    """
+     Private helper to start tracking a board that was not returned by the previous step
+     (first step, or someone set a new board), it scans the whole board once.
+    """
+    def __track(self, states):
+        self.__front = states.copy()
+        self.__back = states.copy()
+        self.__lastStates = self.__readOnly(self.__front)
+        self.__padded = padStates(states, self.ca.boundary)
+        self.__changedRows = None
+        self.__changedCols = None
+        infectedRows, infectedCols = np.nonzero((states == 1) | (states == 3))
+        self.__activateAround(infectedRows, infectedCols)
+
+    """
+     Private helper, read-only view of a buffer.
+    """
+    def __readOnly(self, buffer):
+        view = buffer.view()
+        view.flags.writeable = False
+        return view
+
+    """
+     Computes the next generation of the board given as numpy array of state codes (the given array is
+     not modified). The generations are written into two buffers owned by the engine that swap roles every
+     step, so stepping allocates no board: the returned array is a read-only view of the engine's buffer,
+     which gets overwritten two steps later (copy it to keep it).
+    """
+    def step(self, states):
+        if (states is not self.__lastStates):
+            self.__track(states)
+
+        center = self.__front[self.__activeRows, self.__activeCols]
+        # a counter based sampler gives each cell the numbers of its position (see CARandom).
+        self.ca.sampler.setPosition(self.ca.generation, self.__activeRows, self.__activeCols)
+        firstCodes = self.activeNeighborhoodCodes(variantView[1])
+        secondCodes = None
+        if (self.__usesSecondVariant()):
+            secondCodes = self.activeNeighborhoodCodes(variantView[2])
+        nextCenter = self.nextStates(center, firstCodes, secondCodes)
+
+        # the back buffer is one generation behind on the cells active in the last step,
+        # the active cells of this step are the only ones that can change.
+        if (self.__changedRows is not None):
+            self.__back[self.__changedRows, self.__changedCols] = self.__front[self.__changedRows, self.__changedCols]
+        self.__back[self.__activeRows, self.__activeCols] = nextCenter
+        self.__changedRows, self.__changedCols = self.__activeRows, self.__activeCols
+        self.__front, self.__back = self.__back, self.__front
+        self.__lastStates = self.__readOnly(self.__front)
+        self.__writePadded(nextCenter)
+        self.lastCountChanges = (np.bincount(nextCenter, minlength=5) - np.bincount(center, minlength=5))[:5].tolist()
+
+        # only active cells could have become (or stayed) infected, so the next active cells are around them.
+        infected = (nextCenter == 1) | (nextCenter == 3)
+        self.__activateAround(self.__activeRows[infected], self.__activeCols[infected])
+        return self.__lastStates
+
+    """
+     Computes the next generation of the rows of a window of the board, padded with one cell all
+     around (real neighbor cells, or the ghost cells past the edges of the board). Returns the
+     next state codes of the window without its padding. firstRow is the row of the board the window
+     starts at (for the numbers of a counter based sampler, see CARandom).
+    """
+    def stepPadded(self, padded, firstRow=0):
+        center = padded[1:-1, 1:-1]
+        rows, cols = center.shape
+        self.ca.sampler.setPosition(self.ca.generation, firstRow + np.arange(rows)[:, None], np.arange(cols)[None, :])
+        firstCodes = self.paddedNeighborhoodCodes(padded, variantView[1])
+        secondCodes = None
+        if (self.__usesSecondVariant()):
+            secondCodes = self.paddedNeighborhoodCodes(padded, variantView[2])
+        return self.nextStates(center, firstCodes, secondCodes)
+
+    """
+     Same as neighborhoodCodes() but for a board that is already padded (see stepPadded()).
+    """
+    def paddedNeighborhoodCodes(self, padded, view):
+        rows = padded.shape[0]-2
+        cols = padded.shape[1]-2
+        codes = np.zeros((rows, cols), dtype=np.int32)
+        for rowOffset in range(0,3):
+            for colOffset in range(0,3):
+                codes *= 4
+                codes += view[padded[rowOffset:rowOffset+rows, colOffset:colOffset+cols]]
+        return codes
+
+    """
+     Steps a CACompactBoard in place, band by band of bandRows rows, so the whole grid is never unpacked.
+     Each band is read with one halo row above and below it (the row above is kept from before it was
+     overwritten, the halos past the board edges are ghost rows or, with periodic edges, the first and last
+     rows of the board as they were before this step), and bands without any infected cell in or next to
+     them are skipped.
+     Returns the change of the number of cells in each state (by state code), summed over the bands that
+     were stepped, like lastCountChanges after step().
+    """
+    def stepCompact(self, board, bandRows=256):
+        ghostRow = np.full((1, board.cols), outOfBoundsState, dtype=np.uint8)
+        if (self.ca.boundary == "periodic"):
+            rowAbove = board.getRows(board.rows-1, board.rows)
+            rowBelowBoard = board.getRows(0, 1)
+        else:
+            rowAbove = ghostRow
+            rowBelowBoard = ghostRow
+
+        countChanges = np.zeros(5, dtype=np.int64)
+        for start in range(0, board.rows, bandRows):
+            stop = min(start+bandRows, board.rows)
+            band = board.getRows(start, stop)
+            rowBelow = board.getRows(stop, stop+1) if stop < board.rows else rowBelowBoard
+            window = np.concatenate([rowAbove, band, rowBelow])
+            rowAbove = band[-1:].copy()
+
+            if (not ((window == 1) | (window == 3)).any()):
+                continue
+
+            # the halo rows are already there, only the columns get their ghost cells.
+            if (self.ca.boundary == "periodic"):
+                padded = np.pad(window, ((0, 0), (1, 1)), mode="wrap")
+            else:
+                padded = np.pad(window, ((0, 0), (1, 1)), constant_values=outOfBoundsState)
+            nextBand = self.stepPadded(padded, start)
+            countChanges += (np.bincount(nextBand.ravel(), minlength=5) - np.bincount(band.ravel(), minlength=5))[:5]
+            board.setRows(start, nextBand)
+
+        self.lastCountChanges = countChanges.tolist()
+        return self.lastCountChanges
+
+    """
+     Private helper, whether the rules need the neighborhood codes of the 2nd variant.
+    """
+    def __usesSecondVariant(self):
+        return not self.ca.isDeterministic and self.ca.variants == 2
+
+    """
+     Next state codes of cells with the given state codes (center) and neighborhood codes.
+    """
+    def nextStates(self, center, firstCodes, secondCodes=None):
+        if (self.ca.isDeterministic):
+            return self.__deterministicStep(center, firstCodes)
+        elif (self.ca.variants == 2):
+            return self.__bothVariantsStep(center, firstCodes, secondCodes)
+        else:
+            return self.__firstVariantStep(center, firstCodes)
+
+    """
+     Deterministic rules only know S, I and R, any other state is kept as it is.
+    """
+    def __deterministicStep(self, center, codes):
+        return np.where(center <= 2, self.ca.deterministicRule1stVar[codes], center).astype(np.uint8)
+
+    """
+     1st variant non-deterministic rules: S->I and I->R with the probability from the rule map.
+    """
+    def __firstVariantStep(self, center, codes):
+        transition = self.ca.sampler.sampleMany(self.ca.nonDeterministicRule1stVar[codes])
+
+        nextCenter = center.copy()
+        nextCenter[transition & (center == 0)] = 1
+        nextCenter[transition & (center == 1)] = 2
+        return nextCenter
+
+    """
+     Both variants, see bothVariantsTransition().
+    """
+    def __bothVariantsStep(self, center, firstCodes, secondCodes):
+        firstProb = self.ca.nonDeterministicRule1stVar[firstCodes]
+        secondProb = self.ca.nonDeterministicRule2ndVar[secondCodes]
+        return bothVariantsTransition(center, firstProb, secondProb, self.ca.sampler)
@@ -5,22 +5,64 @@
  Implemented by: Anas Gauba
 """
 import numpy as np
+from CARuleTables import outOfBoundsState
+from CARandom import generatorFrom
+
+"""
+ Converts a 2d board of chars (list of lists) into a numpy uint8 array of state codes (see CABoard._states).
+"""
+def charsToStates(board):
+    # each one char string is a single UCS4 code point, so view the chars as ints
+    # and map them to their state codes.
+    lookup = np.zeros(128, dtype=np.uint8)
+    for code, state in enumerate(CABoard._states):
+        lookup[ord(state)] = code
+    chars = np.array(board, dtype="<U1").view(np.uint32)
+    return lookup[chars]
+
+"""
+ Returns the board (numpy array of state codes, the last two axes are the rows and cols) with a ghost cell
+ layer all around it, so every cell of the board has its 8 neighbors without any bounds check:
+   - "fixed": the board has edges, the ghost cells are out of bounds (CARuleTables.outOfBoundsState).
+   - "periodic": the board wraps around (torus), the ghost cells are copies of the cells on the opposite edge.
+"""
+def padStates(states, boundary="fixed"):
+    padWidth = [(0, 0)]*(states.ndim-2) + [(1, 1), (1, 1)]
+    if (boundary == "periodic"):
+        return np.pad(states, padWidth, mode="wrap")
+    return np.pad(states, padWidth, constant_values=outOfBoundsState)
 
 class CABoard:
     # class static variables for 2d board specs.
     _board_row = 50
     _board_col = 50
+    # small integer code of each cell state when the board is held as a numpy array,
+    # the code of a state is its index in this string (S=0, I=1, R=2, I'=3, R'=4).
+    _states = "SIRir"
+    _stateChars = np.array(list(_states))
+    # what is past the edges of the board (see padStates()).
+    _boundaries = ["fixed", "periodic"]
 
     #constructor
-    def __init__(self, input = [[]], isBoardRandom = False):
+    def __init__(self, input = [[]], isBoardRandom = False, counts = None, rng = None):
         # input matrix can be given when we are running iterations of CA.
-        # private member var: __inputBoard 
-        if (len(input) == CABoard._board_row):
+        # private member var: __inputBoard (list of lists of chars) and __stateArray (numpy
+        # array of state codes), whichever of the two is None gets built lazily from the other.
+        # __counts is the number of cells in each state, counted once and then kept up to date by
+        # whoever steps the board (see counts()).
+        self.__inputBoard = None
+        self.__stateArray = None
+        self.__counts = counts
+        if (isinstance(input, np.ndarray)):
+            self.__stateArray = input
+        elif (len(input) == CABoard._board_row):
             self.__inputBoard = input
-        elif (isBoardRandom):
-            self.randomBoard()
         else:
-            self.buildInput()
+            self.__counts = None
+            if (isBoardRandom):
+                self.randomBoard(rng)
+            else:
+                self.buildInput()
     
     """
      Utility method to build input board which has 1st variant
@@ -31,15 +73,10 @@ class CABoard:
     def buildInput(self):
         boardRow = CABoard._board_row
         boardCol = CABoard._board_col
-        # 2d board matrix (list comprehension).
-        self.__inputBoard = [["" for col in range(0,boardCol)] for row in range(0,boardRow)]
-
-        for r in range(0,boardRow):
-            for c in range(0,boardCol):
-                if r == boardRow/2-1 and c == boardCol/2-1:
-                    self.__inputBoard[r][c] = "I"
-                else:
-                    self.__inputBoard[r][c] = "S"
+        # 2d board of state codes, the chars are only built if someone asks for them (see getBoard()).
+        states = np.zeros((boardRow, boardCol), dtype=np.uint8)
+        states[boardRow//2-1, boardCol//2-1] = 1
+        self.setStates(states)
     
     """
      Utility method to build initial random board which includes
@@ -47,54 +84,100 @@ class CABoard:
      Returns an initial board configuration with all cells in Susceptible (S) state
      except for two random positions in the board with both disease variants (I and I').
      NOTE: I' is represented as i because its easy to encode in a string.
+     The positions are drawn from rng (a numpy Generator or a seed, see CARandom), without it from numpy's
+     global random state. See CAInitialBoards for more seeds, densities and clusters.
     """
-    def randomBoard(self):
+    def randomBoard(self, rng=None):
         boardRow = CABoard._board_row
         boardCol = CABoard._board_col
-        rand = np.random
+        randint = np.random.randint if rng is None else generatorFrom(rng).integers
 
-        i = [rand.randint(0,boardRow), rand.randint(0,boardCol)]
-        iPrime = [rand.randint(0,boardRow), rand.randint(0,boardCol)]
+        i = [randint(0,boardRow), randint(0,boardCol)]
+        iPrime = [randint(0,boardRow), randint(0,boardCol)]
         
         # choose different random location for i' if i and i' turned out
         # to be in the same spot.
         while(i == iPrime):
-            iPrime = [rand.randint(0,boardRow), rand.randint(0,boardCol)]
+            iPrime = [randint(0,boardRow), randint(0,boardCol)]
         
-        # 2d board (list comprehension).
-        self.__inputBoard = [["" for col in range(0,boardCol)] for row in range(0,boardRow)]
-
-        for r in range(0,boardRow):
-            for c in range(0,boardCol):
-                # include i in the initial board.
-                if (r == i[0] and c == i[1]):
-                    self.__inputBoard[r][c] = "I"
-                # include i'
-                elif (r == iPrime[0] and c == iPrime[1]):
-                    self.__inputBoard[r][c] = "i"
-                else:
-                    self.__inputBoard[r][c] = "S"
+        # 2d board of state codes, include i and i' in the initial board.
+        states = np.zeros((boardRow, boardCol), dtype=np.uint8)
+        states[i[0], i[1]] = 1
+        states[iPrime[0], iPrime[1]] = 3
+        self.setStates(states)
 
 
     """
      Gets the 2d board for a current instance.
     """
     def getBoard(self):
+        if (self.__inputBoard is None):
+            self.__inputBoard = CABoard._stateChars[self.__stateArray].tolist()
         return self.__inputBoard
     
     """
      Sets the 2d board for this instance to the provided board as parameter.
     """
-    def setBoard(self, board):
+    def setBoard(self, board, counts=None):
         self.__inputBoard = board
+        self.__stateArray = None
+        self.__counts = counts
+
+    """
+     Gets the 2d board as a numpy uint8 array of state codes (see CABoard._states).
+     The returned array is shared with the board, so treat it as read-only.
+    """
+    def getStates(self):
+        if (self.__stateArray is None):
+            self.__stateArray = charsToStates(self.__inputBoard)
+        return self.__stateArray
+
+    """
+     Sets the 2d board for this instance to the provided numpy array of state codes.
+     counts (see counts()) can be given if they are already known, otherwise they are counted when needed.
+    """
+    def setStates(self, states, counts=None):
+        self.__stateArray = states
+        self.__inputBoard = None
+        self.__counts = counts
+
+    """
+     Gets the numpy array of state codes with its ghost cell layer for the given boundary (see padStates()).
+    """
+    def getPaddedStates(self, boundary="fixed"):
+        return padStates(self.getStates(), boundary)
+
+    """
+     Number of cells in each state as a dict keyed by the state chars (S, I, R, i, r).
+     The board is only scanned the first time, after that the CA hands the updated counts to each next board
+     (see CA2dSIRDynamics.iterateCABoard()), so this is O(1) while iterating.
+    """
+    def counts(self):
+        if (self.__counts is None):
+            self.__counts = dict(zip(CABoard._states, np.bincount(self.getStates().ravel(), minlength=5)[:5].tolist()))
+        return dict(self.__counts)
+
+    """
+     Number of cells in the given state (S, I, R, i or r).
+    """
+    def count(self, state):
+        self.counts()
+        return self.__counts[state]
+
+    """
+     Whether there is any infected cell (I or I') left on the board.
+    """
+    def hasInfected(self):
+        return self.count("I") + self.count("i") > 0
 
     """
      toString() method to print board.
     """
     def __str__(self):
+        board = self.getBoard()
         stringBuilder = ""
         for r in range(0,CABoard._board_row):
             for c in range(0,CABoard._board_col):
-                stringBuilder += self.__inputBoard[r][c]
+                stringBuilder += board[r][c]
             stringBuilder += "\n"
         return stringBuilder
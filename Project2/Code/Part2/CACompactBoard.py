@@ -0,0 +1,226 @@
+"""
+ Compact Cellular Automata board for very large grids. CABoard keeps one python string per cell,
+ which is about 8 bytes of pointer per cell plus the list overhead. This board keeps the state codes
+ (see CABoard._states: S, I, R, I', R') in a numpy array instead, either one byte per cell or packed
+ into 3 bits per cell (a 20000x20000 board takes 150MB packed instead of GBs of lists).
+ Every row is packed on its own, so rows and tiles can be read and written without unpacking the
+ whole grid, which is how the numpy engine steps it (band by band, see CA2dVectorizedEngine.stepCompact()).
+ For small boards it behaves like CABoard (getBoard, setBoard, getStates, setStates and __str__).
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+from CARandom import generatorFrom
+
+"""
+ Packs a 2d array of state codes into 3 bits per cell, each row starts on a new byte.
+"""
+def packStates(states):
+    rows, cols = states.shape
+    bits = (states[:, :, None] >> np.array([2, 1, 0], dtype=np.uint8)) & 1
+    return np.packbits(bits.reshape(rows, 3*cols), axis=1)
+
+"""
+ Unpacks rows packed by packStates() back into a 2d array of state codes with cols columns.
+"""
+def unpackStates(packed, cols):
+    bits = np.unpackbits(packed, axis=1, count=3*cols).reshape(len(packed), cols, 3)
+    return (bits[:, :, 0] << 2) | (bits[:, :, 1] << 1) | bits[:, :, 2]
+
+class CACompactBoard:
+    #constructor
+    def __init__(self, input = [[]], isBoardRandom = False, rows = None, cols = None, bitsPerCell = 3, rng = None):
+        # by default the board has the same size as CABoard.
+        if (rows is None):
+            rows = CABoard._board_row
+        if (cols is None):
+            cols = CABoard._board_col
+        if (bitsPerCell not in (3, 8)):
+            errMessage = "Invalid bitsPerCell: {}. Please select 3 (packed) or 8 (one byte per cell).".format(bitsPerCell)
+            raise Exception(errMessage)
+        self.bitsPerCell = bitsPerCell
+        # private member var: __counts, the number of cells in each state, counted once and then kept up to
+        # date by whoever steps the board (see counts()), like CABoard's.
+        self.__counts = None
+
+        if (isinstance(input, np.ndarray)):
+            self.setStates(input)
+        elif (len(input) == rows):
+            self.setBoard(input)
+        else:
+            self.rows = rows
+            self.cols = cols
+            # private member var: __cells, the (packed) state codes of the board, starts as all S
+            # (S is code 0, so that is all zero bytes either way).
+            rowBytes = cols if bitsPerCell == 8 else (3*cols + 7)//8
+            self.__cells = np.zeros((rows, rowBytes), dtype=np.uint8)
+            if (isBoardRandom):
+                self.randomBoard(rng)
+            else:
+                self.buildInput()
+
+    """
+     Same as CABoard.buildInput(): all cells in Susceptible (S) state except one in Infected (I) state.
+    """
+    def buildInput(self):
+        self.setCell(self.rows//2-1, self.cols//2-1, 1)
+
+    """
+     Same as CABoard.randomBoard(): all cells in Susceptible (S) state except for two random
+     positions in the board with both disease variants (I and I'), drawn from rng (see CARandom).
+    """
+    def randomBoard(self, rng=None):
+        randint = np.random.randint if rng is None else generatorFrom(rng).integers
+        i = [randint(0,self.rows), randint(0,self.cols)]
+        iPrime = [randint(0,self.rows), randint(0,self.cols)]
+
+        # choose different random location for i' if i and i' turned out
+        # to be in the same spot.
+        while(i == iPrime):
+            iPrime = [randint(0,self.rows), randint(0,self.cols)]
+
+        self.setCell(i[0], i[1], 1)
+        self.setCell(iPrime[0], iPrime[1], 3)
+
+    """
+     Private helpers to go between state codes and the stored cells.
+    """
+    def __encode(self, states):
+        if (self.bitsPerCell == 3):
+            return packStates(states)
+        return states.astype(np.uint8)
+
+    def __decode(self, cells):
+        if (self.bitsPerCell == 3):
+            return unpackStates(cells, self.cols)
+        return cells.copy()
+
+    """
+     Gets the stored cells (packed rows with bitsPerCell=3, state codes with bitsPerCell=8), e.g. to save them.
+    """
+    def getCells(self):
+        return self.__cells
+
+    """
+     Sets the stored cells of a rows x cols board, as returned by getCells() (they are used as they are, not copied).
+     counts (see counts()) can be given if they are already known, otherwise they are counted when needed.
+    """
+    def setCells(self, cells, rows, cols, counts=None):
+        self.rows = rows
+        self.cols = cols
+        self.__cells = cells
+        self.__counts = counts
+
+    """
+     Gets the state codes of the rows [start, stop) as a numpy uint8 array.
+    """
+    def getRows(self, start, stop):
+        return self.__decode(self.__cells[start:stop])
+
+    """
+     Sets the rows starting at start to the given numpy array of state codes. The counts are counted again
+     when needed, unless whoever sets the rows also sets the updated counts (see setCounts()).
+    """
+    def setRows(self, start, states):
+        self.__cells[start:start+len(states)] = self.__encode(states)
+        self.__counts = None
+
+    """
+     Gets the state codes of row r.
+    """
+    def getRow(self, r):
+        return self.getRows(r, r+1)[0]
+
+    """
+     Gets the state codes of the tile of rows [rowStart, rowStop) and cols [colStart, colStop).
+    """
+    def getTile(self, rowStart, rowStop, colStart, colStop):
+        return self.getRows(rowStart, rowStop)[:, colStart:colStop]
+
+    """
+     Sets the tile whose upper left cell is at (rowStart, colStart) to the given numpy array of state codes.
+    """
+    def setTile(self, rowStart, colStart, states):
+        rows = self.getRows(rowStart, rowStart+len(states))
+        rows[:, colStart:colStart+states.shape[1]] = states
+        self.setRows(rowStart, rows)
+
+    """
+     Gets/sets the state code of a single cell.
+    """
+    def getCell(self, r, c):
+        return self.getRow(r)[c]
+
+    def setCell(self, r, c, state):
+        row = self.getRows(r, r+1)
+        row[0, c] = state
+        self.setRows(r, row)
+
+    """
+     Number of bytes used to store the cells.
+    """
+    def nbytes(self):
+        return self.__cells.nbytes
+
+    """
+     Gets the whole board as a numpy uint8 array of state codes (only for boards that fit in memory unpacked).
+    """
+    def getStates(self):
+        return self.getRows(0, self.rows)
+
+    """
+     Sets the whole board to the given numpy array of state codes.
+     counts (see counts()) can be given if they are already known, otherwise they are counted when needed.
+    """
+    def setStates(self, states, counts=None):
+        self.rows, self.cols = states.shape
+        self.__cells = self.__encode(states)
+        self.__counts = counts
+
+    """
+     Sets the number of cells in each state of a board stepped in place (see CA2dSIRDynamics.iterateCABoard()).
+    """
+    def setCounts(self, counts):
+        self.__counts = dict(counts)
+
+    """
+     Number of cells in each state as a dict keyed by the state chars (S, I, R, i, r), like CABoard.counts().
+     The board is only scanned (band by band of bandRows rows) the first time, after that the CA keeps the
+     counts up to date with the changes of each step, so this is O(1) while iterating.
+    """
+    def counts(self, bandRows=256):
+        if (self.__counts is None):
+            counts = np.zeros(5, dtype=np.int64)
+            for start in range(0, self.rows, bandRows):
+                counts += np.bincount(self.getRows(start, start+bandRows).ravel(), minlength=5)[:5]
+            self.__counts = dict(zip(CABoard._states, counts.tolist()))
+        return dict(self.__counts)
+
+    """
+     Whether there is any infected cell (I or I') left on the board.
+    """
+    def hasInfected(self):
+        self.counts()
+        return self.__counts["I"] + self.__counts["i"] > 0
+
+    """
+     Gets the 2d board as list of lists of chars, like CABoard.getBoard() (only for small boards).
+    """
+    def getBoard(self):
+        return CABoard._stateChars[self.getStates()].tolist()
+
+    """
+     Sets the 2d board to the provided list of lists of chars.
+    """
+    def setBoard(self, board):
+        self.setStates(charsToStates(board))
+
+    """
+     toString() method to print board.
+    """
+    def __str__(self):
+        stringBuilder = ""
+        for r in range(0,self.rows):
+            stringBuilder += "".join(CABoard._stateChars[self.getRow(r)]) + "\n"
+        return stringBuilder
@@ -0,0 +1,114 @@
+"""
+ Builders of initial boards (initial conditions) for the CA. Each builder returns a numpy uint8 array of
+ state codes (see CABoard._states) built with whole-array numpy operations, which can be given to
+ CABoard(states) or CACompactBoard(states). The builders are:
+   - seededStates(): k random seeds of each variant (CABoard.randomBoard() is 1 of each).
+   - densityStates(): every cell is infected with a given probability (initial infected density).
+   - clusteredStates(): a number of random clusters (squares of infected cells) of each variant.
+   - statesFromSeedMask(): seeds given as boolean arrays (or .npy files of them).
+ The random builders take an rng (a numpy Generator or a seed, see CARandom), by default a generator seeded
+ from numpy's global random state, so np.random.seed() still reproduces the boards.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CABoard import *
+from CARandom import generatorFrom
+
+"""
+ Private helper, the default board size is the size of CABoard.
+"""
+def _boardSize(rows, cols):
+    if (rows is None):
+        rows = CABoard._board_row
+    if (cols is None):
+        cols = CABoard._board_col
+    return rows, cols
+
+"""
+ Private helper that dilates a boolean mask by radius cells in all 8 directions (every cell within
+ Chebyshev distance radius of a True cell becomes True). Uses running sums along the rows and then the
+ cols, so it takes O(cells) whatever the radius.
+"""
+def _dilate(mask, radius):
+    for axis in (0, 1):
+        padWidth = [(0, 0), (0, 0)]
+        padWidth[axis] = (radius+1, radius)
+        sums = np.cumsum(np.pad(mask, padWidth).astype(np.int32), axis=axis)
+        width = 2*radius+1
+        if (axis == 0):
+            mask = (sums[width:] - sums[:-width]) > 0
+        else:
+            mask = (sums[:, width:] - sums[:, :-width]) > 0
+    return mask
+
+"""
+ Board with seedsPerVariant[0] I cells and seedsPerVariant[1] I' cells at random distinct positions,
+ all other cells are S.
+"""
+def seededStates(rows=None, cols=None, seedsPerVariant=(1, 1), rng=None):
+    rows, cols = _boardSize(rows, cols)
+    firstSeeds, secondSeeds = seedsPerVariant
+    if (firstSeeds + secondSeeds > rows*cols):
+        errMessage = "Too many seeds: {} for a {}x{} board.".format(firstSeeds + secondSeeds, rows, cols)
+        raise Exception(errMessage)
+    cells = generatorFrom(rng).choice(rows*cols, firstSeeds + secondSeeds, replace=False)
+
+    states = np.zeros(rows*cols, dtype=np.uint8)
+    states[cells[:firstSeeds]] = 1
+    states[cells[firstSeeds:]] = 3
+    return states.reshape(rows, cols)
+
+"""
+ Board where every cell is I with probability density[0] and I' with probability density[1] (S otherwise).
+"""
+def densityStates(rows=None, cols=None, density=(0.01, 0.0), rng=None):
+    rows, cols = _boardSize(rows, cols)
+    firstDensity, secondDensity = density
+    if (firstDensity < 0 or secondDensity < 0 or firstDensity + secondDensity > 1):
+        errMessage = "Invalid density: {}. Both must be >= 0 and add up to at most 1.".format(density)
+        raise Exception(errMessage)
+    draws = generatorFrom(rng).random((rows, cols))
+
+    states = np.zeros((rows, cols), dtype=np.uint8)
+    states[draws < firstDensity] = 1
+    states[(draws >= firstDensity) & (draws < firstDensity + secondDensity)] = 3
+    return states
+
+"""
+ Board with clusters[0] clusters of I and clusters[1] clusters of I' at random positions. A cluster is the
+ square of cells within radius of its center (cut at the edges of the board), each cell of it is infected
+ with probability clusterDensity. Where clusters of both variants overlap, the cells get the 1st variant.
+"""
+def clusteredStates(rows=None, cols=None, clusters=(1, 1), radius=2, clusterDensity=1.0, rng=None):
+    rows, cols = _boardSize(rows, cols)
+    rng = generatorFrom(rng)
+    states = np.zeros((rows, cols), dtype=np.uint8)
+    for state, count in ((3, clusters[1]), (1, clusters[0])):
+        centers = np.zeros((rows, cols), dtype=bool)
+        centers.flat[rng.integers(0, rows*cols, count)] = True
+        inCluster = _dilate(centers, radius) & (rng.random((rows, cols)) < clusterDensity)
+        states[inCluster] = state
+    return states
+
+"""
+ Board with I at the True cells of firstMask and I' at the True cells of secondMask (where both are True,
+ the cell gets the 1st variant). The masks are boolean (or 0/1) arrays of the board size, or paths to .npy
+ files of them.
+"""
+def statesFromSeedMask(firstMask, secondMask=None):
+    if (isinstance(firstMask, str)):
+        firstMask = np.load(firstMask)
+    if (isinstance(secondMask, str)):
+        secondMask = np.load(secondMask)
+    firstMask = np.asarray(firstMask, dtype=bool)
+
+    states = np.zeros(firstMask.shape, dtype=np.uint8)
+    if (secondMask is not None):
+        secondMask = np.asarray(secondMask, dtype=bool)
+        if (secondMask.shape != firstMask.shape):
+            errMessage = "Seed masks have different shapes: {} and {}.".format(firstMask.shape, secondMask.shape)
+            raise Exception(errMessage)
+        states[secondMask] = 3
+    states[firstMask] = 1
+    return states
@@ -0,0 +1,182 @@
+"""
+ Random streams of the simulations. Every object that draws random numbers (CA2dSIRDynamics, CABoard,
+ CACompactBoard, GeneticAlgorithm2DCA, CA2dPopulationEngine, the samplers and CAInitialBoards) takes an
+ rng which is either:
+   - None: a generator seeded from numpy's global random state, so np.random.seed() still reproduces a run.
+   - a seed (int or sequence of ints, e.g. [seed, worker]): the same seed always gives the same run.
+   - a numpy Generator, used as it is.
+ spawnGenerators() splits a generator into independent child streams (numpy's SeedSequence spawning, the
+ children don't overlap or correlate) to hand to workers, population members or tiles.
+ CounterSampler is a sampler (same interface as BernoulliSampler) whose random number for a cell is a hash
+ of (seed, generation, draw, member, row, col) instead of the next number of a stream. The number a cell
+ gets does not depend on which cells were drawn before it, so a board stepped in tiles or bands, in any
+ order or by several processes (see CA2dParallelStepper), is bit-identical to the same board stepped in one
+ piece. The engines tell the sampler which cells the next draws are for with setPosition().
+ generatorState() and generatorFromState() save and rebuild a generator, with the state of its seed sequence
+ so it spawns the same children after it is rebuilt (e.g. to resume a run from a checkpoint).
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+
+"""
+ Returns the numpy Generator for rng (None, a seed or a Generator, see above).
+"""
+def generatorFrom(rng=None):
+    if (rng is None):
+        return np.random.default_rng(np.random.randint(0, 2**31-1))
+    if (isinstance(rng, np.random.Generator)):
+        return rng
+    return np.random.default_rng(rng)
+
+"""
+ Returns count independent child generators of rng (None, a seed or a Generator). Spawning the same
+ generator (or seed) again gives the next children, not the same ones.
+"""
+def spawnGenerators(rng, count):
+    generator = generatorFrom(rng)
+    if (hasattr(generator, "spawn")):
+        return generator.spawn(count)
+    # older numpy versions only spawn seed sequences.
+    return [np.random.default_rng(child) for child in generator.bit_generator._seed_seq.spawn(count)]
+
+"""
+ Returns the state of a generator as a dict of JSON values: the state of its bit generator and of the seed
+ sequence it spawns children from (how many children it spawned so far).
+"""
+def generatorState(generator):
+    state = {"bitGenerator": generator.bit_generator.state}
+    seedSequence = getattr(generator.bit_generator, "seed_seq", getattr(generator.bit_generator, "_seed_seq", None))
+    if (isinstance(seedSequence, np.random.SeedSequence)):
+        state["seedSequence"] = {"entropy": seedSequence.entropy, "spawnKey": list(seedSequence.spawn_key),
+                                 "poolSize": seedSequence.pool_size, "children": seedSequence.n_children_spawned}
+    return state
+
+"""
+ Returns a new generator in the state returned by generatorState().
+"""
+def generatorFromState(state):
+    bitGeneratorState = state["bitGenerator"]
+    bitGeneratorType = getattr(np.random, bitGeneratorState["bit_generator"])
+    if ("seedSequence" in state):
+        sequence = state["seedSequence"]
+        bitGenerator = bitGeneratorType(np.random.SeedSequence(sequence["entropy"], spawn_key=tuple(sequence["spawnKey"]),
+                                                               pool_size=sequence["poolSize"], n_children_spawned=sequence["children"]))
+    else:
+        bitGenerator = bitGeneratorType()
+    bitGenerator.state = bitGeneratorState
+    return np.random.Generator(bitGenerator)
+
+_mask = (1 << 64) - 1
+# odd constants of the hash (golden ratio and splitmix64 constants).
+_golden = 0x9E3779B97F4A7C15
+_mix1 = 0xBF58476D1CE4E5B9
+_mix2 = 0x94D049BB133111EB
+
+"""
+ Private helpers, the splitmix64 finalizer: mixes the bits of 64 bit ints, python ints (_mixInt) or
+ numpy uint64 arrays (_mix, which wrap around on overflow like the masked python ints).
+"""
+def _mixInt(x):
+    x &= _mask
+    x = ((x ^ (x >> 30)) * _mix1) & _mask
+    x = ((x ^ (x >> 27)) * _mix2) & _mask
+    return x ^ (x >> 31)
+
+def _mix(x):
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(_mix1)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(_mix2)
+        return x ^ (x >> np.uint64(31))
+
+"""
+ Private helper, uniform numbers in [0,1) from hashes (the 53 high bits, like numpy's random()).
+"""
+def _toUniforms(hashes):
+    return (hashes >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+class CounterSampler:
+    def __init__(self, seed=0):
+        if (isinstance(seed, np.random.Generator)):
+            # a seed drawn from the generator.
+            seed = int(seed.integers(0, 2**63))
+        self.__setSeed(seed)
+        # private member vars: the cells the next draws are for (see setPosition()) and how many draws were
+        # done for them.
+        self.__generation = 0
+        self.__rows = 0
+        self.__cols = 0
+        self.__members = 0
+        self.__draw = 0
+
+    """
+     Private helper, sets the seed and its hash key (any seed numpy accepts).
+    """
+    def __setSeed(self, seed):
+        self.seed = seed
+        self.__key = int(np.random.SeedSequence(seed).generate_state(1, np.uint64)[0])
+
+    """
+     Sets the cells the next draws are for: the generation being computed, the rows and cols of the cells
+     on the board (ints, or arrays that broadcast to the shape of the draws) and, for a population of boards
+     (see CA2dPopulationEngine), the member of each board (the generation can be per member too).
+     The draws count again from 0, so the k-th draw of a cell is the same whatever else is drawn.
+    """
+    def setPosition(self, generation, rows=0, cols=0, members=0):
+        self.__generation = generation
+        self.__rows = rows
+        self.__cols = cols
+        self.__members = members
+        self.__draw = 0
+
+    """
+     Returns an array of uniform random numbers in [0,1) of the given shape, one per cell of the position.
+    """
+    def uniforms(self, shape):
+        base = _mixInt(self.__key ^ _mixInt(self.__draw * _golden + 1))
+        self.__draw += 1
+        with np.errstate(over="ignore"):
+            # the parts that only depend on the rows (with the generation and member) and on the cols are
+            # hashed on their own, only the last two rounds are per cell.
+            generation = np.asarray(self.__generation, dtype=np.uint64)
+            members = np.asarray(self.__members, dtype=np.uint64)
+            rows = np.asarray(self.__rows, dtype=np.uint64)
+            cols = np.asarray(self.__cols, dtype=np.uint64)
+            rowPart = _mix(np.uint64(base) ^ _mix(generation * np.uint64(_golden) + np.uint64(1)))
+            rowPart = _mix(rowPart ^ _mix(members * np.uint64(_golden) + np.uint64(2)))
+            rowPart = _mix(rowPart ^ _mix(rows * np.uint64(_golden) + np.uint64(3)))
+            colPart = _mix(cols * np.uint64(_golden) + np.uint64(4))
+            hashes = _mix(_mix(rowPart ^ colPart))
+        return _toUniforms(np.broadcast_to(hashes, shape))
+
+    """
+     Returns a boolean array, each entry is True with the probability at the same place in percents.
+    """
+    def sampleMany(self, percents):
+        return self.uniforms(np.shape(percents)) < percents
+
+    """
+     Returns True/False with probability percent of True, for the cell of the position (one int row and col).
+    """
+    def sample(self, percent):
+        if (percent <= 0):
+            return False
+        if (percent >= 1):
+            return True
+
+        x = _mixInt(self.__key ^ _mixInt(self.__draw * _golden + 1))
+        self.__draw += 1
+        for part, value in enumerate((self.__generation, self.__members, self.__rows)):
+            x = _mixInt(x ^ _mixInt(int(value) * _golden + part + 1))
+        x = _mixInt(_mixInt(x ^ _mixInt(int(self.__cols) * _golden + 4)))
+        return (x >> 11) * (1.0 / (1 << 53)) < percent
+
+    """
+     Same as BernoulliSampler.getState()/setState(): the numbers only depend on the seed and the position,
+     so the seed is the whole state.
+    """
+    def getState(self):
+        return {"counterSeed": self.seed}, np.zeros(0, dtype=np.float64)
+
+    def setState(self, generatorState, block):
+        self.__setSeed(generatorState["counterSeed"])
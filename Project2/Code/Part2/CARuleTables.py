@@ -0,0 +1,301 @@
+"""
+ Integer coded rule tables for the 2d CA with SIR dynamics (see CA2dSIRDynamics).
+ A neighborhood (the 9 letter keyStr like "XXXXSIXSS") is packed into one base-4 integer code:
+ each variant reads the board with its own 4 letter alphabet, where X (out of bounds) is its own digit.
+   - 1st variant: S=0, I=1, R=2, X=3 (i is read as S and r as R).
+   - 2nd variant: S=0, i=1, r=2, X=3 (I is read as S and R as r).
+ The first letter of the keyStr is the most significant digit, so the rule maps become flat arrays
+ of 4^9 entries indexed by that code. Codes that can never be seen on a board (X's in places no
+ board cell has them) are 0. This module also has helpers to go to and from the legacy string keys
+ (e.g. the ruleFor2ndVariant dict written by GA).
+ The tables that never change are built once per process, shared read-only between all the CA's
+ and persisted as .npy files in cacheDir (in the user's cache directory), so new processes (and pool workers) just memory map them.
+ Implemented by: Anas Gauba
+"""
+
+import itertools
+import os
+import tempfile
+import numpy as np
+
+# size of a rule table, 4 digits for each of the 9 cells of the neighborhood.
+tableSize = 4**9
+# digit of out of bounds cells.
+outOfBounds = 3
+# letters of the 4 digits of each variant.
+variantDigits = {1: "SIRX", 2: "SirX"}
+# board letter (including the X for out of bounds) -> digit, as seen by each variant.
+variantDigitOf = {
+    1: {"S": 0, "I": 1, "R": 2, "i": 0, "r": 2, "X": 3},
+    2: {"S": 0, "I": 0, "R": 2, "i": 1, "r": 2, "X": 3},
+}
+"""
+ Private helper, the default directory of the on disk cache: in the user's cache directory ($XDG_CACHE_HOME
+ or ~/.cache), or in the temp directory if there is no home, never in the source tree (which can be read-only
+ or shared by several checkouts).
+"""
+def _defaultCacheDir():
+    home = os.path.expanduser("~")
+    base = os.environ.get("XDG_CACHE_HOME") or (os.path.join(home, ".cache") if home != "~" else tempfile.gettempdir())
+    return os.path.join(base, "epidemic-spread", "ruleTables")
+
+# directory of the on disk cache of the rule tables, can be moved with the CA_RULE_TABLE_CACHE env variable.
+cacheDir = os.environ.get("CA_RULE_TABLE_CACHE") or _defaultCacheDir()
+# bump this whenever the encoding or the rules change so stale cache files are not used.
+_cacheVersion = 2
+# state code of out of bounds cells when a board is padded, right after the codes of CABoard._states.
+outOfBoundsState = 5
+# board state code (see CABoard._states: S, I, R, i, r, and X for padding) -> digit, as seen by each variant.
+variantView = {
+    1: np.array([0, 1, 2, 0, 2, 3], dtype=np.int32),
+    2: np.array([0, 0, 2, 1, 2, 3], dtype=np.int32),
+}
+
+"""
+ Packs a 9 letter keyStr into its neighborhood code for the given variant.
+"""
+def keyToCode(mapKey, variant=1):
+    digitOf = variantDigitOf[variant]
+    code = 0
+    for letter in mapKey:
+        code = code*4 + digitOf[letter]
+    return code
+
+"""
+ Unpacks a neighborhood code back into its 9 letter keyStr for the given variant.
+"""
+def codeToKey(code, variant=1):
+    digits = variantDigits[variant]
+    mapKey = ""
+    for shift in range(16, -1, -2):
+        mapKey += digits[(code >> shift) & 3]
+    return mapKey
+
+"""
+ Returns the codes of every neighborhood that can be seen on a board, in the same order the legacy
+ rule maps were filled: the normal in bound cells (3^9), then the four corners (4*3^4, topLeft,
+ bottomLeft, topRight, bottomRight for each permutation) and then the four edges (4*3^6, left,
+ top, right, bottom for each permutation). That is 22923 codes. GA relies on this order for crossover.
+ NOTE: the codes are the same for both variants, only the letters of the digits differ.
+"""
+def validCodes():
+    return sharedTable("validCodes")
+
+"""
+ Private builder of validCodes().
+"""
+def _buildValidCodes():
+    dynamics = "SIR"
+    keys = ["".join(perm) for perm in itertools.product(dynamics, repeat=9)]
+    for perm in itertools.product(dynamics, repeat=4):
+        keys.append("XXXX" + perm[0] + perm[1] + "X" + perm[2] + perm[3])
+        keys.append("XXX" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X")
+        keys.append("X" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "XXX")
+        keys.append(perm[0] + perm[1] + "X" + perm[2] + perm[3] + "XXXX")
+    for perm in itertools.product(dynamics, repeat=6):
+        keys.append("XXX" + "".join(perm))
+        keys.append("X" + perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X" + perm[4] + perm[5])
+        keys.append("".join(perm) + "XXX")
+        keys.append(perm[0] + perm[1] + "X" + perm[2] + perm[3] + "X" + perm[4] + perm[5] + "X")
+    return np.array([keyToCode(mapKey) for mapKey in keys], dtype=np.int32)
+
+"""
+ Private helper that returns the digits (tableSize x 9) of every valid code and a
+ mask of which codes are valid.
+"""
+def _allDigits():
+    codes = np.arange(tableSize, dtype=np.int32)
+    digits = np.stack([(codes >> shift) & 3 for shift in range(16, -1, -2)], axis=1)
+    valid = np.zeros(tableSize, dtype=bool)
+    valid[validCodes()] = True
+    return digits, valid
+
+"""
+ Private helper, the mask of the codes a cell can have on a board with fixed edges of any size: the X's are
+ the cells past any of its top, bottom, left and right edges. That is validCodes() and, for the boards one
+ row or one column wide, the codes with X's past two opposite edges (the legacy keys don't have them).
+"""
+def _onBoardCodes(digits):
+    sides = [[0, 1, 2], [6, 7, 8], [0, 3, 6], [2, 5, 8]]
+    isX = digits == outOfBounds
+    onBoard = np.zeros(len(digits), dtype=bool)
+    for chosen in itertools.product([False, True], repeat=4):
+        pattern = np.zeros(9, dtype=bool)
+        for side, isChosen in zip(sides, chosen):
+            pattern[side] |= isChosen
+        onBoard |= (isX == pattern).all(axis=1)
+    return onBoard
+
+"""
+ Deterministic rule table of the 1st variant. The value is the state code (S=0, I=1, R=2) of the
+ center cell after an iteration (for every code a cell can have, see _onBoardCodes()):
+    if it is R, always map the value to R.
+    if it is I, only goes to R if all neighbors are I. Otherwise, map to stay I.
+    if it is S, only go to I if atleast one neighbor is I. Otherwise, maps to S.
+"""
+def buildDeterministicRule():
+    digits = _allDigits()[0]
+    center = digits[:, 4]
+    infected = (digits == 1).sum(axis=1)
+
+    table = np.zeros(tableSize, dtype=np.uint8)
+    table[(center == 0) & (infected > 0)] = 1
+    table[(center == 1) & (infected < 9)] = 1
+    table[(center == 1) & (infected == 9)] = 2
+    table[center == 2] = 2
+    table[~_onBoardCodes(digits)] = 0
+    return table
+
+"""
+ Non-deterministic rule table of the 1st variant, the probability of the center cell
+ transitioning S->I or I->R. P(S->I) is based on the numbers of infected neighbors
+ (#I/8) and P(I->R) is fixed to be 10%. R never changes.
+"""
+def buildFirstVariantRule():
+    digits = _allDigits()[0]
+    center = digits[:, 4]
+    infected = (digits == 1).sum(axis=1)
+
+    table = np.zeros(tableSize, dtype=np.float32)
+    table[center == 0] = infected[center == 0]/8
+    table[center == 1] = 1/10
+    table[~_onBoardCodes(digits)] = 0
+    return table
+
+"""
+ Initial non-deterministic rule table of the 2nd variant with the probability of S->I' and I'->R'
+ (chosen uniformly random by the CA). The probability is 0 if there are no i neighbors, and r never changes.
+ This is the table that GA evolves, so every CA gets its own copy.
+"""
+def buildSecondVariantRule(sToIPrimeProb, iPrimeToRPrimeProb):
+    table = np.zeros(tableSize, dtype=np.float32)
+    table[sharedTable("secondVariantSusceptible")] = sToIPrimeProb
+    table[sharedTable("secondVariantInfected")] = iPrimeToRPrimeProb
+    return table
+
+"""
+ Private builders of the masks of the neighborhoods that use P(S->I') and P(I'->R') in the 2nd variant table.
+"""
+def _buildSecondVariantSusceptible():
+    digits, valid = _allDigits()
+    return valid & (digits[:, 4] == 0) & (digits == 1).any(axis=1)
+
+def _buildSecondVariantInfected():
+    digits, valid = _allDigits()
+    return valid & (digits[:, 4] == 1)
+
+"""
+ Converts a legacy rule map keyed by 9 letter keyStr into a rule table. Any entry that is not a
+ neighborhood (like the "fitness" entry GA used to store in the 2nd variant map) is skipped.
+"""
+def ruleTableFromDict(ruleMap, variant=1, dtype=np.float32):
+    table = np.zeros(tableSize, dtype=dtype)
+    for mapKey, value in ruleMap.items():
+        if (len(mapKey) == 9):
+            table[keyToCode(mapKey, variant)] = value
+    return table
+
+"""
+ Keys of the equivalence classes of the 2nd variant table: (center, number of i neighbors, number of in bound
+ neighbors), with center "S" or "i" (the only cells with a non-zero probability, S needs at least one i
+ neighbor), for the corners (3 in bound neighbors), edges (5) and the other cells (8). The neighborhoods of
+ a class only differ in where their i neighbors are, so a table with one probability per class is a much
+ smaller genome for GA (see GAGenome), 35 classes instead of 22923 codes.
+"""
+def secondVariantClassKeys():
+    keys = []
+    for center in "Si":
+        for inBound in (3, 5, 8):
+            for iNeighbors in range(1 if center == "S" else 0, inBound+1):
+                keys.append((center, iNeighbors, inBound))
+    return keys
+
+"""
+ Private builder of the class (index into secondVariantClassKeys()) of every code of the 2nd variant
+ table, -1 for the codes that are always 0.
+"""
+def _buildSecondVariantClasses():
+    digits, valid = _allDigits()
+    center = digits[:, 4]
+    iNeighbors = (digits == 1).sum(axis=1) - (center == 1)
+    inBound = (digits != outOfBounds).sum(axis=1) - 1
+    classOf = {key: index for index, key in enumerate(secondVariantClassKeys())}
+
+    classes = np.full(tableSize, -1, dtype=np.int32)
+    for (centerLetter, count, bound), index in classOf.items():
+        centerDigit = variantDigitOf[2][centerLetter]
+        classes[valid & (center == centerDigit) & (iNeighbors == count) & (inBound == bound)] = index
+    return classes
+
+"""
+ Converts a rule table back into a legacy rule map keyed by 9 letter keyStr (valid neighborhoods only).
+"""
+def ruleTableToDict(table, variant=1):
+    return {codeToKey(code, variant): table[code].item() for code in validCodes().tolist()}
+
+_builders = {
+    "validCodes": _buildValidCodes,
+    "deterministic": buildDeterministicRule,
+    "firstVariant": buildFirstVariantRule,
+    "secondVariantSusceptible": _buildSecondVariantSusceptible,
+    "secondVariantInfected": _buildSecondVariantInfected,
+    "secondVariantClasses": _buildSecondVariantClasses,
+}
+_sharedTables = {}
+
+"""
+ Returns the read-only table with the given name (see _builders). It is built only once per process,
+ the first time it is looked up in cacheDir (memory mapped) and built and saved there if it is missing.
+"""
+def sharedTable(name):
+    if (name not in _sharedTables):
+        path = os.path.join(cacheDir, "{}_v{}.npy".format(name, _cacheVersion))
+        table = None
+        try:
+            # asarray() so the lookups give plain arrays instead of np.memmap's.
+            table = np.asarray(np.load(path, mmap_mode="r"))
+        except (OSError, ValueError):
+            # not cached yet (or the file is broken), build it below.
+            pass
+        if (table is None):
+            table = _builders[name]()
+            _saveTable(path, table)
+            table.setflags(write=False)
+        _sharedTables[name] = table
+    return _sharedTables[name]
+
+"""
+ Private helper that saves a table to the cache. The file is written under a temporary name and
+ then renamed, so processes starting at the same time never load a half written file. The cache
+ is only an optimization, if it cannot be written the table is just rebuilt next time.
+"""
+def _saveTable(path, table):
+    tempPath = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        with open(tempPath, "wb") as f:
+            np.save(f, table)
+        os.replace(tempPath, path)
+    except OSError:
+        if (os.path.exists(tempPath)):
+            os.remove(tempPath)
+
+"""
+ Returns the shared read-only rule tables a CA with the given specs needs, by name:
+   - deterministic CA: "deterministic".
+   - non-deterministic CA: "firstVariant".
+   - 2 variants CA: also "secondVariantSusceptible" and "secondVariantInfected", the masks the per CA
+     2nd variant table is built from (see buildSecondVariantRule()).
+"""
+def sharedRuleTables(rule_bits=9, variants=1, isDeterministic=True):
+    if (rule_bits != 9):
+        errMessage = "Invalid rule_bits: {}. The rule tables are built for 3x3 neighborhoods (9 rule bits).".format(rule_bits)
+        raise Exception(errMessage)
+
+    if (isDeterministic):
+        return {"deterministic": sharedTable("deterministic")}
+    tables = {"firstVariant": sharedTable("firstVariant")}
+    if (variants >= 2):
+        tables["secondVariantSusceptible"] = sharedTable("secondVariantSusceptible")
+        tables["secondVariantInfected"] = sharedTable("secondVariantInfected")
+    return tables
@@ -0,0 +1,173 @@
+"""
+ Binary snapshots of CA boards, and checkpoints of whole CA runs (see CA2dSIRDynamics.checkpoint() and
+ CA2dSIRDynamics.resume()), so a long run on a big board can be resumed after the job got killed.
+ A snapshot file is:
+   - a small fixed header: magic, kind of board (CABoard or CACompactBoard), encoding of the cells
+     (one byte per cell or 3 packed bits per cell, see CACompactBoard.packStates()), rows, cols and the
+     sizes of the other sections.
+   - a JSON metadata section (for a checkpoint: step counter, rule types, RNG state, ...) which also
+     lists the extra arrays stored in the file (e.g. the 2nd variant rule table).
+   - the raw cells of the board and the raw extra arrays, each starting on a 64 byte boundary.
+ A checkpoint that is not of a board (e.g. of the GA, see GeneticAlgorithm2DCA.checkpoint()) has no board,
+ just its metadata and arrays.
+ The loader memory maps the cells and the arrays instead of reading them, so opening a snapshot of a
+ huge board is instant and only the pages that are used get read.
+ Implemented by: Anas Gauba
+"""
+
+import json
+import os
+import struct
+import numpy as np
+from CABoard import *
+from CACompactBoard import CACompactBoard, packStates, unpackStates
+
+# magic, kind, encoding, reserved, rows, cols, cells bytes, metadata bytes.
+_header = struct.Struct("<8sBBHQQQQ")
+_magic = b"CASNAP01"
+_alignment = 64
+# kinds of boards and encodings of the cells.
+_kinds = [CABoard, CACompactBoard]
+_encodings = ["uint8", "packed"]
+
+"""
+ Private helper, the offset of the next section after offset (sections start on an aligned offset).
+"""
+def _aligned(offset):
+    return (offset + _alignment - 1) // _alignment * _alignment
+
+"""
+ Private helpers to put numpy arrays (e.g. in the state of some RNGs) in the JSON metadata and back.
+"""
+def _toJson(value):
+    if (isinstance(value, np.ndarray)):
+        return {"__array__": value.tolist(), "dtype": str(value.dtype)}
+    if (isinstance(value, dict)):
+        return {key: _toJson(item) for key, item in value.items()}
+    if (isinstance(value, (list, tuple))):
+        return [_toJson(item) for item in value]
+    if (isinstance(value, np.generic)):
+        return value.item()
+    return value
+
+def _fromJson(value):
+    if (isinstance(value, dict)):
+        if ("__array__" in value):
+            return np.array(value["__array__"], dtype=value["dtype"])
+        return {key: _fromJson(item) for key, item in value.items()}
+    if (isinstance(value, list)):
+        return [_fromJson(item) for item in value]
+    return value
+
+"""
+ Saves the board (CABoard or CACompactBoard) to path. With packed=True the cells of a CABoard are packed
+ into 3 bits each, a CACompactBoard is always saved as it is stored (so it is never unpacked).
+ meta is a dict of JSON values and arrays a dict of numpy arrays saved along with the board (board=None
+ saves only them).
+ The file is written to a temporary file first and then renamed, so a crash never leaves a half written snapshot.
+"""
+def saveSnapshot(path, board, packed=False, meta=None, arrays=None):
+    if (meta is None):
+        meta = {}
+    if (arrays is None):
+        arrays = {}
+
+    if (board is None):
+        kind = 0
+        encoding = 0
+        rows, cols = 0, 0
+        cells = np.zeros(0, dtype=np.uint8)
+    elif (isinstance(board, CACompactBoard)):
+        kind = 1
+        encoding = 1 if board.bitsPerCell == 3 else 0
+        rows, cols = board.rows, board.cols
+        cells = board.getCells()
+    else:
+        kind = 0
+        encoding = 1 if packed else 0
+        states = board.getStates()
+        rows, cols = states.shape
+        cells = packStates(states) if packed else states
+
+    # the extra arrays come after the cells, the metadata says where.
+    offset = _aligned(_header.size)
+    arrayInfo = []
+    metaBytes = b""
+    # the metadata size moves the offsets, so place the sections until it does not change anymore.
+    while (True):
+        cellsOffset = _aligned(offset + len(metaBytes))
+        arrayOffset = _aligned(cellsOffset + cells.nbytes)
+        arrayInfo = []
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            arrayInfo.append({"name": name, "dtype": str(array.dtype), "shape": list(array.shape), "offset": arrayOffset})
+            arrayOffset = _aligned(arrayOffset + array.nbytes)
+        placedWith = len(metaBytes)
+        metaBytes = json.dumps({"meta": _toJson(meta), "arrays": arrayInfo}).encode()
+        if (len(metaBytes) == placedWith):
+            break
+
+    tempPath = "{}.{}.tmp".format(path, os.getpid())
+    with open(tempPath, "wb") as file:
+        file.write(_header.pack(_magic, kind, encoding, 0, rows, cols, cells.nbytes, len(metaBytes)))
+        file.seek(offset)
+        file.write(metaBytes)
+        file.seek(cellsOffset)
+        file.write(np.ascontiguousarray(cells).tobytes())
+        for info, array in zip(arrayInfo, arrays.values()):
+            file.seek(info["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tempPath, path)
+
+"""
+ Loads a snapshot saved by saveSnapshot(). Returns the board (None if it was saved without one), the
+ metadata dict and the dict of extra arrays.
+ The cells and arrays are memory mapped: read-only for a CABoard and the arrays, copy on write for a
+ CACompactBoard (it is stepped in place, the file is never modified). A CABoard saved packed has to be unpacked.
+"""
+def loadSnapshot(path):
+    with open(path, "rb") as file:
+        magic, kind, encoding, reserved, rows, cols, cellsBytes, metaBytes = _header.unpack(file.read(_header.size))
+        if (magic != _magic):
+            errMessage = "Invalid snapshot file: {}.".format(path)
+            raise Exception(errMessage)
+        offset = _aligned(_header.size)
+        file.seek(offset)
+        contents = json.loads(file.read(metaBytes).decode())
+    cellsOffset = _aligned(offset + metaBytes)
+
+    rowBytes = cellsBytes // rows if rows > 0 else 0
+    if (rows == 0 and cols == 0):
+        board = None
+    elif (_kinds[kind] is CACompactBoard):
+        cells = np.memmap(path, dtype=np.uint8, mode="c", offset=cellsOffset, shape=(rows, rowBytes))
+        board = CACompactBoard(rows=rows, cols=cols, bitsPerCell=3 if _encodings[encoding] == "packed" else 8)
+        board.setCells(cells, rows, cols)
+    else:
+        cells = np.memmap(path, dtype=np.uint8, mode="r", offset=cellsOffset, shape=(rows, rowBytes))
+        if (_encodings[encoding] == "packed"):
+            board = CABoard(unpackStates(cells, cols))
+        else:
+            board = CABoard(np.asarray(cells))
+
+    arrays = {}
+    for info in contents["arrays"]:
+        shape = tuple(info["shape"])
+        # empty arrays can't be memory mapped.
+        if (np.prod(shape) == 0):
+            arrays[info["name"]] = np.zeros(shape, dtype=info["dtype"])
+        else:
+            arrays[info["name"]] = np.asarray(np.memmap(path, dtype=info["dtype"], mode="r", offset=info["offset"], shape=shape))
+    return board, _fromJson(contents["meta"]), arrays
+
+"""
+ Saves just a board, see saveSnapshot().
+"""
+def saveBoard(path, board, packed=False):
+    saveSnapshot(path, board, packed)
+
+"""
+ Loads just a board saved by saveBoard() (or any snapshot), see loadSnapshot().
+"""
+def loadBoard(path):
+    return loadSnapshot(path)[0]
@@ -0,0 +1,169 @@
+"""
+ Per-generation time series of an epidemic run: the S, I, R, I', R' counts of the board after every
+ iteration of a CA (see CA2dSIRDynamics(recorder=...)), to plot the epidemic curves without keeping boards.
+ The rows are appended to a preallocated array. Without a file the array grows when it is full, with a
+ file the full array is spilled (appended) to the file and reused, so a run of any length takes a fixed
+ amount of memory. The file is just a small header and the raw int64 rows, so it can be memory mapped
+ (loadTimeSeries()) or streamed chunk by chunk (streamTimeSeries()) by analysis code. The rows still in
+ memory are written to the file by flush() or close() (or at the end of a with block), and a checkpoint of
+ the CA flushes them and keeps the number of rows, so a resumed run carries on the file from its checkpoint.
+ Optionally the new infections and recoveries of each generation are recorded too. The only transitions
+ are S->I, S->I', I->R and I'->R', so they follow from the change of the counts.
+ Implemented by: Anas Gauba
+"""
+
+import os
+import struct
+import numpy as np
+
+# magic and number of columns.
+_header = struct.Struct("<8sII")
+_magic = b"CASERIES"
+
+"""
+ Memory maps the rows of a time series file written by CATimeSeriesRecorder (read-only).
+"""
+def loadTimeSeries(path):
+    with open(path, "rb") as file:
+        magic, cols, reserved = _header.unpack(file.read(_header.size))
+    if (magic != _magic):
+        errMessage = "Invalid time series file: {}.".format(path)
+        raise Exception(errMessage)
+    rows = (os.path.getsize(path) - _header.size) // (8*cols)
+    if (rows == 0):
+        return np.zeros((0, cols), dtype=np.int64)
+    return np.memmap(path, dtype=np.int64, mode="r", offset=_header.size, shape=(rows, cols))
+
+"""
+ Generator over the rows of a time series file in chunks of (at most) chunkRows rows, only the chunk
+ being looked at is read from the file.
+"""
+def streamTimeSeries(path, chunkRows=4096):
+    series = loadTimeSeries(path)
+    for start in range(0, len(series), chunkRows):
+        yield np.array(series[start:start+chunkRows])
+
+class CATimeSeriesRecorder:
+    # columns of the rows: generation, counts and, with recordTransitions, the new infections and recoveries.
+    _countColumns = ["generation", "S", "I", "R", "i", "r"]
+    _transitionColumns = ["newI", "newi", "newR", "newr"]
+
+    def __init__(self, capacity=1024, path=None, recordTransitions=False, append=False):
+        self.columns = CATimeSeriesRecorder._countColumns[:]
+        if (recordTransitions):
+            self.columns += CATimeSeriesRecorder._transitionColumns
+        self.recordTransitions = recordTransitions
+        self.path = path
+        # private member vars: the preallocated rows, how many of them are used, how many rows were
+        # spilled to the file and the counts of the last row (for the transitions).
+        self.__rows = np.zeros((capacity, len(self.columns)), dtype=np.int64)
+        self.__used = 0
+        self.__spilled = 0
+        self.__lastCounts = None
+        if (path is not None):
+            if (append and os.path.exists(path)):
+                # carry on the file of a resumed run (see CA2dSIRDynamics.resume()).
+                self.__spilled = len(loadTimeSeries(path))
+            else:
+                # append-only file, starts with just its header.
+                with open(path, "wb") as file:
+                    file.write(_header.pack(_magic, len(self.columns), 0))
+
+    """
+     Number of rows recorded so far.
+    """
+    def __len__(self):
+        return self.__spilled + self.__used
+
+    """
+     Appends the row of a generation, counts is a dict keyed by the state chars (see CABoard.counts()).
+    """
+    def record(self, generation, counts):
+        if (self.__used == len(self.__rows)):
+            if (self.path is None):
+                self.__rows = np.concatenate([self.__rows, np.zeros_like(self.__rows)])
+            else:
+                self.flush()
+
+        row = self.__rows[self.__used]
+        row[0] = generation
+        row[1:6] = [counts["S"], counts["I"], counts["R"], counts["i"], counts["r"]]
+        if (self.recordTransitions and self.__lastCounts is not None):
+            # R only comes from I and I only comes from S (same for the 2nd variant).
+            newR = counts["R"] - self.__lastCounts["R"]
+            newr = counts["r"] - self.__lastCounts["r"]
+            row[6:10] = [counts["I"] - self.__lastCounts["I"] + newR, counts["i"] - self.__lastCounts["i"] + newr, newR, newr]
+        self.__lastCounts = counts
+        self.__used += 1
+
+    """
+     Appends the rows in memory to the file (if there is one) and empties the array.
+    """
+    def flush(self):
+        if (self.path is None or self.__used == 0):
+            return
+        with open(self.path, "ab") as file:
+            file.write(self.__rows[:self.__used].tobytes())
+        self.__spilled += self.__used
+        self.__used = 0
+
+    """
+     Flushes the rows in memory to the file, the recorder can still record after it.
+    """
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    """
+     Returns the state of the recorder as a dict of JSON values (to save it in a checkpoint, see
+     CA2dSIRDynamics.checkpoint()): the number of rows and the counts of the last row. The rows in memory
+     are flushed first, so the file has all the rows of the state.
+    """
+    def getState(self):
+        self.flush()
+        return {"rows": len(self), "lastCounts": self.__lastCounts}
+
+    """
+     Sets the recorder back to a state returned by getState(): the rows recorded after it (in the file or
+     in memory) are dropped, so a resumed run neither misses nor repeats generations.
+    """
+    def setState(self, state):
+        rows = state["rows"]
+        self.flush()
+        if (self.path is not None and self.__spilled > rows):
+            with open(self.path, "r+b") as file:
+                file.truncate(_header.size + 8*len(self.columns)*rows)
+            self.__spilled = rows
+        self.__used = min(self.__used, max(rows - self.__spilled, 0))
+        self.__lastCounts = state["lastCounts"]
+
+    """
+     Generator over all the rows recorded so far in chunks of (at most) chunkRows rows: the spilled
+     rows are streamed from the file, then the rows still in memory.
+    """
+    def stream(self, chunkRows=4096):
+        if (self.path is not None and self.__spilled > 0):
+            for chunk in streamTimeSeries(self.path, chunkRows):
+                yield chunk
+        for start in range(0, self.__used, chunkRows):
+            yield self.__rows[start:min(start+chunkRows, self.__used)].copy()
+
+    """
+     All the rows recorded so far as one array (only for series that fit in memory).
+    """
+    def series(self):
+        chunks = list(self.stream())
+        if (len(chunks) == 0):
+            return np.zeros((0, len(self.columns)), dtype=np.int64)
+        return np.concatenate(chunks)
+
+    """
+     One column of series() by name (see columns), e.g. column("I") is the epidemic curve of the 1st variant.
+    """
+    def column(self, name):
+        return self.series()[:, self.columns.index(name)]
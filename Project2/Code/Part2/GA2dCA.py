@@ -11,68 +11,199 @@
 
 from CA2dSIRDynamics import CA2dSIRDynamics
 from CABoard import CABoard
-import random as rand
+from CA2dPopulationEngine import CA2dPopulationEngine
+import GAGenome
+import GASolution
+from BernoulliSampler import BernoulliSampler
+from CARandom import generatorFrom, spawnGenerators, generatorState, generatorFromState
+import CASnapshot
+import os
+from GAFitnessCache import GAFitnessCache
+import multiprocessing as mp
+import argparse
+import numpy as np
+
+# the CA a worker process of the parallel evaluation reuses for every genome it gets (see _evaluateGenome())
+# and the encoding of the genomes.
+_workerCA = None
+_workerEncoding = "full"
+
+"""
+ Private initializer of the worker processes of the parallel evaluation (see GeneticAlgorithm2DCA(workers=...)).
+ Building the CA loads the shared rule tables (see CARuleTables.sharedTable()) once per worker, they never
+ change so they are never sent to the worker again.
+"""
+def _initWorker(caEngine, encoding):
+    global _workerCA, _workerEncoding
+    _workerCA = CA2dSIRDynamics(None, diseaseVariants=2, ruleTypeIsDeterministic=False, engine=caEngine)
+    _workerEncoding = encoding
+
+"""
+ Private helper that runs one CA in a worker process: genome is the member's genome (its 2nd variant table
+ at validCodes(), see GAGenome), the board and the random transitions come from their seeds. Only the
+ fitness and the final S, I, R, I', R' counts go back to the GA.
+"""
+def _evaluateGenome(genome, boardSeed, samplerSeed):
+    _workerCA.nonDeterministicRule2ndVar = GAGenome.tablesFromGenomes(genome, encoding=_workerEncoding)
+    return _runSeeded(_workerCA, boardSeed, samplerSeed)
+
+"""
+ Private helper that runs the CA (with the 2nd variant table it has) on the board of boardSeed with the
+ random transitions of samplerSeed, until no cell is infected. Returns the fitness and the final counts.
+"""
+def _runSeeded(ca, boardSeed, samplerSeed):
+    ca.sampler = BernoulliSampler(samplerSeed)
+    ca.generation = 0
+    ca.currentBoard = CABoard(isBoardRandom=True, rng=boardSeed)
+
+    boardObj = ca.currentBoard
+    while (boardObj.hasInfected()):
+        boardObj = ca.iterateCABoard(snapshot=False)
+    counts = ca.currentBoard.counts()
+    return abs(counts["R"] - counts["r"]), counts
+
+"""
+ Private helper, the mean fitness of each member from the sums of its fitnesses and their squares over
+ its runs, and the half width of its confidence interval (z standard errors, nan with a single run).
+"""
+def _meanAndError(sums, squares, runs, z):
+    means = sums / runs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variances = np.maximum(squares - runs*means**2, 0) / (runs - 1)
+        errors = np.where(runs > 1, z*np.sqrt(variances / runs), np.nan)
+    return means, errors
 
 class GeneticAlgorithm2DCA:
     # 100 populations of CA with initial board config.
     _popSize = 100
+    # how the population is simulated: each CA on its own with the "python" or "numpy" engine
+    # (see CA2dSIRDynamics), or all of them at once with the "batched" engine (see CA2dPopulationEngine).
+    _engines = ["python", "numpy", "batched"]
+    # how the fitness of a member is estimated: from one run ("single") or from replicate runs raced
+    # against each other (see runRacingSimulation()).
+    _evaluations = ["single", "racing"]
+
+    def __init__(self, engine="python", rng=None, workers=None, genome="full", evaluation="single", racingReplicates=(2, 8), confidence=1.96,
+                 cacheSize=0, cacheRuns=8):
+        if (engine not in GeneticAlgorithm2DCA._engines):
+            errMessage = "Invalid engine: {}. Please select one of {}.".format(engine, GeneticAlgorithm2DCA._engines)
+            raise Exception(errMessage)
+        self.engine = engine
+        caEngine = "python" if engine == "python" else "numpy"
+        self.caEngine = caEngine
+        # number of worker processes that run the CA's (see runReplicates()), None runs them in this process.
+        if (workers is not None and engine == "batched"):
+            errMessage = "The batched engine runs the whole population at once, it can't be split between workers."
+            raise Exception(errMessage)
+        self.workers = workers
+        self.__pool = None
+        # how the genomes hold the 2nd variant tables, "full" or "compact" (see GAGenome).
+        if (genome not in GAGenome._encodings):
+            errMessage = "Invalid genome: {}. Please select one of {}.".format(genome, GAGenome._encodings)
+            raise Exception(errMessage)
+        self.genomeEncoding = genome
+        # with racing, every member first gets racingReplicates[0] runs and the contenders for the top 20%
+        # get more, up to racingReplicates[1] runs. confidence is the z of the confidence intervals.
+        if (evaluation not in GeneticAlgorithm2DCA._evaluations):
+            errMessage = "Invalid evaluation: {}. Please select one of {}.".format(evaluation, GeneticAlgorithm2DCA._evaluations)
+            raise Exception(errMessage)
+        if (racingReplicates[0] < 1 or racingReplicates[1] < racingReplicates[0]):
+            errMessage = "Invalid racing replicates: {}. Please give (first runs, max runs) with 1 <= first runs <= max runs.".format(racingReplicates)
+            raise Exception(errMessage)
+        self.evaluation = evaluation
+        self.racingReplicates = racingReplicates
+        self.confidence = confidence
+        # fitness cache of the runs of the genomes (see GAFitnessCache), off by default (cacheSize=0): every
+        # member gets one new run every generation. With the cache and the single evaluation, a genome that
+        # has cacheRuns runs is not run anymore.
+        self.cache = None
+        if (cacheSize > 0):
+            engineVersion = "{}-{}-{}x{}".format(engine, genome, CABoard._board_row, CABoard._board_col)
+            self.cache = GAFitnessCache(engineVersion, cacheSize)
+        self.cacheRuns = cacheRuns
+        # the GA's random stream (a numpy Generator or a seed, see CARandom) for the boards and the parents,
+        # every CA gets its own child stream so the CA's draws don't depend on each other.
+        self.rng = generatorFrom(rng)
 
-    def __init__(self):
         # build initial CA population with random inital boards which 
         # include both disease variants, I and I'.
+        # the CA's only run the genomes, member i of the population is run by popCA[i] (see loadGenomes()).
         self.popCA = []
+        self.generation = 0
+        # the fitness of the population (sorted, lowest first) of every generation run so far.
+        self.fitnessHistory = []
 
         # each CA has random board and both 1st variant and initially 2nd variant to random probability.
+        caStreams = spawnGenerators(self.rng, GeneticAlgorithm2DCA._popSize)
         for i in range(0,GeneticAlgorithm2DCA._popSize):
-            randomBoard = CABoard(isBoardRandom=True)
-            self.popCA.append(CA2dSIRDynamics(randomBoard,diseaseVariants=2,ruleTypeIsDeterministic=False))
+            self.popCA.append(CA2dSIRDynamics(None,diseaseVariants=2,ruleTypeIsDeterministic=False,engine=caEngine,rng=caStreams[i]))
             #print(self.popCA[i].getSecondVariantMap())
-     
-    def buildNextPop(self):
-        # sort CA's in increasing order of fitness.
-        self.popCA = sorted(self.popCA, key=lambda x: x.ruleFor2ndVariant["fitness"])
-        print("Fittest CA with lowest fitness: "+ str(self.popCA[0].ruleFor2ndVariant["fitness"]))
 
-        # this list consists of all 100 CA's and their 2ndVariantProbabilityMaps.
-        # we will pick the top 20 CA's based on the fitness of 2nd variant of the disease.
-        nextPopCA = []
+        # the genomes (2nd variant tables) of the population, one row per member, and the fitness and other
+        # data of each member (see GAGenome).
+        self.genomes = GAGenome.genomesFromTables([ca.nonDeterministicRule2ndVar for ca in self.popCA], self.genomeEncoding)
+        self.population = GAGenome.newPopulation(GeneticAlgorithm2DCA._popSize)
+        for i in range(0,GeneticAlgorithm2DCA._popSize):
+            self.randomBoard(i)
+
+    """
+     Gives a member a new random board. The board is built from a seed drawn from the GA's stream and kept
+     as the member's boardSeed, so a worker process can build the same board from it.
+    """
+    def randomBoard(self, member):
+        ca = self.popCA[member]
+        ca.boardSeed = int(self.rng.integers(0, 2**63))
+        ca.currentBoard = CABoard(isBoardRandom=True, rng=ca.boardSeed)
+        self.population["boardSeed"][member] = ca.boardSeed
+
+    """
+     Writes the genome of every member into the 2nd variant table of the CA running it.
+    """
+    def loadGenomes(self):
+        for member, ca in enumerate(self.popCA):
+            GAGenome.tablesFromGenomes(self.genomes[member], out=ca.nonDeterministicRule2ndVar, encoding=self.genomeEncoding)
+
+    """
+     Builds the next generation: the top 20% members (lowest fitness) are carried over and the other 80%
+     are children of two distinct members of the top 20%, crossed over and mutated. Selection, crossover
+     and mutation are done for all the children at once on the genome array (see GAGenome).
+    """
+    def buildNextPop(self):
+        # sort the members in increasing order of fitness.
+        order = np.argsort(self.population["fitness"], kind="stable")
+        self.genomes = self.genomes[order]
+        self.population = self.population[order]
+        print("Fittest CA with lowest fitness: {:g}".format(self.population["fitness"][0]))
+        self.fitnessHistory.append(self.population["fitness"].copy())
 
-        # pick top 20% CA's who did reasonably well in previous generation than others to this 
-        # nextPopCA list. 
+        # pick top 20% members who did reasonably well in previous generation than others, crossover any
+        # two of them to produce children for the remaining 80%.
         top20Percent = int((20*self._popSize)/100)
-        nextPopCA.extend(self.popCA[:top20Percent])
-
-        # Crossover any two of top 20% CA to produce children for the remaining 80 CA's
-        for i in range(top20Percent,GeneticAlgorithm2DCA._popSize):
-            randomTopCA1 = rand.randint(0,top20Percent-1)
-            topParentCA1 = self.popCA[randomTopCA1]
-            randomTopCA2 = rand.randint(0,top20Percent-1)
-            topParentCA2 = self.popCA[randomTopCA2]
-
-            while (randomTopCA1 == randomTopCA2):
-                randomTopCA2 = rand.randint(0,top20Percent-1)
-                topParentCA2 = self.popCA[randomTopCA2]
-
-            childCA2ndVariantMap = topParentCA1.crossOver(topParentCA2)
-            
-            childCA = self.popCA[i]
-            childCA.ruleFor2ndVariant = childCA2ndVariantMap
-            
-            nextPopCA.append(childCA)
-        
-        self.popCA = nextPopCA
-        
+        childCount = GeneticAlgorithm2DCA._popSize - top20Percent
+        firstParents, secondParents = GAGenome.selectParents(self.rng, top20Percent, childCount)
+        children = GAGenome.crossOver(self.rng, self.genomes, firstParents, secondParents)
+        children = GAGenome.mutate(self.rng, children)
+
+        self.generation += 1
+        childPopulation = GAGenome.newPopulation(childCount, born=self.generation)
+        childPopulation["firstParent"] = firstParents
+        childPopulation["secondParent"] = secondParents
+        self.genomes = np.concatenate([self.genomes[:top20Percent], children])
+        self.population = np.concatenate([self.population[:top20Percent], childPopulation])
+        self.population["firstParent"][:top20Percent] = -1
+        self.population["secondParent"][:top20Percent] = -1
+
         # for the next run, make the board be random for the whole CA population.
         for i in range(0, GeneticAlgorithm2DCA._popSize):
-            self.popCA[i].currentBoard = CABoard(isBoardRandom=True)
+            self.randomBoard(i)
 
     """
      After a run, count up R and r and see if they are equal, then the better fitness. 
      R - r (abs value, if the value is closer to zero, the better fitness)
     """
     def calculateFitness(self, ca):
-        RCount = ca.currentBoard.__str__().count("R")
-        rCount = ca.currentBoard.__str__().count("r")
+        RCount = ca.currentBoard.count("R")
+        rCount = ca.currentBoard.count("r")
         fitness = abs(RCount - rCount)
         print("Fitness: " + str(fitness))
         ca.addFitnessToSecondVariantMap(fitness)    
@@ -83,40 +214,272 @@ class GeneticAlgorithm2DCA:
      no infected cells left both variants I and i. 
     """
     def runSimulation(self):
-        for ca in self.popCA:
-            boardObj = ca.currentBoard
-            while ("I" in boardObj.__str__() or "i" in boardObj.__str__()):
-                boardObj = ca.iterateCABoard()
-                
-            self.calculateFitness(ca)
+        self.loadGenomes()
+        if (self.evaluation == "racing"):
+            self.runRacingSimulation()
+            self.buildNextPop()
+            return
+        if (self.cache is not None):
+            self.runCachedSimulation()
+            self.buildNextPop()
+            return
+
+        self.runSeededSimulation()
 
+        self.population["fitness"] = [ca.secondVariantFitness for ca in self.popCA]
+        self.population["replicates"] = 1
+        self.population["fitnessError"] = np.nan
         self.buildNextPop()
 
+    """
+     Runs the given members once on each of the given board seeds (one per run, with a new seed for the
+     random transitions) with the GA's engine, in this process or on the worker pool. Returns the fitness
+     of each run and its final S, I, R, I', R' counts (dicts keyed by the state chars).
+     Every (board seed, transitions seed) task is drawn here, whoever runs it, so the result only depends on
+     the seeds: the same in this process as with any number of workers.
+     A worker only gets the member's 2nd variant genome and the seeds of its task (the rule tables that
+     never change are loaded once per worker), and only sends back the fitness and the final counts.
+    """
+    def runReplicates(self, members, boardSeeds):
+        if (len(members) == 0):
+            return np.zeros(0, dtype=np.float64), []
+        samplerSeeds = [int(seed) for seed in self.rng.integers(0, 2**63, len(members))]
+        if (self.engine == "batched"):
+            boards = [CABoard(isBoardRandom=True, rng=int(seed)).getStates() for seed in boardSeeds]
+            population = CA2dPopulationEngine(boards, GAGenome.tablesFromGenomes(self.genomes[members], encoding=self.genomeEncoding),
+                                              rng=samplerSeeds[0])
+            population.run()
+            counts = population.counts()
+            return (np.abs(counts[:, 2] - counts[:, 4]).astype(np.float64),
+                    [dict(zip(CABoard._states, memberCounts.tolist())) for memberCounts in counts])
+
+        tasks = list(zip(members, [int(seed) for seed in boardSeeds], samplerSeeds))
+        if (self.workers is not None):
+            if (self.__pool is None):
+                self.__pool = mp.Pool(self.workers, initializer=_initWorker, initargs=(self.caEngine, self.genomeEncoding))
+            # one CA at a time, the runs take very different times.
+            results = self.__pool.starmap(_evaluateGenome, [(self.genomes[member], boardSeed, samplerSeed)
+                                                            for member, boardSeed, samplerSeed in tasks], chunksize=1)
+        else:
+            # each member's own CA already has its table (see loadGenomes()).
+            results = [_runSeeded(self.popCA[member], boardSeed, samplerSeed) for member, boardSeed, samplerSeed in tasks]
+        return (np.array([fitness for fitness, counts in results], dtype=np.float64),
+                [counts for fitness, counts in results])
+
+    """
+     Same run as runSimulation() with the fitness cache (see GAFitnessCache): a member is only run if its
+     genome was not run on its board yet and has less than cacheRuns runs. The fitness of a member is the
+     mean over all the runs of its genome so far, so a member carried over keeps adding to its estimate.
+    """
+    def runCachedSimulation(self):
+        pending = [member for member in range(0,GeneticAlgorithm2DCA._popSize)
+                   if self.cache.stats(self.genomes[member])[2] < self.cacheRuns
+                   and self.cache.lookup(self.genomes[member], self.population["boardSeed"][member]) is None]
+        boardSeeds = self.population["boardSeed"][pending]
+        fitness, counts = self.runReplicates(pending, boardSeeds)
+        for member, boardSeed, memberFitness in zip(pending, boardSeeds, fitness):
+            self.cache.record(self.genomes[member], boardSeed, memberFitness)
+
+        stats = np.array([self.cache.stats(genome) for genome in self.genomes])
+        means, errors = _meanAndError(stats[:, 0], stats[:, 1], stats[:, 2], self.confidence)
+        self.setFitness(means, errors, stats[:, 2])
+        print("Ran {} of {} CA's, {} runs cached.".format(len(pending), GeneticAlgorithm2DCA._popSize, len(self.cache)))
+
+    """
+     Racing evaluation (successive halving) of the population. A single run on one random board is a noisy
+     fitness, so:
+       - every member gets racingReplicates[0] runs on new random boards (the first on its own board).
+       - the members that are clearly not in the top 20% are dropped: their confidence interval of the
+         mean fitness is entirely above the interval of the top 20%'s worst member (their lower bound is
+         above its upper bound). At most the better half of the members (by mean, but no fewer than the
+         top 20%) goes on to the next round.
+       - the members left get runs up to twice as many runs, until they have racingReplicates[1] runs or
+         only the top 20% is left.
+     So most of the runs go to the contenders for the top 20%. With the fitness cache, the runs of a genome
+     in the previous generations count too (a member carried over needs fewer new runs). The fitness of a
+     member is its mean fitness, with its number of runs (replicates) and the half width of its confidence
+     interval (fitnessError).
+    """
+    def runRacingSimulation(self):
+        popSize = GeneticAlgorithm2DCA._popSize
+        top20Percent = int((20*self._popSize)/100)
+        firstRuns, maxRuns = self.racingReplicates
+        sums = np.zeros(popSize)
+        squares = np.zeros(popSize)
+        runs = np.zeros(popSize, dtype=np.int64)
+        if (self.cache is not None):
+            for member in range(0,popSize):
+                sums[member], squares[member], runs[member] = self.cache.stats(self.genomes[member])
+
+        racing = np.arange(popSize)
+        targetRuns = firstRuns
+        while (True):
+            # the number of new runs of each member still racing.
+            newRuns = np.maximum(targetRuns - runs[racing], 0)
+            members = np.repeat(racing, newRuns)
+            boardSeeds = self.rng.integers(0, 2**63, len(members))
+            # the first run of a member is on the board it was given (see randomBoard()).
+            firsts = np.cumsum(newRuns) - newRuns
+            fresh = (runs[racing] == 0) & (newRuns > 0)
+            boardSeeds[firsts[fresh]] = self.population["boardSeed"][racing[fresh]]
+            fitness, finalCounts = self.runReplicates(members, boardSeeds)
+            np.add.at(sums, members, fitness)
+            np.add.at(squares, members, fitness**2)
+            np.add.at(runs, members, 1)
+            if (self.cache is not None):
+                for member, boardSeed, memberFitness in zip(members, boardSeeds, fitness):
+                    self.cache.record(self.genomes[member], boardSeed, memberFitness)
+
+            means, errors = _meanAndError(sums[racing], squares[racing], runs[racing], self.confidence)
+            # nothing is known of the spread of a single run.
+            errors[np.isnan(errors)] = np.inf
+            if (targetRuns >= maxRuns or len(racing) <= top20Percent):
+                break
+            # the worst upper bound among the best top 20% means, members whose lower bound is above it are out.
+            order = np.argsort(means, kind="stable")
+            threshold = np.max((means + errors)[order[:top20Percent]])
+            contenders = order[(means - errors)[order] <= threshold]
+            racing = racing[contenders[:max(top20Percent, (len(racing)+1)//2)]]
+            targetRuns = min(2*targetRuns, maxRuns)
+
+        means, errors = _meanAndError(sums, squares, runs, self.confidence)
+        self.setFitness(means, errors, runs)
+
+    """
+     Sets the fitness of every member from the mean fitness over its runs, the half width of its confidence
+     interval and its number of runs.
+    """
+    def setFitness(self, means, errors, runs):
+        self.population["fitness"] = means
+        self.population["fitnessError"] = errors
+        self.population["replicates"] = runs
+        for member, ca in enumerate(self.popCA):
+            print("Fitness: {:g} +- {:g} ({} runs)".format(means[member], errors[member], runs[member]))
+            ca.addFitnessToSecondVariantMap(means[member])
+
+    """
+     Same run as runSimulation() does for each CA, on its board (from its boardSeed) with a seed for its
+     random transitions, in this process, on the worker pool or all at once with the batched engine (see
+     runReplicates()), so the result only depends on the seeds, not on the number of workers. The final
+     counts are kept as the CA's finalCounts.
+    """
+    def runSeededSimulation(self):
+        fitness, counts = self.runReplicates(np.arange(GeneticAlgorithm2DCA._popSize), self.population["boardSeed"])
+        for ca, memberFitness, memberCounts in zip(self.popCA, fitness, counts):
+            print("Fitness: " + str(int(memberFitness)))
+            ca.finalCounts = memberCounts
+            ca.addFitnessToSecondVariantMap(int(memberFitness))
+
+    """
+     Stops the worker processes of the parallel evaluation (if any were started).
+    """
+    def close(self):
+        if (self.__pool is not None):
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+    """
+     Saves the GA to path (see CASnapshot), between two generations: the genomes and the population array,
+     the fitness history, the generation, the fitness cache and the state of the GA's stream and of each
+     CA's streams, everything resume() needs to carry on as if the GA was never stopped.
+     The file is written to a temporary file and renamed, so a job killed while saving keeps the previous checkpoint.
+    """
+    def checkpoint(self, path):
+        meta = {"generation": self.generation, "popSize": GeneticAlgorithm2DCA._popSize, "genome": self.genomeEncoding,
+                "rng": generatorState(self.rng), "caRngs": [generatorState(ca.rng) for ca in self.popCA],
+                "samplers": [ca.sampler.getState()[0] for ca in self.popCA]}
+        arrays = {"genomes": self.genomes,
+                  "fitnessHistory": np.array(self.fitnessHistory, dtype=np.float64).reshape(-1, GeneticAlgorithm2DCA._popSize)}
+        for field in GAGenome.populationDtype.names:
+            arrays["population." + field] = self.population[field]
+        for member, ca in enumerate(self.popCA):
+            arrays["samplerBlock." + str(member)] = ca.sampler.getState()[1]
+        if (self.cache is not None):
+            for name, array in self.cache.getState().items():
+                arrays["cache." + name] = array
+        CASnapshot.saveSnapshot(path, None, meta=meta, arrays=arrays)
+
+    """
+     Carries on the GA saved by checkpoint() at path, from the generation after the last one it ran. The GA
+     has to have the same population size and genome encoding as the saved one.
+    """
+    def resume(self, path):
+        board, meta, arrays = CASnapshot.loadSnapshot(path)
+        if (meta["popSize"] != GeneticAlgorithm2DCA._popSize or meta["genome"] != self.genomeEncoding):
+            errMessage = "Checkpoint {} was saved by a GA with another population (popSize={}, genome={}).".format(
+                path, meta["popSize"], meta["genome"])
+            raise Exception(errMessage)
+
+        self.generation = meta["generation"]
+        self.rng = generatorFromState(meta["rng"])
+        self.genomes = np.array(arrays["genomes"])
+        self.population = GAGenome.newPopulation(GeneticAlgorithm2DCA._popSize)
+        for field in GAGenome.populationDtype.names:
+            self.population[field] = arrays["population." + field]
+        self.fitnessHistory = list(np.array(arrays["fitnessHistory"]))
+        for member, ca in enumerate(self.popCA):
+            ca.rng = generatorFromState(meta["caRngs"][member])
+            ca.sampler.setState(meta["samplers"][member], arrays["samplerBlock." + str(member)])
+            ca.boardSeed = int(self.population["boardSeed"][member])
+            ca.currentBoard = CABoard(isBoardRandom=True, rng=ca.boardSeed)
+        if (self.cache is not None and "cache.runKeys" in arrays):
+            self.cache.setState({name[len("cache."):]: array for name, array in arrays.items() if name.startswith("cache.")})
+
     """
      This runs generations of CA's until the best fitness is found for the probability
      map of 2nd disease. Sometimes, there can be false fitness of 0 in the initial run, so
      I am making sure that the GA atleast runs for 10 generations to eliminate any false 
-     positives.
+     positives. With the fitness cache (cacheSize > 0) the fittest member's fitness is the mean over the
+     runs of its genome (see runCachedSimulation()).
+     With a checkpointPath, the GA is checkpointed there every checkpointEvery generations (see checkpoint()),
+     so a killed run can be resumed with resume() and continued by calling this again.
     """
-    def runUntilBestSolution(self):
-        i = 0
+    def runUntilBestSolution(self, checkpointPath=None, checkpointEvery=10):
         while(True):
+            # generations run before this one.
+            i = self.generation
             self.runSimulation()
+            if (checkpointPath is not None and self.generation % checkpointEvery == 0):
+                self.checkpoint(checkpointPath)
 
-            if (self.popCA[0].ruleFor2ndVariant["fitness"] <= 5 and i >= 10):
-                f = open("secondVariantRuleGA.py", "w")
-                f.write("ruleFor2ndVariant = ")
-                f.write(str(self.popCA[0].ruleFor2ndVariant))
-                f.close()
+            # the members are sorted by fitness, the first one is the fittest.
+            if (self.population["fitness"][0] <= 5 and i >= 10):
+                # write the rules, along with its fitness and how they were found (see GASolution).
+                meta = {"generation": i, "genome": self.genomeEncoding, "engine": self.engine, "evaluation": self.evaluation,
+                        "replicates": int(self.population["replicates"][0]), "board": [CABoard._board_row, CABoard._board_col]}
+                GASolution.saveSolution(GAGenome.tablesFromGenomes(self.genomes[0], encoding=self.genomeEncoding),
+                                        float(self.population["fitness"][0]), meta=meta)
 
                 break
-            
-            i += 1
 
 
 def main():
-    GA = GeneticAlgorithm2DCA()
-    GA.runUntilBestSolution()
+    parser = argparse.ArgumentParser(description="Evolves the 2nd variant rules of the CA.")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes running the CA's (e.g. the ppn of the PBS job)")
+    parser.add_argument("--genome", default="full", choices=GAGenome._encodings, help="encoding of the 2nd variant genomes (see GAGenome)")
+    parser.add_argument("--evaluation", default="single", choices=GeneticAlgorithm2DCA._evaluations,
+                        help="fitness from one run per CA, or from replicate runs raced against each other")
+    parser.add_argument("--replicates", type=int, nargs=2, default=(2, 8), metavar=("FIRST", "MAX"),
+                        help="runs every CA gets first and the most runs a CA gets with the racing evaluation")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="most runs kept in the fitness cache (see GAFitnessCache), 0 (the default) runs every CA every "
+                             "generation and ranks it by its last run. With the cache the CA's are ranked (and the GA stops) by "
+                             "the mean fitness over the runs of their genome, a genome with 8 runs is not run anymore")
+    parser.add_argument("--checkpoint", default="GA.ckpt", help="file the GA is checkpointed to")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="generations between two checkpoints")
+    parser.add_argument("--resume", action="store_true", help="carry on the run checkpointed in the checkpoint file (if there is one)")
+    args = parser.parse_args()
+
+    GA = GeneticAlgorithm2DCA(workers=args.workers, genome=args.genome, evaluation=args.evaluation, racingReplicates=tuple(args.replicates),
+                              cacheSize=args.cache_size)
+    if (args.resume and os.path.exists(args.checkpoint)):
+        GA.resume(args.checkpoint)
+        print("Resumed from generation {} of {}.".format(GA.generation, args.checkpoint))
+    try:
+        GA.runUntilBestSolution(args.checkpoint, args.checkpoint_every)
+    finally:
+        GA.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
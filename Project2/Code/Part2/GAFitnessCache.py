@@ -0,0 +1,117 @@
+"""
+ Fitness cache of the GA (see GA2dCA). The top 20% members are carried over to the next generation
+ unchanged and children can have the same genome as another member, so the same genomes get run again and
+ again. The cache keeps, by a hash of the genome and the engine version (the engine, board size and
+ version of the simulation, anything that changes what a run gives):
+   - the fitness of each run, keyed by the board seed too: running a genome again on the same board gives
+     the cached fitness right away.
+   - the sum of the fitnesses of all the runs of the genome, their squares and the number of runs: every new
+     run of the genome adds to its estimate (the mean fitness and its confidence interval) instead of
+     replacing it, and a genome with enough runs is not run anymore.
+ Both are bounded, the least recently used entries are dropped first.
+ Implemented by: Anas Gauba
+"""
+
+from collections import OrderedDict
+import hashlib
+import numpy as np
+
+class GAFitnessCache:
+    # version of the simulation, part of every key. Bump it when a change of the CA's gives other fitnesses
+    # for the same genome and board.
+    version = 1
+
+    def __init__(self, engineVersion, maxEntries=10000):
+        self.engineVersion = "{}/v{}".format(engineVersion, GAFitnessCache.version)
+        self.maxEntries = maxEntries
+        # private member vars: fitness of each (genome, board seed) run and [sum, sum of squares, runs] of
+        # each genome, in least recently used order.
+        self.__runs = OrderedDict()
+        self.__genomes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    """
+     Hash of a genome (its genes and their dtype) with the engine version.
+    """
+    def genomeKey(self, genome):
+        genome = np.ascontiguousarray(genome)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.engineVersion.encode())
+        digest.update(genome.dtype.str.encode())
+        digest.update(genome.tobytes())
+        return digest.hexdigest()
+
+    """
+     Private helper, marks the entry of key as the most recently used and drops the least recently used
+     entries over maxEntries.
+    """
+    def __touch(self, entries, key):
+        entries.move_to_end(key)
+        while (len(entries) > self.maxEntries):
+            entries.popitem(last=False)
+
+    """
+     Returns the cached fitness of the run of genome on the board of boardSeed, None if it is not cached.
+    """
+    def lookup(self, genome, boardSeed):
+        key = (self.genomeKey(genome), int(boardSeed))
+        if (key not in self.__runs):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__touch(self.__runs, key)
+        return self.__runs[key]
+
+    """
+     Adds the fitness of a run of genome on the board of boardSeed, to the runs and to the genome's estimate.
+     A run that is already cached is not counted twice.
+    """
+    def record(self, genome, boardSeed, fitness):
+        genomeKey = self.genomeKey(genome)
+        key = (genomeKey, int(boardSeed))
+        if (key in self.__runs):
+            self.__touch(self.__runs, key)
+            return
+        self.__runs[key] = fitness
+        self.__touch(self.__runs, key)
+
+        stats = self.__genomes.setdefault(genomeKey, [0.0, 0.0, 0])
+        stats[0] += fitness
+        stats[1] += fitness**2
+        stats[2] += 1
+        self.__touch(self.__genomes, genomeKey)
+
+    """
+     Returns the sum of the fitnesses of the runs of genome, the sum of their squares and the number of runs
+     (all 0 if it was never run, or was dropped).
+    """
+    def stats(self, genome):
+        genomeKey = self.genomeKey(genome)
+        if (genomeKey not in self.__genomes):
+            return 0.0, 0.0, 0
+        self.__touch(self.__genomes, genomeKey)
+        return tuple(self.__genomes[genomeKey])
+
+    """
+     Returns the content of the cache as a dict of numpy arrays, in least recently used order (to save it
+     in a checkpoint, see GeneticAlgorithm2DCA.checkpoint()).
+    """
+    def getState(self):
+        return {"runKeys": np.array([key[0] for key in self.__runs], dtype="U32"),
+                "runSeeds": np.array([key[1] for key in self.__runs], dtype=np.int64),
+                "runFitness": np.array(list(self.__runs.values()), dtype=np.float64),
+                "genomeKeys": np.array(list(self.__genomes), dtype="U32"),
+                "genomeStats": np.array(list(self.__genomes.values()), dtype=np.float64).reshape(-1, 3)}
+
+    """
+     Sets the content of the cache to a content returned by getState().
+    """
+    def setState(self, arrays):
+        self.__runs = OrderedDict(((str(key), int(seed)), float(fitness)) for key, seed, fitness
+                                  in zip(arrays["runKeys"], arrays["runSeeds"], arrays["runFitness"]))
+        self.__genomes = OrderedDict((str(key), [float(stats[0]), float(stats[1]), int(stats[2])])
+                                     for key, stats in zip(arrays["genomeKeys"], arrays["genomeStats"]))
+
+    def __len__(self):
+        return len(self.__runs)
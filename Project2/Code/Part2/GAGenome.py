@@ -0,0 +1,127 @@
+"""
+ Array form of the GA's population (see GA2dCA). The genome of a member is a fixed order float array that
+ holds its 2nd variant rule table, with one of the encodings:
+   - "full": the table at CARuleTables.validCodes() (the only entries that are not zero), 22923 genes.
+   - "compact": one probability per equivalence class of neighborhoods (center, number of i neighbors,
+     number of in bound neighbors, see CARuleTables.secondVariantClassKeys()), 35 genes. All the
+     neighborhoods of a class get the same probability, whatever the place of their i neighbors.
+ So the whole population is one (pop, genomeSize) array and selection, crossover and mutation are numpy
+ operations on all the children at once. The fitness and the other data of each member are kept apart from the genomes,
+ in a structured array (populationDtype), one row per member:
+   - fitness: abs(R - R') of its last run (nan until it is run). With the racing evaluation it is the mean
+     over its racing runs (see GeneticAlgorithm2DCA.runRacingSimulation()), and with the fitness cache
+     (cacheSize > 0, see GAFitnessCache) the mean over all the runs of its genome so far (up to cacheRuns
+     runs, then the genome is not run anymore).
+   - replicates, fitnessError: the number of runs of the fitness and the half width of its confidence
+     interval (nan with a single run).
+   - boardSeed: seed of the random board of its next run.
+   - firstParent, secondParent: the members of the previous generation it was crossed over from
+     (-1 for the initial members and the members carried over).
+   - born: the GA generation it was created in.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+from CARuleTables import validCodes, tableSize, sharedTable, secondVariantClassKeys
+
+_encodings = ["full", "compact"]
+
+populationDtype = np.dtype([("fitness", np.float64), ("replicates", np.int32), ("fitnessError", np.float64),
+                            ("boardSeed", np.int64), ("firstParent", np.int32), ("secondParent", np.int32),
+                            ("born", np.int32)])
+
+"""
+ Private helper that checks the encoding.
+"""
+def _checkEncoding(encoding):
+    if (encoding not in _encodings):
+        errMessage = "Invalid genome encoding: {}. Please select one of {}.".format(encoding, _encodings)
+        raise Exception(errMessage)
+
+"""
+ Number of genes of a genome with the given encoding.
+"""
+def genomeSize(encoding="full"):
+    _checkEncoding(encoding)
+    return len(validCodes()) if encoding == "full" else len(secondVariantClassKeys())
+
+"""
+ Returns the genomes of the given 2nd variant rule tables (one table, or one per row). A compact gene is
+ the mean probability of its class (the tables the CA's start with have the same probability in a class).
+"""
+def genomesFromTables(tables, encoding="full"):
+    _checkEncoding(encoding)
+    tables = np.asarray(tables)
+    if (encoding == "full"):
+        return tables[..., validCodes()]
+
+    classes = sharedTable("secondVariantClasses")
+    codes = np.nonzero(classes >= 0)[0]
+    classSizes = np.bincount(classes[codes])
+    flat = tables.reshape(-1, tableSize)[:, codes]
+    genomes = np.stack([np.bincount(classes[codes], weights=row, minlength=len(classSizes)) for row in flat]) / classSizes
+    return genomes.astype(tables.dtype).reshape(tables.shape[:-1] + (len(classSizes),))
+
+"""
+ Returns the 2nd variant rule tables of the given genomes (one genome, or one per row), or writes them
+ into out. The tables are zero except at validCodes(), so only the codes a gene sets are written (a
+ compact gene is expanded to every code of its class with one lookup).
+"""
+def tablesFromGenomes(genomes, out=None, encoding="full"):
+    _checkEncoding(encoding)
+    genomes = np.asarray(genomes)
+    if (out is None):
+        out = np.zeros(genomes.shape[:-1] + (tableSize,), dtype=genomes.dtype)
+    if (encoding == "full"):
+        out[..., validCodes()] = genomes
+    else:
+        classes = sharedTable("secondVariantClasses")
+        codes = np.nonzero(classes >= 0)[0]
+        out[..., codes] = genomes[..., classes[codes]]
+    return out
+
+"""
+ Returns a population array of count members that were not run yet.
+"""
+def newPopulation(count, born=0):
+    population = np.zeros(count, dtype=populationDtype)
+    population["fitness"] = np.nan
+    population["fitnessError"] = np.nan
+    population["firstParent"] = -1
+    population["secondParent"] = -1
+    population["born"] = born
+    return population
+
+"""
+ Picks the two distinct parents of count children among the first parents members (the fittest ones,
+ see GeneticAlgorithm2DCA.buildNextPop()). Returns the two arrays of parent indices.
+"""
+def selectParents(rng, parents, count):
+    firstParents = rng.integers(0, parents, count)
+    # the second parent is drawn among the other parents: skip over the first one.
+    secondParents = rng.integers(0, parents-1, count)
+    secondParents += secondParents >= firstParents
+    return firstParents, secondParents
+
+"""
+ One point crossover of every child: the genes before its cutover come from its first parent and the
+ genes from the cutover on from its second parent (same as CA2dSIRDynamics.crossOver()).
+"""
+def crossOver(rng, genomes, firstParents, secondParents):
+    cutovers = rng.integers(0, genomes.shape[1], len(firstParents))
+    fromSecond = np.arange(genomes.shape[1])[None, :] >= cutovers[:, None]
+    return np.where(fromSecond, genomes[secondParents], genomes[firstParents])
+
+"""
+ Mutates every child (in place): adds amount to one of its non-zero genes picked at random (same as
+ CA2dSIRDynamics.mutate()). Returns the children.
+"""
+def mutate(rng, children, amount=0.02):
+    nonZero = children != 0
+    nonZeroCounts = nonZero.sum(axis=1)
+    mutable = np.nonzero(nonZeroCounts > 0)[0]
+    # the k-th non-zero gene of each child, k drawn between 0 and its number of non-zero genes.
+    picks = rng.integers(0, nonZeroCounts[mutable])
+    genes = np.argmax(np.cumsum(nonZero[mutable], axis=1) > picks[:, None], axis=1)
+    children[mutable, genes] += amount
+    return children
@@ -0,0 +1,78 @@
+"""
+ The GA's solution (see GeneticAlgorithm2DCA.runUntilBestSolution()): the evolved 2nd variant rule table,
+ saved as a numpy .npz file with:
+   - codes, probabilities: the neighborhood codes the table can have a non-zero probability at
+     (CARuleTables.validCodes()) and the table at those codes.
+   - meta: a JSON string with the version of the format, the fitness and how the GA found it.
+ Loading it is just reading two arrays, no python source with a 22923 entries dict literal to parse and
+ compile like the older secondVariantRuleGA.py (which is still loaded if there is no .npz solution).
+ The solution is only loaded when it is asked for (e.g. option 4 of the gui), and only once.
+ Implemented by: Anas Gauba
+"""
+
+import json
+import os
+import numpy as np
+from CARuleTables import validCodes, tableSize
+
+# version of the file format, bump it whenever the arrays or their meaning change.
+formatVersion = 1
+# where the GA writes its solution and the gui reads it.
+solutionPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "secondVariantRuleGA.npz")
+# the older python source solution.
+legacyPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "secondVariantRuleGA.py")
+
+# solutions loaded so far, by path.
+_loaded = {}
+
+"""
+ Saves the 2nd variant rule table with its fitness to path. meta is a dict of JSON values saved along with
+ it (e.g. the generation and the GA's settings). The file is written to a temporary file first and then
+ renamed, so a crash never leaves a half written solution.
+"""
+def saveSolution(table, fitness, path=solutionPath, meta=None):
+    meta = dict(meta or {})
+    meta["format"] = formatVersion
+    meta["fitness"] = fitness
+    codes = validCodes()
+    tempPath = "{}.{}.tmp".format(path, os.getpid())
+    with open(tempPath, "wb") as file:
+        np.savez(file, codes=codes.astype(np.int32), probabilities=np.asarray(table)[codes].astype(np.float32),
+                 meta=np.array(json.dumps(meta)))
+    os.replace(tempPath, path)
+    _loaded.pop(path, None)
+
+"""
+ Loads the solution at path. Returns the 2nd variant rule table (numpy float32 array, see CARuleTables) and
+ the metadata dict. Without a .npz solution at the default path, the older secondVariantRuleGA.py is loaded.
+"""
+def loadSolution(path=solutionPath):
+    if (path in _loaded):
+        table, meta = _loaded[path]
+        return table.copy(), dict(meta)
+
+    if (path == solutionPath and not os.path.exists(path) and os.path.exists(legacyPath)):
+        table, meta = _loadLegacy()
+    elif (not os.path.exists(path)):
+        errMessage = "No GA solution at {}. Please run GA2dCA.py first.".format(path)
+        raise Exception(errMessage)
+    else:
+        with np.load(path) as solution:
+            meta = json.loads(str(solution["meta"]))
+            if (meta.get("format") != formatVersion):
+                errMessage = "GA solution {} has format {}, expected format {}.".format(path, meta.get("format"), formatVersion)
+                raise Exception(errMessage)
+            table = np.zeros(tableSize, dtype=np.float32)
+            table[solution["codes"]] = solution["probabilities"]
+
+    _loaded[path] = (table, meta)
+    return table.copy(), dict(meta)
+
+"""
+ Private helper that loads the older python source solution (imported here so it is only parsed when needed).
+"""
+def _loadLegacy():
+    from CARuleTables import ruleTableFromDict
+    import secondVariantRuleGA
+    ruleMap = secondVariantRuleGA.ruleFor2ndVariant
+    return ruleTableFromDict(ruleMap, variant=2), {"format": 0, "fitness": ruleMap.get("fitness")}
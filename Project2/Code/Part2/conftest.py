@@ -0,0 +1,59 @@
+"""
+ Shared fixtures and helpers of the tests of Part2 (test_*.py). Run the tests with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CABoard import CABoard
+from CACompactBoard import CACompactBoard
+from CA2dSIRDynamics import CA2dSIRDynamics
+
+# size of the boards of the tests (the python engine runs boards of CABoard's size).
+boardRows = 24
+boardCols = 24
+# (variants, deterministic) of the three rule modes.
+ruleModes = [(1, True), (1, False), (2, False)]
+
+"""
+ Every test runs with small boards. The fixture is a function that changes the size for the rest of the
+ test, for a test that needs boards of another shape: smallBoards(rows, cols).
+"""
+@pytest.fixture(autouse=True)
+def smallBoards(monkeypatch):
+    def resize(rows, cols):
+        monkeypatch.setattr(CABoard, "_board_row", rows)
+        monkeypatch.setattr(CABoard, "_board_col", cols)
+    resize(boardRows, boardCols)
+    return resize
+
+"""
+ Helper, a board of the given shape with infected cells of each variant (infected I cells, and as many
+ I' cells with 2 variants) at random places from seed (numpy array of state codes).
+"""
+def seededStates(seed, variants, shape=(boardRows, boardCols), infected=4):
+    rng = np.random.default_rng(seed)
+    states = np.zeros(shape, dtype=np.uint8)
+    cells = rng.choice(states.size, 2*infected, replace=False)
+    states.ravel()[cells[:infected]] = 1
+    if (variants == 2):
+        states.ravel()[cells[infected:]] = 3
+    return states
+
+"""
+ Helper, a CA of the rule mode on a seededStates() board (a CACompactBoard with compact=True), everything
+ random comes from seed. The other keyword args go to CA2dSIRDynamics (e.g. sampler, boundary or rng).
+"""
+def seededCA(variants, isDeterministic, engine, seed, infected=4, compact=False, **caArgs):
+    states = seededStates(seed, variants, infected=infected)
+    board = CACompactBoard(states) if compact else CABoard(states)
+    caArgs.setdefault("rng", seed)
+    return CA2dSIRDynamics(board, diseaseVariants=variants, ruleTypeIsDeterministic=isDeterministic, engine=engine, **caArgs)
+
+"""
+ Helper, runs a CA until the given generation. Returns the board's states.
+"""
+def runUntil(ca, generation):
+    while (ca.generation < generation):
+        ca.iterateCABoard(snapshot=False)
+    return ca.currentBoard.getStates()
@@ -0,0 +1,68 @@
+"""
+ Tests that stepping a board in bands (see CA2dParallelStepper) with a counter based sampler (see
+ CARandom.CounterSampler) gives bit-identical boards to stepping it in one piece with the numpy engine,
+ whatever the number of bands, in this process or with worker processes, for all three rule modes and
+ both boundaries, that it leaves the global np.random stream alone and that a dead worker makes it raise
+ instead of hanging. Run with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CABoard import CABoard
+from CARandom import CounterSampler
+from CA2dSIRDynamics import CA2dSIRDynamics
+from CA2dParallelStepper import CA2dParallelStepper
+from conftest import ruleModes, seededStates
+
+_generations = 12
+
+"""
+ Helper, a CA of the rule mode with a counter based sampler, on a board with rows that don't split evenly
+ into bands and infected cells on the edges (to see the boundary).
+"""
+def counterCA(variants, isDeterministic, boundary):
+    states = seededStates(11, variants, shape=(23, 19), infected=6)
+    states[0, 0] = 1
+    states[-1, 9] = 1
+    return CA2dSIRDynamics(CABoard(states), diseaseVariants=variants, ruleTypeIsDeterministic=isDeterministic,
+                           engine="numpy", sampler=CounterSampler(42), boundary=boundary, rng=5)
+
+@pytest.mark.parametrize("variants, isDeterministic", ruleModes)
+@pytest.mark.parametrize("boundary", ["fixed", "periodic"])
+@pytest.mark.parametrize("processes", [False, True])
+def test_bandsMatchTheNumpyEngine(variants, isDeterministic, boundary, processes):
+    reference = counterCA(variants, isDeterministic, boundary)
+    for generation in range(0,_generations):
+        reference.iterateCABoard(snapshot=False)
+    expected = reference.currentBoard.getStates()
+
+    for bands in [1, 3, 4, 7]:
+        ca = counterCA(variants, isDeterministic, boundary)
+        # the 2nd variant rules have to be the same as the reference's.
+        ca.nonDeterministicRule2ndVar = reference.nonDeterministicRule2ndVar
+        stepper = CA2dParallelStepper(ca, bands=bands, processes=processes)
+        try:
+            stepper.run(_generations)
+        finally:
+            stepper.close()
+        assert np.array_equal(ca.currentBoard.getStates(), expected), bands
+        assert ca.generation == _generations
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_globalStreamIsUntouched(processes):
+    ca = counterCA(2, False, "fixed")
+    before = np.random.get_state()[1].copy()
+    with CA2dParallelStepper(ca, bands=3, processes=processes) as stepper:
+        stepper.run(2)
+    assert np.array_equal(np.random.get_state()[1], before)
+
+def test_deadWorkerRaises():
+    ca = counterCA(1, False, "fixed")
+    with CA2dParallelStepper(ca, bands=3) as stepper:
+        stepper.run(1)
+        worker = stepper.workers[1][0]
+        worker.kill()
+        worker.join()
+        with pytest.raises(Exception, match="failed"):
+            stepper.run(3)
@@ -0,0 +1,37 @@
+"""
+ Tests that the timeline engine (see CA2dTimelineEngine) gives the same boards as the python engine with the
+ deterministic rules, on boards where few or no cells ever change: no infected cell, an infected cell walled
+ in by R cells, and boards too small for a whole neighborhood. Run with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CABoard import CABoard
+from CA2dSIRDynamics import CA2dSIRDynamics
+
+"""
+ Helper, the degenerate boards (numpy arrays of state codes) by name.
+"""
+def degenerateBoards():
+    walledIn = np.full((5, 5), 2, dtype=np.uint8)
+    walledIn[0, :] = walledIn[-1, :] = walledIn[:, 0] = walledIn[:, -1] = 0
+    walledIn[2, 2] = 1
+    line = np.zeros((1, 7), dtype=np.uint8)
+    line[0, 2] = 1
+    column = np.zeros((4, 1), dtype=np.uint8)
+    column[1, 0] = 1
+    column[3, 0] = 2
+    return {"allS": np.zeros((5, 5), dtype=np.uint8), "walledIn": walledIn, "1x7": line,
+            "2x2": np.array([[1, 0], [0, 2]], dtype=np.uint8), "4x1": column, "1x1": np.ones((1, 1), dtype=np.uint8)}
+
+@pytest.mark.parametrize("name", sorted(degenerateBoards()))
+@pytest.mark.parametrize("boundary", ["fixed", "periodic"])
+def test_timelineMatchesPythonEngine(smallBoards, name, boundary):
+    states = degenerateBoards()[name]
+    smallBoards(*states.shape)
+    python = CA2dSIRDynamics(CABoard(states.copy()), engine="python", boundary=boundary)
+    timeline = CA2dSIRDynamics(CABoard(states.copy()), engine="timeline", boundary=boundary)
+    for generation in range(0,8):
+        assert np.array_equal(timeline.iterateCABoard(snapshot=False).getStates(),
+                              python.iterateCABoard(snapshot=False).getStates()), generation
@@ -0,0 +1,44 @@
+"""
+ Tests that a CA run checkpointed at some generation (see CA2dSIRDynamics.checkpoint()) and resumed into a
+ freshly built CA with another seed (see CA2dSIRDynamics.resume()) ends up with the same board as the run
+ that was never stopped (the resumed CA gets another seed, so it only ends up on the same board if
+ resume() gave it everything back), with both engines, all three rule modes and packed or not packed cells.
+ Run with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CACompactBoard import CACompactBoard
+from conftest import ruleModes, seededCA, runUntil
+
+_checkpointAt = 7
+_generations = 15
+
+@pytest.mark.parametrize("variants, isDeterministic", ruleModes)
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("packed", [False, True])
+def test_resumedRunMatchesUninterruptedRun(tmp_path, variants, isDeterministic, engine, packed):
+    expected = runUntil(seededCA(variants, isDeterministic, engine, 3, infected=5), _generations)
+
+    stopped = seededCA(variants, isDeterministic, engine, 3, infected=5)
+    runUntil(stopped, _checkpointAt)
+    stopped.checkpoint(str(tmp_path / "run.ckpt"), packed=packed)
+
+    resumed = seededCA(variants, isDeterministic, engine, 99, infected=5)
+    resumed.resume(str(tmp_path / "run.ckpt"))
+    assert resumed.generation == _checkpointAt
+    assert np.array_equal(runUntil(resumed, _generations), expected)
+
+@pytest.mark.parametrize("variants, isDeterministic", ruleModes)
+def test_resumedCompactRunMatchesUninterruptedRun(tmp_path, variants, isDeterministic):
+    expected = runUntil(seededCA(variants, isDeterministic, "numpy", 3, infected=5, compact=True), _generations)
+
+    stopped = seededCA(variants, isDeterministic, "numpy", 3, infected=5, compact=True)
+    runUntil(stopped, _checkpointAt)
+    stopped.checkpoint(str(tmp_path / "run.ckpt"))
+
+    resumed = seededCA(variants, isDeterministic, "numpy", 99, infected=5, compact=True)
+    resumed.resume(str(tmp_path / "run.ckpt"))
+    assert isinstance(resumed.currentBoard, CACompactBoard)
+    assert np.array_equal(runUntil(resumed, _generations), expected)
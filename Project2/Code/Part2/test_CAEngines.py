@@ -0,0 +1,73 @@
+"""
+ Tests that the numpy engine runs the same CA as the python engine (see CA2dSIRDynamics(engine=...)): the
+ same boards with the deterministic rules, the same mean S, I, R, I', R' counts with the non-deterministic
+ rules (both 1 and 2 variants), the random transitions of the two engines come from different streams.
+ The engines of the deterministic rules only (hashlife, bitboard and timeline) give the same boards as the
+ python engine too, also on boards one cell wide.
+ Run with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CABoard import CABoard
+from CA2dSIRDynamics import CA2dSIRDynamics
+from conftest import seededCA, runUntil, ruleModes
+
+"""
+ Helper, the counts after generations generations of every run with the given engine, one row per run.
+"""
+def finalCounts(engine, variants, isDeterministic, runs, generations):
+    counts = []
+    for run in range(0,runs):
+        ca = seededCA(variants, isDeterministic, engine, run, rng=[run, len(engine)])
+        runUntil(ca, generations)
+        counts.append(list(ca.currentBoard.counts().values()))
+    return np.array(counts, dtype=np.float64)
+
+def test_deterministicBoardsAreTheSame():
+    for seed in range(0,3):
+        python = seededCA(1, True, "python", seed)
+        vectorized = seededCA(1, True, "numpy", seed)
+        for generation in range(0,30):
+            assert np.array_equal(python.iterateCABoard(snapshot=False).getStates(),
+                                  vectorized.iterateCABoard(snapshot=False).getStates())
+
+"""
+ Helper, asserts the mean counts of the two engines are within 4 standard errors of each other (plus one
+ cell, for the counts that hardly vary).
+"""
+def assertSameMeans(variants):
+    python = finalCounts("python", variants, False, 40, 12)
+    vectorized = finalCounts("numpy", variants, False, 40, 12)
+    error = np.sqrt(python.var(axis=0, ddof=1)/len(python) + vectorized.var(axis=0, ddof=1)/len(vectorized))
+    assert (np.abs(python.mean(axis=0) - vectorized.mean(axis=0)) <= 4*error + 1).all()
+
+def test_firstVariantMeanCountsMatch():
+    assertSameMeans(1)
+
+def test_secondVariantMeanCountsMatch():
+    assertSameMeans(2)
+
+@pytest.mark.parametrize("shape", [(1, 7), (1, 1), (4, 1), (2, 2), (1, 30), (9, 6)])
+@pytest.mark.parametrize("engine", ["numpy", "hashlife", "bitboard", "timeline"])
+def test_deterministicEnginesMatchOnSmallBoards(smallBoards, shape, engine):
+    smallBoards(*shape)
+    rng = np.random.default_rng(7)
+    for trial in range(0,10):
+        # S, I and R cells (R cells never change, every engine has to keep them).
+        states = rng.choice(np.array([0, 0, 0, 1, 2], dtype=np.uint8), size=shape)
+        python = CA2dSIRDynamics(CABoard(states.copy()), engine="python")
+        other = CA2dSIRDynamics(CABoard(states.copy()), engine=engine)
+        for generation in range(0,6):
+            assert np.array_equal(other.iterateCABoard(snapshot=False).getStates(),
+                                  python.iterateCABoard(snapshot=False).getStates()), (trial, generation)
+
+@pytest.mark.parametrize("variants, isDeterministic", ruleModes)
+def test_compactBoardKeepsItsCounts(variants, isDeterministic):
+    ca = seededCA(variants, isDeterministic, "numpy", 3, compact=True)
+    board = ca.currentBoard
+    for generation in range(0,10):
+        ca.iterateCABoard(snapshot=False)
+        scanned = np.bincount(board.getStates().ravel(), minlength=5)[:5].tolist()
+        assert list(board.counts().values()) == scanned, generation
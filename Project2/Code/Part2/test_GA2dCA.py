@@ -0,0 +1,84 @@
+"""
+ Tests of the GA (see GA2dCA): the racing evaluation (see GeneticAlgorithm2DCA.runRacingSimulation()) gives
+ every member its first runs and stops running the members that are clearly out of the top 20%, early, and
+ a GA checkpointed and resumed into a GA built with another seed (see GeneticAlgorithm2DCA.checkpoint())
+ carries on exactly like the GA that was never stopped.
+ Run with python3 -m pytest from Part2.
+ Implemented by: Anas Gauba
+"""
+
+import numpy as np
+import pytest
+from CABoard import CABoard
+import GA2dCA
+
+"""
+ Every test runs a population of 10 CA's (the top 20% is 2 members).
+"""
+@pytest.fixture(autouse=True)
+def smallPopulation(monkeypatch):
+    monkeypatch.setattr(GA2dCA.GeneticAlgorithm2DCA, "_popSize", 10)
+
+"""
+ Helper, runs of known fitness instead of CA runs: members 0 and 1 have a fitness around 10, the others
+ around 1000 (plus 0, 1 or 2 from the board seed, so the confidence intervals are not empty).
+"""
+def fakeReplicates(members, boardSeeds):
+    fitness = np.where(np.asarray(members) < 2, 10.0, 1000.0) + np.asarray(boardSeeds) % 3
+    return fitness, [dict(zip(CABoard._states, [0]*5)) for member in members]
+
+def test_racingDropsDominatedMembers(monkeypatch):
+    ga = GA2dCA.GeneticAlgorithm2DCA(engine="numpy", rng=3, evaluation="racing", racingReplicates=(2, 8))
+    monkeypatch.setattr(ga, "runReplicates", fakeReplicates)
+    ga.runRacingSimulation()
+
+    replicates = ga.population["replicates"]
+    # every member gets its first runs, the clearly worse ones none after that.
+    assert (replicates >= 2).all()
+    assert (replicates[2:] == 2).all()
+    # the top 20% is raced on (it stops once only the top 20% is left).
+    assert (replicates[:2] > 2).all()
+    assert replicates.sum() < 8*len(replicates)
+    assert (ga.population["fitness"][:2] < 20).all() and (ga.population["fitness"][2:] > 900).all()
+
+@pytest.mark.parametrize("racingReplicates", [(1, 4), (2, 8)])
+def test_racingGivesEverySurvivorItsFirstRuns(racingReplicates):
+    ga = GA2dCA.GeneticAlgorithm2DCA(engine="numpy", rng=3, evaluation="racing", racingReplicates=racingReplicates)
+    ga.loadGenomes()
+    ga.runRacingSimulation()
+
+    replicates = ga.population["replicates"]
+    assert (replicates >= racingReplicates[0]).all()
+    assert (replicates <= racingReplicates[1]).all()
+    # at least the top 20% got more runs.
+    assert (replicates > racingReplicates[0]).sum() >= 2
+
+"""
+ Helper, whether two GA's have the same genomes, population and fitness history.
+"""
+def sameGA(first, second):
+    if (not np.array_equal(first.genomes, second.genomes)):
+        return False
+    for field in first.population.dtype.names:
+        if (not np.array_equal(first.population[field], second.population[field], equal_nan=field in ("fitness", "fitnessError"))):
+            return False
+    return np.array_equal(np.array(first.fitnessHistory), np.array(second.fitnessHistory))
+
+@pytest.mark.parametrize("gaArgs", [{}, {"cacheSize": 100}, {"evaluation": "racing", "racingReplicates": (1, 4)}])
+def test_resumedGAMatchesUninterrupted(tmp_path, gaArgs):
+    uninterrupted = GA2dCA.GeneticAlgorithm2DCA(engine="numpy", rng=7, **gaArgs)
+    for generation in range(0,4):
+        uninterrupted.runSimulation()
+
+    paused = GA2dCA.GeneticAlgorithm2DCA(engine="numpy", rng=7, **gaArgs)
+    for generation in range(0,2):
+        paused.runSimulation()
+    paused.checkpoint(str(tmp_path / "GA.ckpt"))
+
+    resumed = GA2dCA.GeneticAlgorithm2DCA(engine="numpy", rng=99, **gaArgs)
+    resumed.resume(str(tmp_path / "GA.ckpt"))
+    assert resumed.generation == 2
+    for generation in range(0,2):
+        resumed.runSimulation()
+    assert resumed.generation == 4
+    assert sameGA(resumed, uninterrupted)